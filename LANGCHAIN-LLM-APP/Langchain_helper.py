@@ -1,365 +1,661 @@
 import os
-import streamlit as st
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.prompts import PromptTemplate
-from langchain.chains import LLMChain
+import threading
+from chat_history import context as chat_context
+from context_cache import CacheablePrompt
+import fallbacks
+import food_db
+import metabolic
+from meal_plan import MealPlan, ModificationStreamParser, apply_patches, detect_target_section
+from resilience import degrade, guard
+from llm_backend import estimate_tokens, get_api_key, get_backend
+from response_cache import cached, cached_stream
+from semantic_cache import SemanticCache
+import telemetry
+import workout_engine
+import workout_library
+from workout_parser import parse_workouts, WorkoutStreamParser
 
-# Load API key from Streamlit secrets or environment
-def get_api_key():
+# Bump whenever a prompt changes so cached responses from the old prompt are not reused
+PROMPT_VERSION = "3"
+
+# Near-duplicate Recipe Chat questions are answered locally; see chat_cache.stats()
+chat_cache = SemanticCache.from_env()
+
+# ---------------- PROMPTS ----------------
+# Compiled once at import and shared by every call and session. Each prompt
+# is a static instruction prefix, byte-identical across users so the
+# provider can cache it, followed by a short suffix with the user's details.
+
+FITNESS_PLAN_PROMPT = CacheablePrompt(
+    prefix=(
+        "You are an expert fitness trainer and nutritionist. Create a comprehensive personalized fitness plan "
+        "for the user described at the end.\n\n"
+
+        "Please provide:\n"
+        "1. **Weekly Workout Split Overview** - Brief summary of the training approach\n"
+        "2. **Daily Calorie Requirements** - Calculate based on goals and activity level\n"
+        "3. **Macronutrient Targets** - Protein, carbs, fats in grams per day\n"
+        "4. **General Recommendations** - Key tips for success\n\n"
+
+        "Format your response clearly with headers and bullet points.\n\n"
+    ),
+    suffix=(
+        "User Details:\n"
+        "- Age: {age}\n"
+        "- Gender: {gender}\n"
+        "- Weight: {weight} kg\n"
+        "- Height: {height} cm\n"
+        "- Fitness Goal: {fitness_goal}\n"
+        "- Workout Days per Week: {workout_days}\n"
+        "- Experience Level: {workout_level}\n"
+        "- Workout Type Preference: {workout_type}\n"
+        "- Diet Preference: {diet_pref}"
+    ),
+    input_variables=['age', 'gender', 'weight', 'height', 'fitness_goal', 'workout_days', 'workout_level', 'workout_type', 'diet_pref'],
+)
+
+DAILY_WORKOUTS_PROMPT = CacheablePrompt(
+    prefix=(
+        "Create a day-by-day workout plan for 7 days of the week for the user described at the end.\n\n"
+
+        "For each day (Monday through Sunday), provide either:\n"
+        "- A specific workout plan with exercises, sets, and reps\n"
+        "- 'Rest Day' for recovery days\n\n"
+
+        "Respond with exactly 7 lines, one JSON object per line from Monday to Sunday, and nothing else "
+        "(no code fences, no commentary). Each line must follow this schema:\n"
+        '{"day": "Monday", "rest": false, "focus": "Upper Body Push", '
+        '"exercises": [{"name": "Push-ups", "sets": 3, "reps": "10-12"}], "notes": "Rest 60s between sets"}\n'
+        'For rest days use "rest": true, an empty "exercises" list and a short recovery tip in "notes".\n\n'
+    ),
+    suffix=(
+        "Workout Days per Week: {workout_days}\n"
+        "Fitness Goal: {fitness_goal}\n"
+        "Experience Level: {workout_level}\n"
+        "Workout Type: {workout_type}\n\n"
+
+        "Make sure to include exactly {workout_days} workout days and mark the rest as Rest Days."
+    ),
+    input_variables=['workout_days', 'fitness_goal', 'workout_level', 'workout_type'],
+)
+
+# Coaching notes on a week built by workout_engine.py; the exercises are
+# fixed, so the model only personalises the advice around them
+WORKOUT_NOTES_PROMPT = CacheablePrompt(
+    prefix=(
+        "You are a personal trainer. The user's weekly programme below was built from standard "
+        "templates; do not change its exercises, sets or reps.\n\n"
+        "Write short coaching notes for this user in markdown, starting with the line **Coach's notes**, "
+        "then 3-5 bullet points covering:\n"
+        "- How to progress the programme over the next weeks for their goal\n"
+        "- Form or safety cues for the hardest exercises, considering their age and level\n"
+        "- How to use the rest days\n\n"
+        "Keep the whole answer under 120 words.\n\n"
+    ),
+    suffix=(
+        "Age: {age}, Gender: {gender}\n"
+        "Fitness Goal: {fitness_goal}\n"
+        "Experience Level: {workout_level}\n"
+        "Workout Type: {workout_type}\n\n"
+        "Programme:\n{outline}"
+    ),
+    input_variables=['age', 'gender', 'fitness_goal', 'workout_level', 'workout_type', 'outline'],
+)
+
+NUTRITION_PLAN_PROMPT = CacheablePrompt(
+    prefix=(
+        "Create a detailed nutrition plan as a fitness nutritionist for the user described at the end.\n"
+        "Make ALL meal suggestions using foods commonly available and popular in the user's country, "
+        "following the country guidance given with their details.\n"
+        "Include cooking methods and ingredient preparations common in that country, and use local "
+        "ingredient names and measurements familiar to its residents.\n\n"
+
+        "Respond with exactly this structure, filling every <...> from the user's targets:\n\n"
+
+        "## Macronutrient Breakdown\n"
+        "- **Protein:** <protein grams>g (<protein calories> calories)\n"
+        "- **Carbohydrates:** <carb grams>g (<carb calories> calories)\n"
+        "- **Fats:** <fat grams>g (<fat calories> calories)\n"
+        "- **Fiber:** <fiber grams>g\n\n"
+
+        "## Sample Daily Meal Plan (<country> Cuisine)\n"
+        "### 🌅 Breakfast (<breakfast calories> calories)\n"
+        "Provide 2-3 traditional breakfast options for the user's country and diet with specific local foods and portions\n\n"
+
+        "### 🍽️ Lunch (<lunch calories> calories)\n"
+        "Provide 2-3 traditional lunch options for the user's country and diet with specific local foods and portions\n\n"
+
+        "### 🥜 Snacks (<snack calories> calories)\n"
+        "Provide healthy snack options for the user's diet, available locally\n\n"
+
+        "### 🌙 Dinner (<dinner calories> calories)\n"
+        "Provide 2-3 traditional dinner options for the user's country and diet with specific local foods and portions\n\n"
+
+        "## 💧 Hydration & Supplements\n"
+        "- Water intake: minimum 35ml per kg body weight = <water intake>L per day\n"
+        "- Basic supplements available in the user's country for their goal\n\n"
+    ),
+    suffix=(
+        "User: {age}yo {gender}, {weight}kg, {height}cm, Goal: {fitness_goal}, Diet: {diet_pref}\n"
+        "Country: {country}\n"
+        "IMPORTANT: {meal_guidance}\n"
+        "Daily Calorie Target: {daily_calories} calories\n\n"
+
+        "Targets:\n"
+        "- Protein: {protein_grams}g ({protein_cals} calories)\n"
+        "- Carbohydrates: {carb_grams}g ({carb_cals} calories)\n"
+        "- Fats: {fat_grams}g ({fat_cals} calories)\n"
+        "- Fiber: {fiber_grams}g\n"
+        "- Breakfast: {breakfast_cals} calories\n"
+        "- Lunch: {lunch_cals} calories\n"
+        "- Snacks: {snack_cals} calories\n"
+        "- Dinner: {dinner_cals} calories\n"
+        "- Water intake: {water_intake}L per day"
+    ),
+    input_variables=['age', 'gender', 'weight', 'height', 'fitness_goal', 'diet_pref',
+                     'daily_calories', 'protein_grams', 'carb_grams', 'fat_grams', 'fiber_grams',
+                     'breakfast_cals', 'lunch_cals', 'snack_cals', 'dinner_cals',
+                     'protein_cals', 'carb_cals', 'fat_cals', 'water_intake', 'country', 'meal_guidance'],
+)
+
+NUTRITIONIST_CHAT_PROMPT = CacheablePrompt(
+    prefix=(
+        "You are an expert nutritionist and recipe consultant.\n\n"
+        "Provide helpful, accurate advice about:\n"
+        "- Recipe modifications\n"
+        "- Calorie counting\n"
+        "- Meal planning\n"
+        "- Ingredient substitutions\n"
+        "- Cooking tips\n"
+        "- Nutritional information\n\n"
+        "Keep responses conversational, practical, and within the user's dietary preferences.\n\n"
+    ),
+    suffix=(
+        "The user has a {diet_pref} diet preference and a daily calorie target of {daily_calories} calories.\n\n"
+        "Previous conversation:\n{context}\n\n"
+        "User question: {user_message}"
+    ),
+    input_variables=['user_message', 'diet_pref', 'daily_calories', 'context'],
+)
+
+# Shared by the two Meal Customization prompts below
+_MODIFICATION_STEPS = (
+    "1. **Understanding the request** - What meal/ingredient they want to change\n"
+    "2. **Providing alternatives** - Suggest 2-3 equivalent options using foods from the user's country\n"
+    "3. **Maintaining macros** - Keep similar protein, carbs, fats, and calories\n"
+    "4. **Using local ingredients** - Only suggest foods commonly available in the user's country\n\n"
+)
+_MODIFICATION_DETAILS = (
+    "User's Current Meal Plan:\n{current_plan}\n\n"
+    "User Preferences:\n"
+    "- Diet: {diet_pref}\n"
+    "- Daily Calories: {daily_calories}\n"
+    "- Fitness Goal: {fitness_goal}\n"
+    "- Country: {country}\n\n"
+    "Recent conversation:\n{context}\n\n"
+    "User request: {user_message}"
+)
+
+NUTRITION_MODIFICATION_PROMPT = CacheablePrompt(
+    prefix=(
+        "You are an expert nutritionist specializing in regional cuisines and meal plan customization. "
+        "The user's country, current plan and request follow these instructions.\n\n"
+        "Please help with meal modifications by:\n"
+        + _MODIFICATION_STEPS +
+        "Format your response conversationally with specific suggestions using the user's local foods and local names.\n\n"
+        "Example for India:\n"
+        "I can help you replace that! Here are 3 Indian alternatives with similar macros:\n\n"
+        "🍛 **Option 1: Paneer Bhurji with Roti** (~400 calories)\n"
+        "- 100g paneer bhurji, 2 whole wheat rotis\n"
+        "- Protein: 25g | Carbs: 30g | Fat: 18g\n\n"
+        "Would you like me to update your meal plan with one of these Indian options?\n\n"
+    ),
+    suffix=_MODIFICATION_DETAILS,
+    input_variables=['user_message', 'current_plan', 'diet_pref', 'daily_calories', 'fitness_goal', 'context', 'country'],
+)
+
+# Details shared by the two plan-rewrite prompts
+_USER_DETAILS = (
+    "User Details:\n"
+    "- Age: {age}, Gender: {gender}\n"
+    "- Weight: {weight}kg, Height: {height}cm\n"
+    "- Goal: {fitness_goal}\n"
+    "- Diet: {diet_pref}\n"
+    "- Daily Calories: {daily_calories}\n\n"
+)
+
+UPDATED_NUTRITION_PLAN_PROMPT = CacheablePrompt(
+    prefix=(
+        "Update the nutrition plan based on the user's modification request.\n\n"
+        "Generate a complete updated nutrition plan with the requested changes while maintaining:\n"
+        "- The same total daily calories\n"
+        "- Appropriate macro balance for the user's goal\n"
+        "- The user's dietary preferences\n\n"
+        "Use the same format as the original plan:\n\n"
+        "## Macronutrient Breakdown\n"
+        "- Protein: X grams (X calories)\n"
+        "- Carbohydrates: X grams (X calories)\n"
+        "- Fats: X grams (X calories)\n"
+        "- Fiber: X grams\n\n"
+
+        "## Sample Daily Meal Plan\n"
+        "### 🌅 Breakfast (X calories)\n"
+        "- [updated meal if requested, otherwise keep original]\n\n"
+        "### 🍽️ Lunch (X calories)\n"
+        "- [updated meal if requested, otherwise keep original]\n\n"
+        "### 🥜 Snacks (X calories)\n"
+        "- [updated meal if requested, otherwise keep original]\n\n"
+        "### 🌙 Dinner (X calories)\n"
+        "- [updated meal if requested, otherwise keep original]\n\n"
+
+        "## 💧 Hydration & Supplements\n"
+        "- Water intake recommendations\n"
+        "- Basic supplement suggestions (if any)\n\n"
+    ),
+    suffix=(
+        _USER_DETAILS +
+        "Original Plan:\n{current_plan}\n\n"
+        "User Modification Request: {user_request}"
+    ),
+    input_variables=['user_request', 'current_plan', 'age', 'gender', 'weight', 'height', 'fitness_goal', 'diet_pref', 'daily_calories'],
+)
+
+UPDATED_SECTION_PROMPT = CacheablePrompt(
+    prefix=(
+        "Update one section of a nutrition plan based on the user's modification request.\n\n"
+        "Rewrite only this section with the requested changes while keeping:\n"
+        "- The same calories and similar macros for this section\n"
+        "- The user's dietary preferences\n\n"
+        "Start with the same heading line and return only the updated section in the same markdown format.\n\n"
+    ),
+    suffix=(
+        _USER_DETAILS +
+        "Daily totals for context:\n{totals}\n\n"
+        "Section to update:\n{section}\n\n"
+        "User Modification Request: {user_request}"
+    ),
+    input_variables=['user_request', 'totals', 'section', 'age', 'gender', 'weight', 'height', 'fitness_goal', 'diet_pref', 'daily_calories'],
+)
+
+MODIFY_NUTRITION_PLAN_PROMPT = CacheablePrompt(
+    prefix=(
+        "You are an expert nutritionist specializing in regional cuisines and meal plan customization. "
+        "The user's country, current plan and request follow these instructions.\n\n"
+        "First, reply conversationally:\n"
+        + _MODIFICATION_STEPS +
+        "Then, only if the user asked to change their plan or accepted one of your earlier suggestions, "
+        "add one block per changed section after your reply, exactly in this format:\n"
+        "<<<UPDATE section>>>\n"
+        "(the complete updated section in markdown, starting with its original heading)\n"
+        "<<<END>>>\n"
+        "where section is one of: macros, breakfast, lunch, snacks, dinner, hydration. "
+        "Keep each updated section's calories the same as before. "
+        "If nothing in the plan should change yet, add no blocks.\n\n"
+    ),
+    suffix=_MODIFICATION_DETAILS,
+    input_variables=['user_message', 'current_plan', 'diet_pref', 'daily_calories', 'fitness_goal', 'context', 'country'],
+)
+
+PROMPTS = {
+    "generate_fitness_plan": FITNESS_PLAN_PROMPT,
+    "get_daily_workouts": DAILY_WORKOUTS_PROMPT,
+    "personalize_workouts": WORKOUT_NOTES_PROMPT,
+    "get_nutrition_plan": NUTRITION_PLAN_PROMPT,
+    "chat_with_nutritionist": NUTRITIONIST_CHAT_PROMPT,
+    "chat_nutrition_modification": NUTRITION_MODIFICATION_PROMPT,
+    "generate_updated_nutrition_plan": UPDATED_NUTRITION_PLAN_PROMPT,
+    "generate_updated_section": UPDATED_SECTION_PROMPT,
+    "modify_nutrition_plan": MODIFY_NUTRITION_PLAN_PROMPT,
+}
+
+# Country-specific meal guidance
+COUNTRY_GUIDANCE = {
+    "India": "Focus on traditional Indian foods like dal, roti, rice, vegetables, paneer, chicken curry, idli, dosa, upma, poha, etc.",
+    "United States": "Include American staples like oatmeal, grilled chicken, salads, quinoa bowls, protein smoothies, etc.",
+    "United Kingdom": "Include British foods like porridge, beans on toast, fish and chips alternatives, roast dinner components, etc.",
+    "Canada": "Include Canadian foods like maple syrup options, salmon, whole grain cereals, etc.",
+    "Australia": "Include Australian foods like Vegemite toast, barramundi, kangaroo meat (if available), etc.",
+    "South Africa": "Include South African foods like biltong, boerewors, pap, morogo, etc.",
+    "Malaysia": "Include Malaysian foods like nasi lemak, rendang, laksa, roti canai alternatives, etc.",
+    "Singapore": "Include Singaporean foods like chicken rice, laksa, kaya toast, etc.",
+    "UAE": "Include Middle Eastern and international foods like hummus, grilled meats, Arabic rice dishes, etc.",
+    "Other": "Use commonly available international foods with local adaptations."
+}
+
+# ---------------- BACKEND ----------------
+# Every helper goes through the active backend (Gemini by default, or the
+# offline fake with FITVISOR_LLM_BACKEND=fake), under the per-prompt
+# deadline, retries, hedging and circuit breaker in resilience.py. When
+# those give up the call raises resilience.Unavailable, which the helpers'
+# @degrade turns into a stale cached or locally templated answer.
+
+# Cache keys include the backend so fake and real responses never mix
+def cache_version():
+    return f"{PROMPT_VERSION}:{get_backend().name}"
+
+def _run_chain(name, variables):
+    prompt = PROMPTS[name]
+    backend = get_backend()
+    text = guard.call(name, lambda: backend.invoke(name, prompt, variables))
+    telemetry.record_llm_call(estimate_tokens(prompt.format(**variables)), estimate_tokens(text))
+    return text
+
+# Yield completion text chunks as the model produces them
+def _stream_chain(name, variables):
+    prompt = PROMPTS[name]
+    completion_chars = 0
     try:
-        return st.secrets["GOOGLE_API_KEY"]
-    except:
-        return os.getenv("GOOGLE_API_KEY")
+        backend = get_backend()
+        for chunk in guard.stream(name, lambda: backend.stream(name, prompt, variables)):
+            completion_chars += len(chunk)
+            yield chunk
+    finally:
+        telemetry.record_llm_call(estimate_tokens(prompt.format(**variables)), completion_chars // 4)
 
-def generate_fitness_plan(age, gender, weight, height, fitness_goal, workout_days, workout_level, workout_type, diet_pref):
-    llm = ChatGoogleGenerativeAI(
-        model="gemini-1.5-flash", 
-        temperature=0.7,
-        google_api_key=get_api_key()
-    )
-    
-    prompt_template = PromptTemplate(
-        input_variables=['age', 'gender', 'weight', 'height', 'fitness_goal', 'workout_days', 'workout_level', 'workout_type', 'diet_pref'],
-        template=(
-            "You are an expert fitness trainer and nutritionist. Create a comprehensive personalized fitness plan.\n"
-            "User Details:\n"
-            "- Age: {age}\n"
-            "- Gender: {gender}\n"
-            "- Weight: {weight} kg\n"
-            "- Height: {height} cm\n"
-            "- Fitness Goal: {fitness_goal}\n"
-            "- Workout Days per Week: {workout_days}\n"
-            "- Experience Level: {workout_level}\n"
-            "- Workout Type Preference: {workout_type}\n"
-            "- Diet Preference: {diet_pref}\n\n"
-            
-            "Please provide:\n"
-            "1. **Weekly Workout Split Overview** - Brief summary of the training approach\n"
-            "2. **Daily Calorie Requirements** - Calculate based on goals and activity level\n"
-            "3. **Macronutrient Targets** - Protein, carbs, fats in grams per day\n"
-            "4. **General Recommendations** - Key tips for success\n\n"
-            
-            "Format your response clearly with headers and bullet points."
-        )
-    )
-    
-    plan_chain = LLMChain(llm=llm, prompt=prompt_template)
-    response = plan_chain.invoke({
+def warm_up():
+    return get_backend().warm_up(PROMPTS)
+
+# Same, off the request path: the LLM libraries import and the chains build
+# while the user is still on the onboarding form
+def warm_up_in_background():
+    thread = threading.Thread(target=warm_up, name="fitvisor-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+# Quantity questions answered from the food table count as local hits
+def _food_answer(user_message):
+    answer = food_db.answer_quantity_question(user_message)
+    if answer is not None:
+        telemetry.mark_cache_hit("food_db")
+    return answer
+
+def _chat_cache_lookup(user_message, diet_pref, daily_calories):
+    answer = chat_cache.lookup(user_message, diet_pref, daily_calories)
+    if answer is not None:
+        telemetry.mark_cache_hit("semantic")
+    return answer
+
+# ---------------- HELPERS ----------------
+# Public helpers are traced under their own name; see telemetry.py
+
+def _fitness_plan_inputs(age, gender, weight, height, fitness_goal, workout_days, workout_level, workout_type, diet_pref):
+    return {
         'age': age, 'gender': gender, 'weight': weight, 'height': height,
         'fitness_goal': fitness_goal, 'workout_days': workout_days,
         'workout_level': workout_level, 'workout_type': workout_type,
         'diet_pref': diet_pref
-    })
-    return response["text"]
+    }
 
-def get_daily_workouts(workout_days, fitness_goal, workout_level, workout_type):
-    llm = ChatGoogleGenerativeAI(
-        model="gemini-1.5-flash", 
-        temperature=0.7,
-        google_api_key=get_api_key()
-    )
-    
-    prompt_template = PromptTemplate(
-        input_variables=['workout_days', 'fitness_goal', 'workout_level', 'workout_type'],
-        template=(
-            "Create a day-by-day workout plan for 7 days of the week.\n"
-            "Workout Days per Week: {workout_days}\n"
-            "Fitness Goal: {fitness_goal}\n"
-            "Experience Level: {workout_level}\n"
-            "Workout Type: {workout_type}\n\n"
-            
-            "For each day (Monday through Sunday), provide either:\n"
-            "- A specific workout plan with exercises, sets, and reps\n"
-            "- 'Rest Day' for recovery days\n\n"
-            
-            "Format as:\n"
-            "**Monday:** [workout details or Rest Day]\n"
-            "**Tuesday:** [workout details or Rest Day]\n"
-            "etc.\n\n"
-            
-            "Make sure to include exactly {workout_days} workout days and mark the rest as Rest Days."
-        )
-    )
-    
-    chain = LLMChain(llm=llm, prompt=prompt_template)
-    response = chain.invoke({
+@telemetry.traced("generate_fitness_plan")
+@degrade(fallbacks.fitness_plan)
+@cached("generate_fitness_plan", cache_version)
+def generate_fitness_plan(age, gender, weight, height, fitness_goal, workout_days, workout_level, workout_type, diet_pref):
+    return _run_chain("generate_fitness_plan", _fitness_plan_inputs(
+        age, gender, weight, height, fitness_goal, workout_days, workout_level, workout_type, diet_pref
+    ))
+
+@telemetry.traced("stream_fitness_plan")
+@degrade(fallbacks.fitness_plan, resume=lambda sent, plan: [fallbacks.INTERRUPTED])
+@cached_stream("generate_fitness_plan", cache_version)
+def stream_fitness_plan(age, gender, weight, height, fitness_goal, workout_days, workout_level, workout_type, diet_pref):
+    yield from _stream_chain("generate_fitness_plan", _fitness_plan_inputs(
+        age, gender, weight, height, fitness_goal, workout_days, workout_level, workout_type, diet_pref
+    ))
+
+def _daily_workouts_inputs(workout_days, fitness_goal, workout_level, workout_type):
+    return {
         'workout_days': workout_days,
         'fitness_goal': fitness_goal,
         'workout_level': workout_level,
         'workout_type': workout_type
+    }
+
+# Where weekly workouts come from: "rules" (the default) builds them with
+# workout_engine.py without a model call; "llm" asks the model (through the
+# workout library and response cache), with the engine's week as fallback
+WORKOUT_SOURCE = os.getenv("FITVISOR_WORKOUT_SOURCE", "rules").strip().lower()
+
+def _rule_workouts(workout_days, fitness_goal, workout_level, workout_type):
+    if WORKOUT_SOURCE != "rules":
+        return None
+    telemetry.mark_cache_hit("rules")
+    return workout_engine.build_week(workout_days, fitness_goal, workout_level, workout_type)
+
+# Precomputed week for these inputs (see workout_library.py), if the
+# library was built from the current prompt version and backend
+def _library_workouts(workout_days, fitness_goal, workout_level, workout_type):
+    library = workout_library.get_library()
+    if library is None or library.version != cache_version():
+        return None
+    plans = library.get(workout_days, fitness_goal, workout_level, workout_type)
+    if plans is not None:
+        telemetry.mark_cache_hit("library")
+    return plans
+
+def _known_workouts(workout_days, fitness_goal, workout_level, workout_type):
+    return (_rule_workouts(workout_days, fitness_goal, workout_level, workout_type)
+            or _library_workouts(workout_days, fitness_goal, workout_level, workout_type))
+
+# Returns {day: markdown} from the rule engine, or with
+# FITVISOR_WORKOUT_SOURCE=llm from the workout library when it covers these
+# inputs and otherwise from the model
+@telemetry.traced("get_daily_workouts")
+@degrade(lambda *args, **kwargs: generate_daily_workouts.stale(*args, **kwargs), fallbacks.daily_workouts)
+def get_daily_workouts(workout_days, fitness_goal, workout_level, workout_type):
+    plans = _known_workouts(workout_days, fitness_goal, workout_level, workout_type)
+    if plans is not None:
+        return plans
+    return generate_daily_workouts(workout_days, fitness_goal, workout_level, workout_type)
+
+# Always asks the model (through the response cache); used to build the library
+@cached("get_daily_workouts", cache_version)
+def generate_daily_workouts(workout_days, fitness_goal, workout_level, workout_type):
+    text = _run_chain("get_daily_workouts", _daily_workouts_inputs(
+        workout_days, fitness_goal, workout_level, workout_type
+    ))
+    return parse_workouts(text)
+
+# After a stream failure, the days not yet sent, from the fallback week
+def _remaining_days(sent, plans):
+    sent_days = {day for day, _ in sent}
+    return [(day, plan) for day, plan in (plans or {}).items() if day not in sent_days]
+
+# Yields (day, markdown) pairs; generated weeks stream as soon as each
+# day's block has arrived
+@telemetry.traced("stream_daily_workouts")
+@degrade(lambda *args, **kwargs: _stream_generated_workouts.stale(*args, **kwargs), fallbacks.daily_workouts,
+         replay=lambda plans: plans.items(), resume=_remaining_days)
+def stream_daily_workouts(workout_days, fitness_goal, workout_level, workout_type):
+    plans = _known_workouts(workout_days, fitness_goal, workout_level, workout_type)
+    if plans is not None:
+        yield from plans.items()
+        return
+    yield from _stream_generated_workouts(workout_days, fitness_goal, workout_level, workout_type)
+
+@cached_stream("get_daily_workouts", cache_version, collect=dict, replay=lambda plans: plans.items())
+def _stream_generated_workouts(workout_days, fitness_goal, workout_level, workout_type):
+    parser = WorkoutStreamParser()
+    for chunk in _stream_chain("get_daily_workouts", _daily_workouts_inputs(
+        workout_days, fitness_goal, workout_level, workout_type
+    )):
+        yield from parser.feed(chunk)
+    yield from parser.close()
+
+# Coaching notes for the rule-built week; with the model unavailable,
+# generic notes from the engine
+@telemetry.traced("stream_workout_notes")
+@degrade(workout_engine.coach_notes, resume=lambda sent, notes: [fallbacks.INTERRUPTED])
+@cached_stream("personalize_workouts", cache_version)
+def stream_workout_notes(workout_days, fitness_goal, workout_level, workout_type, age, gender):
+    yield from _stream_chain("personalize_workouts", {
+        'age': age, 'gender': gender, 'fitness_goal': fitness_goal,
+        'workout_level': workout_level, 'workout_type': workout_type,
+        'outline': workout_engine.outline(workout_days, fitness_goal, workout_level, workout_type),
     })
-    
-    # Parse the response into a dictionary
-    lines = response["text"].split('\n')
-    workout_dict = {}
-    days = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
-    
-    current_day = None
-    current_content = []
-    
-    for line in lines:
-        line = line.strip()
-        for day in days:
-            if day in line and '**' in line:
-                if current_day:
-                    workout_dict[current_day] = '\n'.join(current_content).strip()
-                current_day = day
-                current_content = [line.replace('**', '').replace(f'{day}:', '').strip()]
-                break
-        else:
-            if current_day and line:
-                current_content.append(line)
-    
-    if current_day:
-        workout_dict[current_day] = '\n'.join(current_content).strip()
-    
-    return workout_dict
 
-def get_nutrition_plan(age, gender, weight, height, fitness_goal, diet_pref, daily_calories, country):
-    llm = ChatGoogleGenerativeAI(
-        model="gemini-1.5-flash", 
-        temperature=0.7,
-        google_api_key=get_api_key()
-    )
-    
-    # Calculate macro percentages based on fitness goal
-    if fitness_goal in ["Build Muscle", "Weight Gain"]:
-        protein_pct, carb_pct, fat_pct = 0.30, 0.40, 0.30
-    elif fitness_goal == "Weight Loss":
-        protein_pct, carb_pct, fat_pct = 0.35, 0.35, 0.30
-    else:  # Maintain, Flexibility
-        protein_pct, carb_pct, fat_pct = 0.25, 0.45, 0.30
-    
-    # Calculate macro grams
-    protein_cals = daily_calories * protein_pct
-    carb_cals = daily_calories * carb_pct
-    fat_cals = daily_calories * fat_pct
-    
-    protein_grams = int(protein_cals / 4)
-    carb_grams = int(carb_cals / 4)
-    fat_grams = int(fat_cals / 9)
-    fiber_grams = int(weight * 0.5)
-    
-    # Calculate meal distribution
-    breakfast_cals = int(daily_calories * 0.25)
-    lunch_cals = int(daily_calories * 0.30)
-    snack_cals = int(daily_calories * 0.15)
-    dinner_cals = daily_calories - breakfast_cals - lunch_cals - snack_cals
-    
-    # Calculate water intake
-    water_intake = round(weight * 35 / 1000, 1)
-    
-    # Country-specific meal guidance
-    country_guidance = {
-        "India": "Focus on traditional Indian foods like dal, roti, rice, vegetables, paneer, chicken curry, idli, dosa, upma, poha, etc.",
-        "United States": "Include American staples like oatmeal, grilled chicken, salads, quinoa bowls, protein smoothies, etc.",
-        "United Kingdom": "Include British foods like porridge, beans on toast, fish and chips alternatives, roast dinner components, etc.",
-        "Canada": "Include Canadian foods like maple syrup options, salmon, whole grain cereals, etc.",
-        "Australia": "Include Australian foods like Vegemite toast, barramundi, kangaroo meat (if available), etc.",
-        "South Africa": "Include South African foods like biltong, boerewors, pap, morogo, etc.",
-        "Malaysia": "Include Malaysian foods like nasi lemak, rendang, laksa, roti canai alternatives, etc.",
-        "Singapore": "Include Singaporean foods like chicken rice, laksa, kaya toast, etc.",
-        "UAE": "Include Middle Eastern and international foods like hummus, grilled meats, Arabic rice dishes, etc.",
-        "Other": "Use commonly available international foods with local adaptations."
-    }
-    
-    meal_guidance = country_guidance.get(country, country_guidance["Other"])
-    
-    prompt_template = PromptTemplate(
-        input_variables=['age', 'gender', 'weight', 'height', 'fitness_goal', 'diet_pref', 
-                        'daily_calories', 'protein_grams', 'carb_grams', 'fat_grams', 'fiber_grams',
-                        'breakfast_cals', 'lunch_cals', 'snack_cals', 'dinner_cals', 
-                        'protein_cals', 'carb_cals', 'fat_cals', 'water_intake', 'country', 'meal_guidance'],
-        template=(
-            "Create a detailed nutrition plan as a fitness nutritionist.\n"
-            "User: {age}yo {gender}, {weight}kg, {height}cm, Goal: {fitness_goal}, Diet: {diet_pref}\n"
-            "Country: {country}\n"
-            "Daily Calorie Target: {daily_calories} calories\n\n"
-            
-            "IMPORTANT: {meal_guidance}\n"
-            "Make ALL meal suggestions using foods commonly available and popular in {country}.\n\n"
-            
-            "## Macronutrient Breakdown\n"
-            "- **Protein:** {protein_grams}g ({protein_cals} calories)\n"
-            "- **Carbohydrates:** {carb_grams}g ({carb_cals} calories)\n"
-            "- **Fats:** {fat_grams}g ({fat_cals} calories)\n"
-            "- **Fiber:** {fiber_grams}g\n\n"
-            
-            "## Sample Daily Meal Plan ({country} Cuisine)\n"
-            "### 🌅 Breakfast ({breakfast_cals} calories)\n"
-            "Provide 2-3 traditional {country} {diet_pref} breakfast options with specific local foods and portions\n\n"
-            
-            "### 🍽️ Lunch ({lunch_cals} calories)\n"
-            "Provide 2-3 traditional {country} {diet_pref} lunch options with specific local foods and portions\n\n"
-            
-            "### 🥜 Snacks ({snack_cals} calories)\n"
-            "Provide healthy {country} {diet_pref} snack options available locally\n\n"
-            
-            "### 🌙 Dinner ({dinner_cals} calories)\n"
-            "Provide 2-3 traditional {country} {diet_pref} dinner options with specific local foods and portions\n\n"
-            
-            "## 💧 Hydration & Supplements\n"
-            "- Water intake: minimum 35ml per kg body weight = {water_intake}L per day\n"
-            "- Basic supplements available in {country} for {fitness_goal} goal\n\n"
-            
-            "Include cooking methods and ingredient preparations common in {country}.\n"
-            "Use local ingredient names and measurements familiar to {country} residents."
-        )
-    )
-    
-    chain = LLMChain(llm=llm, prompt=prompt_template)
-    response = chain.invoke({
+def _nutrition_plan_inputs(age, gender, weight, height, fitness_goal, diet_pref, daily_calories, country):
+    meal_guidance = COUNTRY_GUIDANCE.get(country, COUNTRY_GUIDANCE["Other"])
+
+    inputs = {
         'age': age, 'gender': gender, 'weight': weight, 'height': height,
         'fitness_goal': fitness_goal, 'diet_pref': diet_pref, 'daily_calories': daily_calories,
-        'protein_grams': protein_grams, 'carb_grams': carb_grams, 'fat_grams': fat_grams,
-        'fiber_grams': fiber_grams, 'breakfast_cals': breakfast_cals, 'lunch_cals': lunch_cals,
-        'snack_cals': snack_cals, 'dinner_cals': dinner_cals,
-        'protein_cals': int(protein_cals), 'carb_cals': int(carb_cals), 
-        'fat_cals': int(fat_cals), 'water_intake': water_intake,
         'country': country, 'meal_guidance': meal_guidance
-    })
-    return response["text"]
+    }
+    # Macro grams, fiber, water and meal calorie split
+    inputs.update(metabolic.macro_targets(daily_calories, weight, fitness_goal))
+    return inputs
 
-def chat_with_nutritionist(user_message, diet_pref, daily_calories, chat_history):
-    llm = ChatGoogleGenerativeAI(
-        model="gemini-1.5-flash", 
-        temperature=0.7,
-        google_api_key=get_api_key()
-    )
-    
-    # Create context from chat history
-    context = ""
-    for msg in chat_history[-6:]:  # Last 3 exchanges
-        context += f"{msg['role']}: {msg['content']}\n"
-    
-    prompt_template = PromptTemplate(
-        input_variables=['user_message', 'diet_pref', 'daily_calories', 'context'],
-        template=(
-            "You are an expert nutritionist and recipe consultant. The user has a {diet_pref} diet preference "
-            "and a daily calorie target of {daily_calories} calories.\n\n"
-            "Previous conversation:\n{context}\n\n"
-            "User question: {user_message}\n\n"
-            "Provide helpful, accurate advice about:\n"
-            "- Recipe modifications\n"
-            "- Calorie counting\n"
-            "- Meal planning\n"
-            "- Ingredient substitutions\n"
-            "- Cooking tips\n"
-            "- Nutritional information\n\n"
-            "Keep responses conversational, practical, and within their dietary preferences."
-        )
-    )
-    
-    chain = LLMChain(llm=llm, prompt=prompt_template)
-    response = chain.invoke({
+@telemetry.traced("get_nutrition_plan")
+@degrade(fallbacks.nutrition_plan)
+@cached("get_nutrition_plan", cache_version)
+def get_nutrition_plan(age, gender, weight, height, fitness_goal, diet_pref, daily_calories, country):
+    return _run_chain("get_nutrition_plan", _nutrition_plan_inputs(
+        age, gender, weight, height, fitness_goal, diet_pref, daily_calories, country
+    ))
+
+@telemetry.traced("stream_nutrition_plan")
+@degrade(fallbacks.nutrition_plan, resume=lambda sent, plan: [fallbacks.INTERRUPTED])
+@cached_stream("get_nutrition_plan", cache_version)
+def stream_nutrition_plan(age, gender, weight, height, fitness_goal, diet_pref, daily_calories, country):
+    yield from _stream_chain("get_nutrition_plan", _nutrition_plan_inputs(
+        age, gender, weight, height, fitness_goal, diet_pref, daily_calories, country
+    ))
+
+def _nutritionist_chat_inputs(user_message, diet_pref, daily_calories, chat_history):
+    return {
         'user_message': user_message,
         'diet_pref': diet_pref,
         'daily_calories': daily_calories,
-        'context': context
-    })
-    return response["text"]
+        'context': chat_context(chat_history, last=6)  # summary + last 3 exchanges
+    }
 
-def chat_nutrition_modification(user_message, current_plan, diet_pref, daily_calories, fitness_goal, chat_history, country):
-    llm = ChatGoogleGenerativeAI(
-        model="gemini-1.5-flash", 
-        temperature=0.7,
-        google_api_key=get_api_key()
-    )
-    
-    # Create context from recent chat
-    context = ""
-    for msg in chat_history[-4:]:
-        context += f"{msg['role']}: {msg['content']}\n"
-    
-    prompt_template = PromptTemplate(
-        input_variables=['user_message', 'current_plan', 'diet_pref', 'daily_calories', 'fitness_goal', 'context', 'country'],
-        template=(
-            "You are an expert nutritionist specializing in {country} cuisine and meal plan customization.\n\n"
-            "User's Current Meal Plan:\n{current_plan}\n\n"
-            "User Preferences:\n"
-            "- Diet: {diet_pref}\n"
-            "- Daily Calories: {daily_calories}\n"
-            "- Fitness Goal: {fitness_goal}\n"
-            "- Country: {country}\n\n"
-            "Recent conversation:\n{context}\n\n"
-            "User request: {user_message}\n\n"
-            "Please help with meal modifications by:\n"
-            "1. **Understanding the request** - What meal/ingredient they want to change\n"
-            "2. **Providing alternatives** - Suggest 2-3 equivalent options using {country} foods\n"
-            "3. **Maintaining macros** - Keep similar protein, carbs, fats, and calories\n"
-            "4. **Using local ingredients** - Only suggest foods commonly available in {country}\n\n"
-            "Format your response conversationally with specific suggestions using {country} foods and local names.\n\n"
-            "Example for India:\n"
-            "I can help you replace that! Here are 3 Indian alternatives with similar macros:\n\n"
-            "🍛 **Option 1: Paneer Bhurji with Roti** (~400 calories)\n"
-            "- 100g paneer bhurji, 2 whole wheat rotis\n"
-            "- Protein: 25g | Carbs: 30g | Fat: 18g\n\n"
-            "Would you like me to update your meal plan with one of these {country} options?"
-        )
-    )
-    
-    chain = LLMChain(llm=llm, prompt=prompt_template)
-    response = chain.invoke({
+# "Calories in 100g paneer"-style questions are answered from the bundled
+# food table; only open-ended questions reach the LLM
+@telemetry.traced("chat_with_nutritionist")
+@degrade(fallbacks.chat_reply)
+def chat_with_nutritionist(user_message, diet_pref, daily_calories, chat_history):
+    answer = _food_answer(user_message)
+    if answer is not None:
+        return answer
+    answer = _chat_cache_lookup(user_message, diet_pref, daily_calories)
+    if answer is not None:
+        return answer
+    answer = _run_chain("chat_with_nutritionist", _nutritionist_chat_inputs(
+        user_message, diet_pref, daily_calories, chat_history
+    ))
+    chat_cache.store(user_message, diet_pref, daily_calories, answer)
+    return answer
+
+@telemetry.traced("stream_chat_with_nutritionist")
+@degrade(fallbacks.chat_reply, resume=lambda sent, reply: [fallbacks.INTERRUPTED])
+def stream_chat_with_nutritionist(user_message, diet_pref, daily_calories, chat_history):
+    answer = _food_answer(user_message) or _chat_cache_lookup(user_message, diet_pref, daily_calories)
+    if answer is not None:
+        yield answer
+        return
+    chunks = []
+    for chunk in _stream_chain("chat_with_nutritionist", _nutritionist_chat_inputs(
+        user_message, diet_pref, daily_calories, chat_history
+    )):
+        chunks.append(chunk)
+        yield chunk
+    chat_cache.store(user_message, diet_pref, daily_calories, "".join(chunks))
+
+def _nutrition_modification_inputs(user_message, current_plan, diet_pref, daily_calories, fitness_goal, chat_history, country):
+    # Send only the section the request is about plus the day's totals
+    plan_excerpt = MealPlan.parse(current_plan).excerpt(detect_target_section(user_message))
+
+    return {
         'user_message': user_message,
-        'current_plan': current_plan,
+        'current_plan': plan_excerpt,
         'diet_pref': diet_pref,
         'daily_calories': daily_calories,
         'fitness_goal': fitness_goal,
-        'context': context,
+        'context': chat_context(chat_history, last=4),
         'country': country
-    })
-    return response["text"]
+    }
 
-def generate_updated_nutrition_plan(user_request, current_plan, user_data, daily_calories):
-    llm = ChatGoogleGenerativeAI(
-        model="gemini-1.5-flash", 
-        temperature=0.7,
-        google_api_key=get_api_key()
-    )
-    
-    prompt_template = PromptTemplate(
-        input_variables=['user_request', 'current_plan', 'age', 'gender', 'weight', 'height', 'fitness_goal', 'diet_pref', 'daily_calories'],
-        template=(
-            "Update the nutrition plan based on the user's modification request.\n\n"
-            "Original Plan:\n{current_plan}\n\n"
-            "User Modification Request: {user_request}\n\n"
-            "User Details:\n"
-            "- Age: {age}, Gender: {gender}\n"
-            "- Weight: {weight}kg, Height: {height}cm\n"
-            "- Goal: {fitness_goal}\n"
-            "- Diet: {diet_pref}\n"
-            "- Daily Calories: {daily_calories}\n\n"
-            "Generate a complete updated nutrition plan with the requested changes while maintaining:\n"
-            "- Same total daily calories: {daily_calories}\n"
-            "- Appropriate macro balance for {fitness_goal}\n"
-            "- {diet_pref} dietary preferences\n\n"
-            "Use the same format as the original plan:\n\n"
-            "## Macronutrient Breakdown\n"
-            "- Protein: X grams (X calories)\n"
-            "- Carbohydrates: X grams (X calories)\n"
-            "- Fats: X grams (X calories)\n"
-            "- Fiber: X grams\n\n"
-            
-            "## Sample Daily Meal Plan\n"
-            "### 🌅 Breakfast (X calories)\n"
-            "- [updated meal if requested, otherwise keep original]\n\n"
-            "### 🍽️ Lunch (X calories)\n"
-            "- [updated meal if requested, otherwise keep original]\n\n"
-            "### 🥜 Snacks (X calories)\n"
-            "- [updated meal if requested, otherwise keep original]\n\n"
-            "### 🌙 Dinner (X calories)\n"
-            "- [updated meal if requested, otherwise keep original]\n\n"
-            
-            "## 💧 Hydration & Supplements\n"
-            "- Water intake recommendations\n"
-            "- Basic supplement suggestions (if any)\n"
-        )
-    )
-    
-    chain = LLMChain(llm=llm, prompt=prompt_template)
-    response = chain.invoke({
-        'user_request': user_request,
-        'current_plan': current_plan,
+@telemetry.traced("chat_nutrition_modification")
+@degrade(fallbacks.modification_reply)
+def chat_nutrition_modification(user_message, current_plan, diet_pref, daily_calories, fitness_goal, chat_history, country):
+    answer = _food_answer(user_message)
+    if answer is not None:
+        return answer
+    return _run_chain("chat_nutrition_modification", _nutrition_modification_inputs(
+        user_message, current_plan, diet_pref, daily_calories, fitness_goal, chat_history, country
+    ))
+
+@telemetry.traced("stream_chat_nutrition_modification")
+@degrade(fallbacks.modification_reply, resume=lambda sent, reply: [fallbacks.INTERRUPTED])
+def stream_chat_nutrition_modification(user_message, current_plan, diet_pref, daily_calories, fitness_goal, chat_history, country):
+    answer = _food_answer(user_message)
+    if answer is not None:
+        yield answer
+        return
+    yield from _stream_chain("chat_nutrition_modification", _nutrition_modification_inputs(
+        user_message, current_plan, diet_pref, daily_calories, fitness_goal, chat_history, country
+    ))
+
+class PlanModification:
+    # Iterating yields the conversational reply as it streams; once
+    # exhausted, `reply` holds the full reply and `patches` the
+    # (section, markdown) edits the model attached.
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self.reply = ""
+        self.patches = []
+
+    def __iter__(self):
+        parser = ModificationStreamParser()
+        for chunk in self._chunks:
+            visible = parser.feed(chunk)
+            if visible:
+                yield visible
+        tail = parser.close()
+        if tail:
+            yield tail
+        self.reply, self.patches = parser.reply, parser.patches
+
+    # A finished modification from a complete reply text
+    @classmethod
+    def of(cls, text):
+        result = cls([text])
+        for _ in result:
+            pass
+        return result
+
+    # The plan with the patches applied, or None if nothing changed
+    def apply(self, current_plan):
+        return apply_patches(current_plan, self.patches) if self.patches else None
+
+# One call that both answers a Meal Customization message and returns the
+# plan edits it implies, replacing chat_nutrition_modification followed by
+# generate_updated_nutrition_plan
+def stream_modify_nutrition_plan(user_message, current_plan, diet_pref, daily_calories, fitness_goal, chat_history, country):
+    return PlanModification(telemetry.trace_iter("stream_modify_nutrition_plan", _modification_chunks(
+        user_message, current_plan, diet_pref, daily_calories, fitness_goal, chat_history, country
+    )))
+
+@degrade(fallbacks.modification_reply, resume=lambda sent, reply: [fallbacks.INTERRUPTED])
+def _modification_chunks(user_message, current_plan, diet_pref, daily_calories, fitness_goal, chat_history, country):
+    answer = _food_answer(user_message)
+    if answer is not None:
+        yield answer
+        return
+    yield from _stream_chain("modify_nutrition_plan", _nutrition_modification_inputs(
+        user_message, current_plan, diet_pref, daily_calories, fitness_goal, chat_history, country
+    ))
+
+@telemetry.traced("modify_nutrition_plan")
+@degrade(lambda *args, **kwargs: PlanModification.of(fallbacks.modification_reply(*args, **kwargs)))
+def modify_nutrition_plan(user_message, current_plan, diet_pref, daily_calories, fitness_goal, chat_history, country):
+    text = _food_answer(user_message) or _run_chain("modify_nutrition_plan", _nutrition_modification_inputs(
+        user_message, current_plan, diet_pref, daily_calories, fitness_goal, chat_history, country
+    ))
+    return PlanModification.of(text)
+
+def _user_details(user_data, daily_calories):
+    return {
         'age': user_data['age'],
         'gender': user_data['gender'],
         'weight': user_data['weight'],
@@ -367,5 +663,31 @@ def generate_updated_nutrition_plan(user_request, current_plan, user_data, daily
         'fitness_goal': user_data['fitness_goal'],
         'diet_pref': user_data['diet_pref'],
         'daily_calories': daily_calories
-    })
-    return response["text"]
+    }
+
+# Rewrites only the meal the request targets and patches it back into the
+# plan; requests spanning several sections regenerate the whole plan. There
+# is no fallback: when the model is unavailable this raises
+# resilience.Unavailable, and callers keep the current plan and say so
+# (fallbacks.modification_reply) instead of reporting an update.
+@telemetry.traced("generate_updated_nutrition_plan")
+def generate_updated_nutrition_plan(user_request, current_plan, user_data, daily_calories):
+    plan = MealPlan.parse(current_plan)
+    target = detect_target_section(user_request)
+
+    if target is None or target == "macros" or not plan.has(target):
+        return _run_chain("generate_updated_nutrition_plan", dict(
+            _user_details(user_data, daily_calories),
+            user_request=user_request,
+            current_plan=current_plan
+        ))
+
+    section_text = _run_chain("generate_updated_section", dict(
+        _user_details(user_data, daily_calories),
+        user_request=user_request,
+        totals=plan.totals(),
+        section=plan.section(target)
+    ))
+    updated = MealPlan.parse(section_text)
+    plan.replace(target, updated.section(target) if updated.has(target) else section_text)
+    return plan.to_markdown()
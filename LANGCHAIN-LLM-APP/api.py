@@ -0,0 +1,434 @@
+"""JSON HTTP API over the Langchain_helper plan and chat helpers.
+
+One asyncio process serves many clients (mobile app, partner integrations)
+without a Streamlit session per user. The helpers are blocking, so they run
+on a bounded shared thread pool against the process-wide LLM backend and
+caches; each endpoint has its own concurrency limit and every request a
+deadline. Long generations can stream as newline-delimited JSON.
+
+    python api.py --port 8000
+    uvicorn api:app --port 8000 --workers 1
+
+Endpoints (POST bodies are JSON; add "stream": true, or ?stream=1, to
+stream where marked *):
+
+    POST /v1/targets                 BMI/BMR/calorie and macro targets
+    POST /v1/fitness-plan          * profile -> {"plan"}
+    POST /v1/workouts              * workout inputs -> {"workouts": {day: markdown}}
+    POST /v1/nutrition-plan        * profile + diet/country -> {"plan"}
+    POST /v1/chat                  * message, diet_pref, daily_calories, history -> {"reply"}
+    POST /v1/nutrition-plan/modify * message + current plan -> {"reply", "plan", "updated"}
+    GET  /healthz, /metrics
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+import Langchain_helper as lch
+import metabolic
+import resilience
+import telemetry
+
+TIMEOUT = float(os.getenv("FITVISOR_API_TIMEOUT", "120"))
+QUEUE_TIMEOUT = float(os.getenv("FITVISOR_API_QUEUE_TIMEOUT", "10"))
+WORKERS = int(os.getenv("FITVISOR_API_WORKERS", "64"))
+
+# Requests each endpoint runs at once; more wait up to QUEUE_TIMEOUT for a
+# slot and then get 503. Override with FITVISOR_API_LIMITS="chat=100,workouts=20".
+DEFAULT_LIMITS = {
+    "targets": 256,
+    "fitness-plan": 32,
+    "workouts": 64,
+    "nutrition-plan": 32,
+    "chat": 64,
+    "modify-nutrition-plan": 32,
+}
+
+
+def parse_limits(text):
+    limits = dict(DEFAULT_LIMITS)
+    for item in filter(None, (part.strip() for part in (text or "").split(","))):
+        name, _, value = item.partition("=")
+        if name.strip() not in limits:
+            raise ValueError(f"Unknown endpoint in FITVISOR_API_LIMITS: {name.strip()}")
+        limits[name.strip()] = int(value)
+    return limits
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class Endpoint:
+    # Concurrency limit and counters for one route
+    def __init__(self, name, limit):
+        self.name = name
+        self.limit = limit
+        self._semaphore = asyncio.Semaphore(limit)
+        self.in_flight = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    async def acquire(self):
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise ApiError(503, f"{self.name} is at capacity; retry shortly")
+        self.in_flight += 1
+
+    def release(self):
+        self.in_flight -= 1
+        self._semaphore.release()
+
+
+ENDPOINTS = {name: Endpoint(name, limit)
+             for name, limit in parse_limits(os.getenv("FITVISOR_API_LIMITS")).items()}
+
+# Shared by every request: the backend client and caches are process-wide,
+# so a fixed pool bounds upstream connections however many clients connect
+_executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="fitvisor-api")
+
+
+# ---------------- REQUEST PARSING ----------------
+
+PROFILE_FIELDS = {"age": int, "gender": str, "weight": float, "height": float, "fitness_goal": str}
+WORKOUT_FIELDS = {"workout_days": int, "fitness_goal": str, "workout_level": str, "workout_type": str}
+
+
+async def read_body(request):
+    try:
+        body = await request.json()
+    except ValueError:
+        raise ApiError(400, "Body must be JSON")
+    if not isinstance(body, dict):
+        raise ApiError(400, "Body must be a JSON object")
+    return body
+
+# Pull `fields` ({name: type}) out of the body in order, converting numbers
+def fields(body, spec):
+    missing = [name for name in spec if body.get(name) in (None, "")]
+    if missing:
+        raise ApiError(400, f"Missing {', '.join(missing)}")
+    values = []
+    for name, kind in spec.items():
+        try:
+            value = kind(body[name])
+        except (TypeError, ValueError):
+            raise ApiError(400, f"{name} must be {kind.__name__}")
+        if kind is float and value.is_integer():
+            value = int(value)
+        values.append(value)
+    return values
+
+def history(body):
+    messages = body.get("history") or []
+    if not isinstance(messages, list) or not all(
+        isinstance(m, dict) and m.get("role") in ("user", "assistant") and isinstance(m.get("content"), str)
+        for m in messages
+    ):
+        raise ApiError(400, "history must be a list of {role: user|assistant, content}")
+    return messages
+
+# Calorie target from the body, or computed from the profile when absent
+def daily_calories(body):
+    if body.get("daily_calories") not in (None, ""):
+        return fields(body, {"daily_calories": int})[0]
+    weight, height, age, gender, goal = fields(body, {"weight": float, "height": float, "age": int,
+                                                      "gender": str, "fitness_goal": str})
+    return metabolic.profile_targets(weight, height, age, gender, goal)["daily_calories"]
+
+def wants_stream(request, body):
+    return bool(body.get("stream")) or request.query_params.get("stream") in ("1", "true")
+
+
+# ---------------- EXECUTION ----------------
+
+# Run a blocking helper on the pool under the endpoint's limit and deadline.
+# A timed-out helper keeps running in its thread; its result still lands in
+# the caches for the next caller. The endpoint slot is held until the
+# helper actually finishes, so timed-out calls still count against the limit.
+async def call(name, func):
+    endpoint = ENDPOINTS[name]
+    await endpoint.acquire()
+    loop = asyncio.get_running_loop()
+    try:
+        future = loop.run_in_executor(_executor, telemetry.run_on_page, f"api:{name}", func)
+    except BaseException:
+        endpoint.release()
+        raise
+    future.add_done_callback(_release_when_done(endpoint))
+    try:
+        # shield() keeps the timeout from cancelling the future (and so
+        # releasing the slot) while the thread is still running
+        return JSONResponse(await asyncio.wait_for(asyncio.shield(future), TIMEOUT))
+    except asyncio.TimeoutError:
+        endpoint.timeouts += 1
+        raise ApiError(504, f"{name} timed out after {TIMEOUT:g}s")
+
+def _release_when_done(endpoint):
+    def done(future):
+        endpoint.release()
+        if not future.cancelled():
+            future.exception()  # retrieved, so an abandoned failure isn't logged as unhandled
+    return done
+
+# Stream a blocking generator as NDJSON: one {"delta": ...} (or custom)
+# line per item, then {"done": true, ...finish()}. The generator runs on
+# the pool and hands items to the event loop; it is closed as soon as the
+# client disconnects or the deadline passes. Errors after the response has
+# started are reported as a final {"error": ...} line.
+async def stream(name, make_items, encode=lambda item: {"delta": item}, finish=None):
+    endpoint = ENDPOINTS[name]
+    await endpoint.acquire()
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    stop = threading.Event()
+
+    def put(kind, value):
+        with contextlib.suppress(RuntimeError):  # loop already closed
+            loop.call_soon_threadsafe(queue.put_nowait, (kind, value))
+
+    def produce():
+        items = iter(make_items())
+        try:
+            for item in items:
+                if stop.is_set():
+                    return
+                put("item", item)
+            put("done", finish() if finish else {})
+        except Exception as e:
+            put("error", e)
+        finally:
+            close = getattr(items, "close", None)
+            if close:
+                close()
+
+    async def body():
+        deadline = loop.time() + TIMEOUT
+        try:
+            while True:
+                try:
+                    kind, value = await asyncio.wait_for(queue.get(), max(0.0, deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    endpoint.timeouts += 1
+                    yield _line({"error": f"{name} timed out after {TIMEOUT:g}s"})
+                    return
+                # Send everything that has queued up in one write, merging
+                # adjacent text deltas into one line
+                batch = [(kind, value)]
+                while kind == "item" and not queue.empty():
+                    kind, value = queue.get_nowait()
+                    if kind == "item" and isinstance(value, str) and isinstance(batch[-1][1], str):
+                        batch[-1] = ("item", batch[-1][1] + value)
+                    else:
+                        batch.append((kind, value))
+                yield "".join(_line(_payload(kind, value, encode)) for kind, value in batch)
+                if kind != "item":
+                    return
+        finally:
+            close()
+
+    # Called from body() when it ends and from the response once it has
+    # been sent; the latter also covers a client that disconnects before
+    # the body is ever iterated
+    released = False
+    def close():
+        nonlocal released
+        if not released:
+            released = True
+            stop.set()
+            endpoint.release()
+
+    try:
+        loop.run_in_executor(_executor, telemetry.run_on_page, f"api:{name}", produce)
+    except BaseException:
+        close()
+        raise
+    return ClosingStreamingResponse(body(), on_close=close, media_type="application/x-ndjson")
+
+class ClosingStreamingResponse(StreamingResponse):
+    # Runs on_close() however the response ends: finished, failed, or the
+    # client gone before the first byte
+    def __init__(self, content, on_close, **kwargs):
+        super().__init__(content, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.on_close()
+
+def _payload(kind, value, encode):
+    if kind == "done":
+        return {"done": True, **value}
+    if kind == "error":
+        return {"error": f"{type(value).__name__}: {value}"}
+    return encode(value)
+
+def _line(payload):
+    return json.dumps(payload, ensure_ascii=False) + "\n"
+
+
+def handler(func):
+    async def wrapper(request):
+        try:
+            return await func(request)
+        except ApiError as e:
+            return JSONResponse({"error": e.message}, status_code=e.status)
+        except resilience.Unavailable as e:
+            # The model is down or timing out and the helper had no fallback
+            return JSONResponse({"error": str(e)}, status_code=503)
+    return wrapper
+
+
+# ---------------- ROUTES ----------------
+
+@handler
+async def targets(request):
+    body = await read_body(request)
+    weight, height, age, gender, goal = fields(body, {"weight": float, "height": float, "age": int,
+                                                      "gender": str, "fitness_goal": str})
+    # Pure arithmetic: answered on the event loop, not queued behind LLM calls
+    endpoint = ENDPOINTS["targets"]
+    await endpoint.acquire()
+    try:
+        return JSONResponse({"targets": metabolic.profile_targets(weight, height, age, gender, goal)})
+    finally:
+        endpoint.release()
+
+@handler
+async def fitness_plan(request):
+    body = await read_body(request)
+    args = fields(body, {**PROFILE_FIELDS, "workout_days": int, "workout_level": str,
+                         "workout_type": str, "diet_pref": str})
+    if wants_stream(request, body):
+        return await stream("fitness-plan", lambda: lch.stream_fitness_plan(*args))
+    return await call("fitness-plan", lambda: {"plan": lch.generate_fitness_plan(*args)})
+
+@handler
+async def workouts(request):
+    body = await read_body(request)
+    args = fields(body, WORKOUT_FIELDS)
+    if not 1 <= args[0] <= 7:
+        raise ApiError(400, "workout_days must be between 1 and 7")
+    if wants_stream(request, body):
+        return await stream("workouts", lambda: lch.stream_daily_workouts(*args),
+                            encode=lambda item: {"day": item[0], "plan": item[1]})
+    return await call("workouts", lambda: {"workouts": lch.get_daily_workouts(*args)})
+
+@handler
+async def nutrition_plan(request):
+    body = await read_body(request)
+    age, gender, weight, height, goal = fields(body, PROFILE_FIELDS)
+    diet_pref, country = fields(body, {"diet_pref": str, "country": str})
+    calories = daily_calories(body)
+    args = (age, gender, weight, height, goal, diet_pref, calories, country)
+    if wants_stream(request, body):
+        return await stream("nutrition-plan", lambda: lch.stream_nutrition_plan(*args),
+                            finish=lambda: {"daily_calories": calories})
+    return await call("nutrition-plan", lambda: {"plan": lch.get_nutrition_plan(*args), "daily_calories": calories})
+
+@handler
+async def chat(request):
+    body = await read_body(request)
+    message, diet_pref = fields(body, {"message": str, "diet_pref": str})
+    args = (message, diet_pref, daily_calories(body), history(body))
+    if wants_stream(request, body):
+        return await stream("chat", lambda: lch.stream_chat_with_nutritionist(*args))
+    return await call("chat", lambda: {"reply": lch.chat_with_nutritionist(*args)})
+
+@handler
+async def modify_nutrition_plan(request):
+    body = await read_body(request)
+    message, plan, diet_pref, goal, country = fields(body, {"message": str, "plan": str, "diet_pref": str,
+                                                           "fitness_goal": str, "country": str})
+    args = (message, plan, diet_pref, daily_calories(body), goal, history(body), country)
+
+    def result(modification):
+        updated = modification.apply(plan)
+        return {"reply": modification.reply, "plan": updated or plan, "updated": bool(updated)}
+
+    if wants_stream(request, body):
+        modification = lch.stream_modify_nutrition_plan(*args)
+        return await stream("modify-nutrition-plan", lambda: modification, finish=lambda: result(modification))
+    return await call("modify-nutrition-plan", lambda: result(lch.modify_nutrition_plan(*args)))
+
+async def healthz(request):
+    return JSONResponse({
+        "status": "ok",
+        "endpoints": {e.name: {"limit": e.limit, "in_flight": e.in_flight, "rejected": e.rejected,
+                               "timeouts": e.timeouts} for e in ENDPOINTS.values()},
+        "llm": resilience.guard.stats(),
+    })
+
+async def metrics(request):
+    lines = []
+    for metric, attr, help_text in (
+        ("fitvisor_api_in_flight", "in_flight", "Requests currently running, per endpoint"),
+        ("fitvisor_api_rejected_total", "rejected", "Requests refused with 503 at the concurrency limit"),
+        ("fitvisor_api_timeouts_total", "timeouts", "Requests that hit the API deadline"),
+    ):
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {'gauge' if attr == 'in_flight' else 'counter'}")
+        lines.extend(f'{metric}{{endpoint="{e.name}"}} {getattr(e, attr)}' for e in ENDPOINTS.values())
+    llm = resilience.guard.stats()
+    lines.append("# HELP fitvisor_llm_events_total Model call attempts, errors, timeouts, hedges and fallbacks per function")
+    lines.append("# TYPE fitvisor_llm_events_total counter")
+    lines.extend(f'fitvisor_llm_events_total{{function="{function}",event="{event}"}} {count}'
+                 for function, events in sorted(llm["functions"].items()) for event, count in sorted(events.items()))
+    lines.append("# HELP fitvisor_llm_breaker_open 1 while the backend circuit breaker is open or half open")
+    lines.append("# TYPE fitvisor_llm_breaker_open gauge")
+    lines.append(f"fitvisor_llm_breaker_open {int(llm['breaker'] != 'closed')}")
+    return PlainTextResponse(telemetry.metrics.prometheus_text() + "\n".join(lines) + "\n",
+                             media_type="text/plain; version=0.0.4")
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    lch.warm_up_in_background()
+    yield
+    _executor.shutdown(wait=False, cancel_futures=True)
+
+
+app = Starlette(
+    routes=[
+        Route("/v1/targets", targets, methods=["POST"]),
+        Route("/v1/fitness-plan", fitness_plan, methods=["POST"]),
+        Route("/v1/workouts", workouts, methods=["POST"]),
+        Route("/v1/nutrition-plan", nutrition_plan, methods=["POST"]),
+        Route("/v1/nutrition-plan/modify", modify_nutrition_plan, methods=["POST"]),
+        Route("/v1/chat", chat, methods=["POST"]),
+        Route("/healthz", healthz),
+        Route("/metrics", metrics),
+    ],
+    lifespan=lifespan,
+)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the FitVisor JSON API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--keep-alive", type=int, default=75,
+                        help="Seconds idle client connections stay open (keep above your proxy's)")
+    args = parser.parse_args(argv)
+
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, timeout_keep_alive=args.keep_alive, log_level="info")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,218 @@
+"""Generate plans for many profiles without the Streamlit UI.
+
+Reads profiles from JSONL or CSV (same fields main.py collects) and runs
+generate_fitness_plan, get_daily_workouts and get_nutrition_plan for each.
+Results are appended to a JSONL file as profiles finish; rerunning with the
+same output file skips profiles that already succeeded.
+
+    python batch_generate.py partners.csv -o results.jsonl --concurrency 8 --rate 60
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import Langchain_helper as lch
+import metabolic
+import resilience
+
+REQUIRED_FIELDS = ["age", "gender", "weight", "height", "fitness_goal",
+                   "workout_days", "workout_level", "workout_type", "diet_pref"]
+INT_FIELDS = ["age", "workout_days"]
+FLOAT_FIELDS = ["weight", "height"]
+
+
+def load_profiles(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.lower().endswith(".csv"):
+            rows = list(csv.DictReader(f))
+        else:
+            rows = [json.loads(line) for line in f if line.strip()]
+
+    profiles = []
+    for line_no, row in enumerate(rows, start=1):
+        missing = [field for field in REQUIRED_FIELDS if row.get(field) in (None, "")]
+        if missing:
+            raise ValueError(f"{path}: profile {line_no} is missing {', '.join(missing)}")
+        profile = dict(row)
+        for field in INT_FIELDS:
+            profile[field] = int(float(profile[field]))
+        for field in FLOAT_FIELDS:
+            value = float(profile[field])
+            profile[field] = int(value) if value.is_integer() else value
+        profile.setdefault("country", "Other")
+        profile["id"] = str(row.get("id") or profile_id(profile))
+        profiles.append(profile)
+    return profiles
+
+# Stable id for profiles that don't bring their own
+def profile_id(profile):
+    payload = json.dumps({field: profile.get(field) for field in REQUIRED_FIELDS + ["country", "name"]}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+class RateLimiter:
+    # Token bucket shared by all workers: at most `rate` calls per second
+    # on average, with bursts up to `burst`
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.rate:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class ResultsLog:
+    # Append-only JSONL checkpoint. Each finished profile is one line,
+    # flushed and fsynced before the next, so a crash loses at most the
+    # profiles that were still in flight.
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def completed_ids(self):
+        done = set()
+        if not os.path.exists(self.path):
+            return done
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # torn final line from a crash
+                if record.get("status") == "ok":
+                    done.add(record["id"])
+        return done
+
+    def append(self, record):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+
+# Stored results must be real answers, so a profile whose model calls give
+# up fails (and is retried on the next run) instead of saving a fallback.
+# Retries happen inside each helper (resilience.guard); the limiter is
+# charged for every request they send.
+def generate_for_profile(profile, daily_calories, limiter):
+    with resilience.no_fallback(), resilience.before_attempt(limiter.acquire):
+        return _generate(profile, daily_calories)
+
+def _generate(profile, daily_calories):
+    p = profile
+    plan = lch.generate_fitness_plan(
+        p["age"], p["gender"], p["weight"], p["height"], p["fitness_goal"],
+        p["workout_days"], p["workout_level"], p["workout_type"], p["diet_pref"]
+    )
+    workouts = lch.get_daily_workouts(
+        p["workout_days"], p["fitness_goal"], p["workout_level"], p["workout_type"]
+    )
+    nutrition_plan = lch.get_nutrition_plan(
+        p["age"], p["gender"], p["weight"], p["height"], p["fitness_goal"],
+        p["diet_pref"], daily_calories, p["country"]
+    )
+    return {"plan": plan, "workouts": workouts, "nutrition_plan": nutrition_plan}
+
+
+def run(profiles, output, concurrency=4, rate=None, log=sys.stderr):
+    results = ResultsLog(output)
+    done = results.completed_ids()
+    pending = [p for p in profiles if p["id"] not in done]
+    print(f"{len(profiles)} profiles, {len(profiles) - len(pending)} already done, {len(pending)} to run", file=log)
+    if not pending:
+        return {"ok": 0, "failed": 0, "skipped": len(profiles),
+                "profiles_per_minute": 0.0, "failures_per_minute": 0.0}
+
+    # Calorie targets for the whole batch in one vectorized pass
+    daily_calories = metabolic.targets_for_profiles(pending)["daily_calories"]
+    limiter = RateLimiter(rate, burst=concurrency)
+
+    ok = failed = 0
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {
+            executor.submit(generate_for_profile, profile, int(calories), limiter): profile
+            for profile, calories in zip(pending, daily_calories)
+        }
+        for future in as_completed(futures):
+            profile = futures[future]
+            record = {"id": profile["id"], "profile": profile, "finished_at": time.time()}
+            try:
+                record.update(status="ok", **future.result())
+                ok += 1
+            except Exception as e:
+                record.update(status="error", error=f"{type(e).__name__}: {e}")
+                failed += 1
+            results.append(record)
+
+            elapsed = time.monotonic() - started
+            print(f"[{ok + failed}/{len(pending)}] {profile['id']} {record['status']} "
+                  f"({ok / elapsed * 60:.1f} ok/min, {failed / elapsed * 60:.1f} failed/min)", file=log)
+
+    # Throughput counts generated profiles only; fast failures (e.g. an
+    # open circuit breaker) are reported as their own rate
+    elapsed = time.monotonic() - started
+    summary = {
+        "ok": ok,
+        "failed": failed,
+        "skipped": len(profiles) - len(pending),
+        "seconds": round(elapsed, 2),
+        "profiles_per_minute": round(ok / elapsed * 60, 2) if elapsed else 0.0,
+        "failures_per_minute": round(failed / elapsed * 60, 2) if elapsed else 0.0,
+    }
+    print(f"Done: {ok} ok, {failed} failed in {elapsed:.1f}s "
+          f"({summary['profiles_per_minute']} profiles/min, {summary['failures_per_minute']} failures/min)",
+          file=log)
+    return summary
+
+
+# CLI overrides for the model call retries in resilience.guard
+def configure_retries(retries=None, backoff=None):
+    if retries is not None:
+        resilience.guard.retries = retries
+    if backoff is not None:
+        resilience.guard.backoff = backoff
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate FitVisor plans for a batch of profiles.")
+    parser.add_argument("input", help="Profiles as .jsonl or .csv")
+    parser.add_argument("-o", "--output", default="results.jsonl", help="Append-only results/checkpoint file")
+    parser.add_argument("-c", "--concurrency", type=int, default=4, help="Profiles generated in parallel")
+    parser.add_argument("-r", "--rate", type=float, default=None,
+                        help="Max LLM calls per second across all workers (default: unlimited)")
+    parser.add_argument("--retries", type=int, default=None,
+                        help="Retries per LLM call within its deadline (default: FITVISOR_LLM_RETRIES)")
+    parser.add_argument("--backoff", type=float, default=None,
+                        help="Base backoff in seconds between retries (default: FITVISOR_LLM_BACKOFF)")
+    args = parser.parse_args(argv)
+
+    configure_retries(args.retries, args.backoff)
+    summary = run(load_profiles(args.input), args.output, args.concurrency, args.rate)
+    print(json.dumps(summary))
+    return 0 if summary["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,338 @@
+"""Benchmark main.py under many scripted user sessions.
+
+Each virtual session drives the app headlessly with Streamlit's AppTest
+against the offline fake LLM backend: onboarding steps 1-3, then the Home,
+Workouts, Nutrition (with chat messages), Recipe Chat (with chat messages)
+and Progress pages. Records the time of every rerun per step, LLM calls per
+session (by prompt), session state size and process memory growth per
+session, and p50/p95/p99 latency.
+
+AppTest runs one script at a time per process, so concurrency comes from
+worker processes: each runs its share of the sessions back to back, and all
+share one on-disk response cache and session database, like replicas of a
+deployment. Run with --baseline to fail (exit 1) when a step's p95, LLM
+calls per session or session state size regresses.
+
+    python bench_sessions.py --sessions 50 --workers 4
+    python bench_sessions.py --sessions 500 --workers 16 --fake-latency 0.5 --json sessions.json
+    python bench_sessions.py --sessions 50 --baseline sessions.json --tolerance 0.25
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MAIN = os.path.join(HERE, "main.py")
+
+PAGES = ["Home", "Workouts", "Nutrition", "Recipe Chat", "Progress"]
+CHAT_PAGES = {"Nutrition", "Recipe Chat"}
+
+# Options as the onboarding form offers them
+GENDERS = ["Male", "Female"]
+COUNTRIES = ["India", "United States", "United Kingdom", "Canada", "Australia", "Singapore", "UAE", "Other"]
+GOALS = ["Weight Loss", "Weight Gain", "Build Muscle", "Improve Flexibility", "Maintain"]
+LEVELS = ["Beginner", "Intermediate", "Advanced"]
+TYPES = ["Home", "Gym", "Yoga"]
+DIETS = ["Vegetarian", "Non-Vegetarian", "Vegan"]
+MESSAGES = {
+    "Nutrition": ["Swap my lunch for something lighter", "calories in 100g paneer",
+                  "Can I have more protein at breakfast?", "Replace dinner with a quick option"],
+    "Recipe Chat": ["What is a quick high protein breakfast?", "protein in 2 eggs",
+                    "Give me a post-workout snack idea", "How do I meal prep for the week?"],
+}
+
+# Timing noise allowed on top of --tolerance when comparing p95s
+SLACK_SECONDS = 0.05
+
+
+def make_profiles(count, seed):
+    rng = random.Random(seed)
+    return [{
+        "name": f"User {i}",
+        "age": rng.randint(18, 65),
+        "gender": rng.choice(GENDERS),
+        "height": rng.randint(150, 195),
+        "weight": rng.randint(50, 110),
+        "country": rng.choice(COUNTRIES),
+        "fitness_goal": rng.choice(GOALS),
+        "workout_level": rng.choice(LEVELS),
+        "workout_type": rng.choice(TYPES),
+        "workout_days": rng.randint(2, 6),
+        "diet_pref": rng.choice(DIETS),
+    } for i in range(count)]
+
+
+def _rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # peak, KiB on Linux
+
+
+# ---------------- WORKER ----------------
+# Runs in the worker processes; the app modules are imported here, after
+# the parent has set the environment they read at import.
+
+_worker = {}
+
+
+class SessionError(Exception):
+    pass
+
+
+def _warm_up(timeout):
+    from streamlit.testing.v1 import AppTest
+    AppTest.from_file(MAIN, default_timeout=timeout).run()
+    _worker["rss"] = _rss_bytes()
+
+
+def _state_bytes(app):
+    import session_store
+    size = 0
+    for key, value in app.session_state.items():
+        try:
+            size += len(session_store.encode(value))
+        except TypeError:
+            pass  # in-process only (e.g. prefetch futures)
+    return size
+
+
+def run_session(task):
+    index, profile, chats, timeout = task
+    from streamlit.testing.v1 import AppTest
+    from llm_backend import get_backend
+
+    if "rss" not in _worker:
+        _warm_up(timeout)
+    backend = get_backend()
+    calls_before = Counter(backend.calls)
+    rng = random.Random(index)
+    steps = []
+
+    def timed(name, app):
+        started = time.perf_counter()
+        app.run()
+        steps.append((name, time.perf_counter() - started))
+        if app.exception:
+            raise SessionError(f"{name}: {app.exception[0].value}")
+        return app
+
+    p = profile
+    started = time.perf_counter()
+    record = {"index": index}
+    try:
+        app = timed("open", AppTest.from_file(MAIN, default_timeout=timeout))
+
+        app.text_input[0].input(p["name"])
+        app.number_input[0].set_value(p["age"])
+        app.selectbox[0].set_value(p["gender"])
+        app.number_input[1].set_value(p["height"])
+        app.number_input[2].set_value(p["weight"])
+        app.selectbox[1].set_value(p["country"])
+        app.button[0].click()
+        timed("step1", app)
+
+        app.radio[0].set_value(p["fitness_goal"])
+        app.radio[1].set_value(p["workout_level"])
+        app.radio[2].set_value(p["workout_type"])
+        app.button[1].click()
+        timed("step2", app)
+
+        app.slider[0].set_value(p["workout_days"])
+        app.radio[1].set_value(p["diet_pref"])
+        app.checkbox[0].check()
+        app.checkbox[1].check()
+        app.button[1].click()
+        timed("step3", app)
+        if app.session_state["step"] != 4:
+            raise SessionError(f"onboarding ended on step {app.session_state['step']}")
+
+        for page in PAGES:
+            app.sidebar.radio[0].set_value(page)
+            timed(page, app)
+            if page in CHAT_PAGES:
+                for _ in range(chats):
+                    app.chat_input[0].set_value(rng.choice(MESSAGES[page]))
+                    timed(f"{page} chat", app)
+        record["state_bytes"] = _state_bytes(app)
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+
+    rss = _rss_bytes()
+    record.update(
+        seconds=time.perf_counter() - started,
+        steps=steps,
+        llm_calls=dict(Counter(backend.calls) - calls_before),
+        rss_growth=rss - _worker["rss"],
+        rss=rss,
+        pid=os.getpid(),
+    )
+    _worker["rss"] = rss
+    return record
+
+
+# ---------------- REPORT ----------------
+
+def _stats(values):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+
+    def pct(q):
+        return round(ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))], 4)
+
+    return {"n": len(ordered), "mean": round(statistics.fmean(ordered), 4),
+            "p50": pct(0.5), "p95": pct(0.95), "p99": pct(0.99), "max": round(ordered[-1], 4)}
+
+
+def summarize(records, seconds):
+    steps = defaultdict(list)
+    by_prompt = Counter()
+    for record in records:
+        for name, value in record["steps"]:
+            steps[name].append(value)
+        by_prompt.update(record["llm_calls"])
+    ok = [r for r in records if "error" not in r]
+    worker_rss = {}
+    for record in records:
+        worker_rss[record["pid"]] = max(worker_rss.get(record["pid"], 0), record["rss"])
+    return {
+        "sessions": len(records),
+        "errors": len(records) - len(ok),
+        "error_samples": sorted({r["error"] for r in records if "error" in r})[:10],
+        "seconds": round(seconds, 3),
+        "sessions_per_minute": round(len(records) / seconds * 60, 2) if seconds else 0.0,
+        "steps": {name: _stats(steps[name]) for name in steps},
+        "session_seconds": _stats([r["seconds"] for r in ok]),
+        "llm_calls": {
+            "total": sum(by_prompt.values()),
+            "per_session": _stats([sum(r["llm_calls"].values()) for r in ok]),
+            "by_prompt": dict(by_prompt.most_common()),
+        },
+        "memory": {
+            "state_bytes": _stats([r["state_bytes"] for r in ok]),
+            "rss_growth_bytes_per_session": _stats([r["rss_growth"] for r in records]),
+            "worker_rss_bytes": max(worker_rss.values()) if worker_rss else 0,
+        },
+    }
+
+
+# Regressions of `report` against a saved `baseline` report, as messages
+def compare(report, baseline, tolerance):
+    problems = []
+    for name, old in (baseline.get("steps") or {}).items():
+        new = report["steps"].get(name)
+        if new and old and new["p95"] > old["p95"] * (1 + tolerance) + SLACK_SECONDS:
+            problems.append(f"{name} p95 {new['p95']:.3f}s vs baseline {old['p95']:.3f}s")
+    for label, path in (("LLM calls per session", ("llm_calls", "per_session")),
+                        ("session state bytes", ("memory", "state_bytes"))):
+        old, new = baseline, report
+        for key in path:
+            old, new = (old or {}).get(key), (new or {}).get(key)
+        if old and new and new["mean"] > old["mean"] * (1 + tolerance):
+            problems.append(f"{label} {new['mean']:g} vs baseline {old['mean']:g}")
+    return problems
+
+
+def run(sessions=50, workers=4, profiles=25, chats=2, seed=0, timeout=120, log=sys.stderr):
+    tasks = [(i, profile, chats, timeout) for i, profile in
+             enumerate(make_profiles(profiles, seed)[i % profiles] for i in range(sessions))]
+    # AppTest makes main.py the worker's __main__, so refer to the task by
+    # this module's name rather than as __main__.run_session
+    from bench_sessions import run_session as task
+
+    records = []
+    # spawn: workers start clean instead of forking this process's threads
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(processes=min(workers, sessions)) as pool:
+        started = time.perf_counter()
+        for record in pool.imap_unordered(task, tasks):
+            records.append(record)
+            if "error" in record or len(records) % max(1, sessions // 10) == 0:
+                print(f"[{len(records)}/{sessions}] {record.get('error', 'ok')}", file=log)
+        seconds = time.perf_counter() - started
+    return summarize(records, seconds)
+
+
+def print_report(report, log=sys.stderr):
+    print(f"{report['sessions']} sessions in {report['seconds']:.1f}s "
+          f"({report['sessions_per_minute']} sessions/min), {report['errors']} errors", file=log)
+    for name, row in report["steps"].items():
+        print(f"  {name:18} n={row['n']:<5} p50 {row['p50']:.3f}s  p95 {row['p95']:.3f}s  "
+              f"p99 {row['p99']:.3f}s  max {row['max']:.3f}s", file=log)
+    calls = report["llm_calls"]["per_session"]
+    memory = report["memory"]
+    if calls:
+        print(f"  LLM calls/session: mean {calls['mean']:g}, max {calls['max']:g} "
+              f"({report['llm_calls']['total']} total)", file=log)
+    if memory["state_bytes"]:
+        print(f"  session state: mean {memory['state_bytes']['mean'] / 1024:.1f} KiB; process growth/session: "
+              f"median {memory['rss_growth_bytes_per_session']['p50'] / 1024:.0f} KiB; "
+              f"worker RSS {memory['worker_rss_bytes'] / 2 ** 20:.0f} MiB", file=log)
+    for error in report["error_samples"]:
+        print(f"  ! {error}", file=log)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark FitVisor's Streamlit app under many sessions.")
+    parser.add_argument("-s", "--sessions", type=int, default=50, help="Scripted user sessions to run")
+    parser.add_argument("-w", "--workers", type=int, default=4, help="Worker processes running sessions at once")
+    parser.add_argument("--profiles", type=int, default=25, help="Distinct user profiles (cache diversity)")
+    parser.add_argument("--chats", type=int, default=2, help="Chat messages per chat page")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds allowed per rerun")
+    parser.add_argument("--fake-latency", type=float, default=0.2, help="Fake backend seconds to first token")
+    parser.add_argument("--fake-jitter", type=float, default=0.0, help="Fake backend lognormal sigma")
+    parser.add_argument("--tokens-per-sec", type=float, default=400, help="Fake backend streaming rate (0 = instant)")
+    parser.add_argument("--json", metavar="PATH", help="Also write the report as JSON")
+    parser.add_argument("--baseline", metavar="PATH", help="Earlier --json report to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression vs the baseline")
+    args = parser.parse_args(argv)
+
+    # Shared by the workers through their environment. Caches and sessions
+    # start empty so runs are comparable.
+    scratch = tempfile.mkdtemp(prefix="fitvisor-bench-")
+    os.environ.update(
+        FITVISOR_LLM_BACKEND="fake",
+        FITVISOR_FAKE_LATENCY=str(args.fake_latency),
+        FITVISOR_FAKE_DISTRIBUTION="lognormal" if args.fake_jitter else "fixed",
+        FITVISOR_FAKE_JITTER=str(args.fake_jitter),
+        FITVISOR_FAKE_TOKENS_PER_SEC=str(args.tokens_per_sec) if args.tokens_per_sec else "",
+        FITVISOR_CACHE_DIR=os.path.join(scratch, "cache"),
+        FITVISOR_SESSION_DB=os.path.join(scratch, "sessions.db"),
+        FITVISOR_PROGRESS_DIR=os.path.join(scratch, "progress"),
+        FITVISOR_TRACE_LOG="",
+        FITVISOR_METRICS_PORT="",
+    )
+    try:
+        report = run(args.sessions, args.workers, args.profiles, args.chats, args.seed, args.timeout)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    report["config"] = {key: value for key, value in vars(args).items() if key not in ("json", "baseline")}
+
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    problems = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            problems = compare(report, json.load(f), args.tolerance)
+        for problem in problems:
+            print(f"  REGRESSION {problem}", file=sys.stderr)
+    return 1 if problems or report["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
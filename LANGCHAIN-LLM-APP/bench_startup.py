@@ -0,0 +1,116 @@
+"""Measure FitVisor's cold-start cost.
+
+Each sample runs in a fresh interpreter so nothing is already imported:
+
+  import_helper   time to `import Langchain_helper`
+  llm_libraries   time to load LangChain + Google GenAI (deferred to first use)
+  first_paint     process start until main.py's first run (onboarding Step 1)
+                  finishes rendering, via Streamlit's AppTest
+
+It also reports which heavy modules were already loaded at first paint.
+
+    python bench_startup.py --runs 5
+    python bench_startup.py --runs 10 --json startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+HEAVY_MODULES = ["langchain_google_genai", "langchain", "google.ai.generativelanguage_v1beta", "numpy"]
+
+_PROBES = {
+    "import_helper": """
+import time
+start = time.perf_counter()
+import Langchain_helper
+result = {"seconds": time.perf_counter() - start}
+""",
+    "llm_libraries": """
+import time
+import llm_backend
+start = time.perf_counter()
+llm_backend.load_llm_libraries()
+result = {"seconds": time.perf_counter() - start}
+""",
+    "first_paint": """
+import time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file(MAIN, default_timeout=120)
+app.run()
+result = {"seconds": time.perf_counter() - start, "errors": len(app.exception)}
+""",
+}
+
+_RUNNER = """
+import json, sys
+MAIN = {main!r}
+{probe}
+result["loaded"] = [name for name in {heavy!r} if name in sys.modules]
+print("BENCH " + json.dumps(result))
+"""
+
+
+def run_probe(name, warmup):
+    code = _RUNNER.format(main=os.path.join(HERE, "main.py"), probe=_PROBES[name], heavy=HEAVY_MODULES)
+    env = dict(os.environ, FITVISOR_BACKGROUND_WARMUP="1" if warmup else "0", FITVISOR_TRACE_LOG="")
+    env.setdefault("FITVISOR_LLM_BACKEND", "fake")
+    completed = subprocess.run(
+        [sys.executable, "-c", code], cwd=HERE, env=env, capture_output=True, text=True, check=True
+    )
+    for line in completed.stdout.splitlines():
+        if line.startswith("BENCH "):
+            return json.loads(line[len("BENCH "):])
+    raise RuntimeError(f"{name} probe printed no result:\n{completed.stderr}")
+
+
+def summarize(samples):
+    seconds = sorted(sample["seconds"] for sample in samples)
+    p95_index = min(len(seconds) - 1, int(round(0.95 * (len(seconds) - 1))))
+    return {
+        "runs": len(seconds),
+        "min": round(seconds[0], 4),
+        "median": round(statistics.median(seconds), 4),
+        "p95": round(seconds[p95_index], 4),
+        "loaded": samples[-1]["loaded"],
+    }
+
+
+def run(runs=5, scenarios=None, log=sys.stderr):
+    scenarios = scenarios or [
+        ("import_helper", False),
+        ("llm_libraries", False),
+        ("first_paint", False),
+        ("first_paint", True),
+    ]
+    report = {"python": sys.version.split()[0], "results": {}}
+    for name, warmup in scenarios:
+        label = f"{name}+background_warmup" if warmup else name
+        samples = [run_probe(name, warmup) for _ in range(runs)]
+        report["results"][label] = summarize(samples)
+        row = report["results"][label]
+        print(f"{label:32} median {row['median']:.3f}s  p95 {row['p95']:.3f}s  "
+              f"loaded: {', '.join(row['loaded']) or '-'}", file=log)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark FitVisor cold-start time.")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per scenario")
+    parser.add_argument("--json", metavar="PATH", help="Also write the report as JSON")
+    args = parser.parse_args(argv)
+
+    report = run(args.runs)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
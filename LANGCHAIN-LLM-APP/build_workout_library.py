@@ -0,0 +1,91 @@
+"""Precompute every weekly workout plan the app can ask for.
+
+Generates get_daily_workouts for all combinations of days per week, goal,
+level and workout type (see workout_library.py), validates each week and
+writes them to one memory-mappable library file. With
+FITVISOR_WORKOUT_SOURCE=llm the app serves the Workouts page from the library
+while its version matches the current prompt version and backend; after a
+prompt change it generates live until the library is rebuilt.
+
+    python build_workout_library.py
+    python build_workout_library.py -o workout_library.bin --concurrency 8 --rate 2
+"""
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import Langchain_helper as lch
+from batch_generate import RateLimiter, configure_retries
+import resilience
+from response_cache import response_cache
+import workout_library
+
+
+# The model is asked again when the validator rejects its week; failed
+# calls are already retried inside the helper (resilience.guard)
+def generate_week(combo, limiter, attempts):
+    with resilience.before_attempt(limiter.acquire):
+        for _ in range(attempts):
+            plans = lch.generate_daily_workouts(*combo)
+            problems = workout_library.validate(plans, combo[0])
+            if not problems:
+                return plans
+            # Don't let the next attempt (or the app) reuse the rejected answer
+            response_cache.delete(lch.generate_daily_workouts.cache_key(*combo))
+    raise ValueError(f"{combo}: {'; '.join(problems)}")
+
+
+def build(output, concurrency=4, rate=None, invalid_retries=2, log=sys.stderr):
+    combos = list(workout_library.combinations())
+    limiter = RateLimiter(rate, burst=concurrency)
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(generate_week, combo, limiter, invalid_retries + 1) for combo in combos]
+        plans, failures = [], []
+        for done, (combo, future) in enumerate(zip(combos, futures), start=1):
+            try:
+                plans.append(future.result())
+            except Exception as e:
+                failures.append(f"{type(e).__name__}: {e}")
+            print(f"[{done}/{len(combos)}] {' / '.join(map(str, combo))}", file=log)
+
+    if failures:
+        for failure in failures:
+            print(failure, file=log)
+        raise SystemExit(f"{len(failures)} of {len(combos)} weeks failed; library not written")
+
+    version = lch.cache_version()
+    size = workout_library.write_library(output, version, plans)
+    summary = {
+        "weeks": len(plans),
+        "version": version,
+        "bytes": size,
+        "seconds": round(time.monotonic() - started, 2),
+    }
+    print(f"Wrote {output}: {len(plans)} weeks, {size} bytes, version {version}", file=log)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the precomputed FitVisor workout library.")
+    parser.add_argument("-o", "--output", default=workout_library.DEFAULT_PATH, help="Library file to write")
+    parser.add_argument("-c", "--concurrency", type=int, default=4, help="Weeks generated in parallel")
+    parser.add_argument("-r", "--rate", type=float, default=None,
+                        help="Max LLM calls per second across all workers (default: unlimited)")
+    parser.add_argument("--invalid-retries", type=int, default=2,
+                        help="Times a week the validator rejects is generated again")
+    parser.add_argument("--retries", type=int, default=None,
+                        help="Retries per failed LLM call within its deadline (default: FITVISOR_LLM_RETRIES)")
+    parser.add_argument("--backoff", type=float, default=None,
+                        help="Base backoff in seconds between retries (default: FITVISOR_LLM_BACKOFF)")
+    args = parser.parse_args(argv)
+
+    configure_retries(args.retries, args.backoff)
+    summary = build(args.output, args.concurrency, args.rate, args.invalid_retries)
+    print(json.dumps(summary))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+import os
+import re
+from collections import deque
+from itertools import islice
+
+# A chat transcript with constant-size cost. The newest messages are kept
+# verbatim in a ring buffer (for rendering and the prompt); every message
+# that falls out of the prompt window is folded, as it leaves, into a short
+# extractive summary, so older turns still reach the model without growing
+# the prompt. Nothing here calls the LLM.
+
+MAX_MESSAGES = int(os.getenv("FITVISOR_CHAT_HISTORY_SIZE", "50"))
+SUMMARY_CHARS = int(os.getenv("FITVISOR_CHAT_SUMMARY_CHARS", "1500"))
+
+# Messages kept verbatim in prompts; older ones are summarized
+RECENT_MESSAGES = 6
+# Longest single message quoted verbatim in a prompt (plans can be long)
+CONTEXT_MESSAGE_CHARS = 800
+
+_MARKUP = re.compile(r"[*_`#>|]+")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+
+def _plain(text):
+    return " ".join(_MARKUP.sub(" ", str(text)).split())
+
+def _clip(text, limit):
+    if len(text) <= limit:
+        return text
+    cut = text[:limit].rsplit(" ", 1)[0]
+    return cut + "…"
+
+def _first_sentence(text, limit):
+    text = _plain(text)
+    return _clip(_SENTENCE_END.split(text, 1)[0], limit)
+
+
+class ChatHistory:
+    # Drop-in for the list of {"role", "content"} dicts main.py used to keep:
+    # append, iterate, len() and slicing work the same.
+    def __init__(self, messages=(), summary=(), total=0, summarized=0, pending=None,
+                 max_messages=None, summary_chars=None):
+        self.max_messages = max(max_messages or MAX_MESSAGES, RECENT_MESSAGES + 1)
+        self.summary_chars = summary_chars or SUMMARY_CHARS
+        self.messages = deque(maxlen=self.max_messages)
+        self.summary = list(summary)  # one line per earlier exchange, oldest first
+        self.total = total            # messages ever appended
+        self.summarized = summarized  # messages folded into the summary
+        self._pending = pending       # summarized question awaiting its answer
+        if total:
+            self.messages.extend(messages)
+        else:
+            for message in messages:
+                self.append(message)
+
+    # Accepts what older sessions stored (a plain list), a to_dict() dict,
+    # None, or a ChatHistory
+    @classmethod
+    def from_value(cls, value):
+        if isinstance(value, cls):
+            return value
+        if isinstance(value, dict):
+            return cls(**value)
+        return cls(value or ())
+
+    def to_dict(self):
+        return {
+            "messages": list(self.messages),
+            "summary": self.summary,
+            "total": self.total,
+            "summarized": self.summarized,
+            "pending": self._pending,
+        }
+
+    def append(self, message):
+        self.messages.append({"role": message["role"], "content": message["content"]})
+        self.total += 1
+        while self.total - self.summarized > RECENT_MESSAGES:
+            self._fold(self.messages[self.summarized - self.total + len(self.messages)])
+
+    # Fold one message leaving the prompt window into the summary. A
+    # question waits for its answer so an exchange becomes one line.
+    def _fold(self, message):
+        self.summarized += 1
+        if message["role"] == "user":
+            if self._pending:
+                self._add_summary(f"User asked: {self._pending}")
+            self._pending = _clip(_plain(message["content"]), 120)
+            return
+        answer = _first_sentence(message["content"], 160)
+        if self._pending:
+            self._add_summary(f"User asked: {self._pending} → {answer}")
+            self._pending = None
+        else:
+            self._add_summary(f"Assistant: {answer}")
+
+    def _add_summary(self, line):
+        self.summary.append(line)
+        size = sum(len(item) for item in self.summary)
+        while size > self.summary_chars and len(self.summary) > 1:
+            size -= len(self.summary.pop(0))
+
+    # Prompt context: the summary of older turns, then the last `last`
+    # messages verbatim (messages between the two are summarized on the fly)
+    def context(self, last=RECENT_MESSAGES):
+        recent = list(islice(self.messages, max(0, len(self.messages) - last), None))
+        lines = []
+        if self.summary or self._pending:
+            lines.append("Summary of earlier conversation:")
+            lines.extend(f"- {line}" for line in self.summary)
+            if self._pending:
+                lines.append(f"- User asked: {self._pending}")
+        gap = self.total - self.summarized - len(recent)
+        if gap > 0:
+            start = len(self.messages) - len(recent) - gap
+            lines.extend(f"- {m['role']}: {_first_sentence(m['content'], 160)}"
+                         for m in islice(self.messages, max(0, start), len(self.messages) - len(recent)))
+        lines.extend(f"{m['role']}: {_clip(m['content'], CONTEXT_MESSAGE_CHARS)}" for m in recent)
+        return "\n".join(lines) + "\n" if lines else ""
+
+    # Messages no longer kept verbatim (only in the summary, if at all)
+    @property
+    def dropped(self):
+        return self.total - len(self.messages)
+
+    # Page 0 is the newest `size` messages, page 1 the ones before, ...
+    def page_count(self, size):
+        return max(1, -(-len(self.messages) // size))
+
+    def page(self, number, size):
+        end = max(0, len(self.messages) - number * size)
+        return list(islice(self.messages, max(0, end - size), end))
+
+    def __iter__(self):
+        return iter(self.messages)
+
+    def __len__(self):
+        return len(self.messages)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self.messages)[index]
+        return self.messages[index]
+
+
+# Prompt context for a history given as a ChatHistory or a plain list
+def context(history, last=RECENT_MESSAGES):
+    return ChatHistory.from_value(history).context(last)
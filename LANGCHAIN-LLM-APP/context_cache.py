@@ -0,0 +1,98 @@
+import hashlib
+import os
+import re
+import threading
+import time
+
+
+class CacheablePrompt:
+    # A prompt split into a static instruction prefix, identical on every
+    # call, and a small variable suffix holding the user's details. Keeping
+    # the prefix byte-stable lets the provider cache it (implicitly, or via
+    # an explicit cached-content handle) instead of reprocessing it per call.
+    def __init__(self, prefix, suffix, input_variables):
+        self.prefix = prefix
+        self.suffix = suffix
+        self.input_variables = input_variables
+        # Full template in f-string syntax, for chains that want one piece
+        self.template = prefix.replace("{", "{{").replace("}", "}}") + suffix
+        self.prefix_key = hashlib.sha256(prefix.encode("utf-8")).hexdigest()[:16]
+        missing = set(re.findall(r"(?<!\{)\{(\w+)\}(?!\})", suffix)) - set(input_variables)
+        if missing:
+            raise ValueError(f"Suffix uses undeclared variables: {', '.join(sorted(missing))}")
+
+    def format_suffix(self, **variables):
+        return self.suffix.format(**variables)
+
+    def format(self, **variables):
+        return self.prefix + self.format_suffix(**variables)
+
+
+class ContextCache:
+    # Client-side bookkeeping for provider cached-content handles: one
+    # handle per distinct prefix, created on first use, reused until shortly
+    # before it expires and then recreated. `create(prefix, ttl_seconds)`
+    # does the provider call and returns the handle.
+    def __init__(self, create, ttl_seconds=3600, min_tokens=0, refresh_margin=60,
+                 count_tokens=None, clock=time.monotonic):
+        self._create = create
+        self.ttl_seconds = ttl_seconds
+        self.min_tokens = min_tokens
+        self.refresh_margin = min(refresh_margin, ttl_seconds / 2)
+        self._count_tokens = count_tokens or (lambda text: max(1, len(text) // 4))
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = {}  # prefix key -> (handle, expires_at)
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.invalidations = 0
+        self.skipped = 0
+
+    # The live handle for this prompt's prefix, or None when the prefix is
+    # too small for the provider to cache
+    def handle(self, prompt):
+        if self._count_tokens(prompt.prefix) < self.min_tokens:
+            with self._lock:
+                self.skipped += 1
+            return None
+        with self._lock:
+            entry = self._entries.get(prompt.prefix_key)
+            now = self._clock()
+            if entry and now < entry[1] - self.refresh_margin:
+                self.hits += 1
+                return entry[0]
+            # Creating under the lock keeps concurrent first calls from
+            # each paying for their own copy of the same prefix
+            handle = self._create(prompt.prefix, self.ttl_seconds)
+            self._entries[prompt.prefix_key] = (handle, now + self.ttl_seconds)
+            if entry:
+                self.refreshes += 1
+            else:
+                self.misses += 1
+            return handle
+
+    # Forget a handle the provider rejected (expired or evicted early)
+    def invalidate(self, prompt):
+        with self._lock:
+            if self._entries.pop(prompt.prefix_key, None):
+                self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "refreshes": self.refreshes,
+                "invalidations": self.invalidations,
+                "skipped": self.skipped,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def enabled_from_env():
+    return os.getenv("FITVISOR_CONTEXT_CACHE", "0").lower() in ("1", "true", "yes", "on")
@@ -0,0 +1,118 @@
+import metabolic
+import workout_engine
+import workout_library
+
+# Locally templated answers for when the model is unavailable (see
+# resilience.degrade). They use the same targets and section layout as the
+# generated versions, so the pages, MealPlan and the workout expanders work
+# unchanged, and say plainly that they are a standard plan.
+
+NOTICE = ("> ⚠️ The AI coach is unavailable right now, so this is a standard plan built "
+          "from your targets. Regenerate it later for a personalised version.\n\n")
+
+INTERRUPTED = "\n\n_⚠️ The AI coach stopped responding, so this answer is incomplete. Please try again._"
+
+
+# Whether a plan is a local template or was cut off mid-stream; callers
+# keep such plans out of durable storage so they are generated again
+def is_degraded(text):
+    return isinstance(text, str) and (NOTICE in text or text.endswith(INTERRUPTED))
+
+
+def fitness_plan(age, gender, weight, height, fitness_goal, workout_days, workout_level, workout_type, diet_pref):
+    t = metabolic.profile_targets(weight, height, age, gender, fitness_goal)
+    return (
+        NOTICE +
+        f"## Weekly Workout Split Overview\n"
+        f"- {workout_days} {workout_type.lower()} sessions per week at {workout_level.lower()} level, "
+        f"aimed at {fitness_goal.lower()}\n"
+        f"- Spread sessions across the week and keep at least one full rest day\n\n"
+        f"## Daily Calorie Requirements\n"
+        f"- BMR: {int(t['bmr'])} calories, maintenance (TDEE): {t['tdee']} calories\n"
+        f"- Daily target: **{t['daily_calories']} calories** ({t['calorie_adjustment']:+d} for your goal)\n\n"
+        f"## Macronutrient Targets\n"
+        f"- Protein: {t['protein_grams']}g\n"
+        f"- Carbohydrates: {t['carb_grams']}g\n"
+        f"- Fats: {t['fat_grams']}g\n"
+        f"- Fiber: {t['fiber_grams']}g\n\n"
+        f"## General Recommendations\n"
+        f"- Build meals around whole foods that fit a {diet_pref.lower()} diet\n"
+        f"- Drink about {t['water_intake']}L of water a day\n"
+        f"- Sleep 7-9 hours and track weight and workouts weekly\n"
+    )
+
+
+# ---------------- WORKOUTS ----------------
+
+# {day: markdown}: the prebuilt library's week if there is one (even from
+# an older prompt version), otherwise the rule-based week
+def daily_workouts(workout_days, fitness_goal, workout_level, workout_type):
+    library = workout_library.get_library()
+    if library is not None:
+        plans = library.get(workout_days, fitness_goal, workout_level, workout_type)
+        if plans is not None:
+            return plans
+    return workout_engine.build_week(workout_days, fitness_goal, workout_level, workout_type)
+
+
+# ---------------- NUTRITION ----------------
+
+MEALS = {
+    "Vegetarian": {
+        "breakfast": "Oats cooked in milk with banana and a handful of nuts",
+        "lunch": "Lentils, brown rice or whole wheat bread, and a large vegetable salad",
+        "snacks": "Greek yoghurt or paneer cubes with fruit",
+        "dinner": "Paneer or tofu with stir-fried vegetables and whole grains",
+    },
+    "Vegan": {
+        "breakfast": "Oats with soy milk, chia seeds and berries",
+        "lunch": "Chickpea and quinoa bowl with roasted vegetables",
+        "snacks": "Roasted chickpeas, hummus with carrots, or a piece of fruit",
+        "dinner": "Tofu or tempeh stir-fry with brown rice and greens",
+    },
+    "Non-Vegetarian": {
+        "breakfast": "Eggs with whole grain toast and fruit",
+        "lunch": "Grilled chicken, rice and a large vegetable salad",
+        "snacks": "Boiled eggs, yoghurt or a handful of nuts",
+        "dinner": "Fish or lean meat with vegetables and whole grains",
+    },
+}
+
+
+def nutrition_plan(age, gender, weight, height, fitness_goal, diet_pref, daily_calories, country):
+    t = metabolic.macro_targets(daily_calories, weight, fitness_goal)
+    meals = MEALS.get(diet_pref, MEALS["Vegetarian"])
+    return (
+        NOTICE +
+        f"## Macronutrient Breakdown\n"
+        f"- **Protein:** {t['protein_grams']}g ({t['protein_cals']} calories)\n"
+        f"- **Carbohydrates:** {t['carb_grams']}g ({t['carb_cals']} calories)\n"
+        f"- **Fats:** {t['fat_grams']}g ({t['fat_cals']} calories)\n"
+        f"- **Fiber:** {t['fiber_grams']}g\n\n"
+        f"## Sample Daily Meal Plan ({country} Cuisine)\n"
+        f"### 🌅 Breakfast ({t['breakfast_cals']} calories)\n"
+        f"- {meals['breakfast']}\n\n"
+        f"### 🍽️ Lunch ({t['lunch_cals']} calories)\n"
+        f"- {meals['lunch']}\n\n"
+        f"### 🥜 Snacks ({t['snack_cals']} calories)\n"
+        f"- {meals['snacks']}\n\n"
+        f"### 🌙 Dinner ({t['dinner_cals']} calories)\n"
+        f"- {meals['dinner']}\n\n"
+        f"## 💧 Hydration & Supplements\n"
+        f"- Water intake: minimum 35ml per kg body weight = {t['water_intake']}L per day\n"
+    )
+
+
+# ---------------- CHAT ----------------
+
+def chat_reply(user_message, *args, **kwargs):
+    return (
+        "Sorry, I can't reach the AI nutritionist right now, so I can't give a personalised answer. "
+        "Quick facts such as \"calories in 100g paneer\" still work, or try your question again in a minute."
+    )
+
+def modification_reply(user_message, *args, **kwargs):
+    return (
+        "Sorry, I can't reach the AI nutritionist right now, so your meal plan hasn't been changed. "
+        "Please try your request again in a minute."
+    )
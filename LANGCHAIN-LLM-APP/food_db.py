@@ -0,0 +1,240 @@
+import bisect
+import csv
+import os
+import re
+import threading
+from dataclasses import dataclass
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "food_data.csv")
+
+NUTRIENTS = ["kcal", "protein", "carbs", "fat", "fiber"]
+
+# Grams per unit; None means the unit is a count of pieces
+UNITS = {
+    "g": 1, "gm": 1, "gms": 1, "gram": 1, "grams": 1,
+    "kg": 1000, "kgs": 1000, "kilo": 1000, "kilos": 1000,
+    "ml": 1, "l": 1000, "litre": 1000, "litres": 1000, "liter": 1000, "liters": 1000,
+    "oz": 28.35, "ounce": 28.35, "ounces": 28.35,
+    "lb": 453.6, "lbs": 453.6, "pound": 453.6, "pounds": 453.6,
+    "piece": None, "pieces": None, "slice": None, "slices": None, "pc": None, "pcs": None,
+}
+_WORD_NUMBERS = {"a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "half": 0.5}
+
+# Which nutrient a question is asking about
+_NUTRIENT_WORDS = {
+    "calories": "kcal", "calorie": "kcal", "kcal": "kcal", "cals": "kcal", "cal": "kcal",
+    "protein": "protein", "proteins": "protein",
+    "carbs": "carbs", "carb": "carbs", "carbohydrates": "carbs", "carbohydrate": "carbs",
+    "fat": "fat", "fats": "fat",
+    "fiber": "fiber", "fibre": "fiber",
+    "macros": None, "nutrition": None, "nutrients": None,
+}
+
+# "How many calories in 100g paneer?", "protein in 2 eggs", "what are the macros of 1 roti"
+_QUESTION = re.compile(
+    r"^(?:how\s+(?:many|much)\s+|what\s*(?:'s|is|are)?\s+(?:the\s+)?)?"
+    r"(?P<nutrient>" + "|".join(sorted(_NUTRIENT_WORDS, key=len, reverse=True)) + r")\s+"
+    r"(?:is\s+|are\s+|does\s+|do\s+)?(?:there\s+)?(?:in|of|for)\s+(?P<rest>.+?)\s*[?.!]*$"
+)
+_LEADING_QUANTITY = re.compile(
+    r"^(?P<qty>\d+(?:\.\d+)?|" + "|".join(_WORD_NUMBERS) + r")\s*"
+    r"(?P<unit>" + "|".join(sorted(UNITS, key=len, reverse=True)) + r")?\b\s*(?:of\s+)?(?P<food>.+)$"
+)
+_TRAILING_QUANTITY = re.compile(
+    r"^(?P<food>.+?)\s+(?P<qty>\d+(?:\.\d+)?)\s*(?P<unit>" + "|".join(sorted(UNITS, key=len, reverse=True)) + r")$"
+)
+
+
+@dataclass
+class Food:
+    name: str
+    aliases: tuple
+    regions: tuple
+    kcal: float
+    protein: float
+    carbs: float
+    fat: float
+    fiber: float
+    piece_grams: float = None
+
+    # Nutrients for `grams` of this food
+    def per_grams(self, grams):
+        factor = grams / 100
+        return {nutrient: round(getattr(self, nutrient) * factor, 1) for nutrient in NUTRIENTS}
+
+
+def normalize_name(text):
+    text = re.sub(r"[^a-z0-9 ]", " ", text.casefold())
+    return " ".join(text.split())
+
+def _singular(word):
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    if word.endswith("oes") and len(word) > 4:
+        return word[:-2]
+    if word.endswith("s") and not word.endswith("ss") and len(word) > 3:
+        return word[:-1]
+    return word
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def _dice(a, b):
+    grams_a, grams_b = _trigrams(a), _trigrams(b)
+    return 2 * len(grams_a & grams_b) / (len(grams_a) + len(grams_b))
+
+# Whether every word of the query matches a word of `key` exactly, as a
+# prefix or with a typo. "butter chicken" must not answer for "butter",
+# nor "apple pie" for "apple": a dish named after one of its ingredients
+# goes to the LLM.
+def _covers(words, key, min_score):
+    key_words = [_singular(w) for w in key.split()]
+    return all(
+        any(k == w or k.startswith(w) or _dice(w, k) >= min_score for k in key_words)
+        for w in words
+    )
+
+
+class FoodIndex:
+    # Exact name/alias map, a sorted key list for prefix search, and a
+    # trigram inverted index for typo-tolerant lookup
+    def __init__(self, foods):
+        self.foods = foods
+        self._exact = {}
+        for i, food in enumerate(foods):
+            for key in (food.name, *food.aliases):
+                self._exact.setdefault(normalize_name(key), i)
+            # "dal (cooked)" is also reachable as "dal"
+            self._exact.setdefault(normalize_name(re.sub(r"\(.*?\)", "", food.name)), i)
+        self._sorted_keys = sorted(self._exact)
+        self._trigram_index = {}
+        for key in self._exact:
+            for gram in _trigrams(key):
+                self._trigram_index.setdefault(gram, set()).add(key)
+
+    @classmethod
+    def load(cls, path=DATA_PATH):
+        foods = []
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                foods.append(Food(
+                    name=row["name"],
+                    aliases=tuple(a for a in row["aliases"].split("|") if a),
+                    regions=tuple(r for r in row["regions"].split("|") if r),
+                    kcal=float(row["kcal"]),
+                    protein=float(row["protein"]),
+                    carbs=float(row["carbs"]),
+                    fat=float(row["fat"]),
+                    fiber=float(row["fiber"]),
+                    piece_grams=float(row["piece_grams"]) if row["piece_grams"] else None,
+                ))
+        return cls(foods)
+
+    def _by_prefix(self, prefix):
+        start = bisect.bisect_left(self._sorted_keys, prefix)
+        matches = []
+        for key in self._sorted_keys[start:]:
+            if not key.startswith(prefix):
+                break
+            matches.append(key)
+        return matches
+
+    def _by_trigram(self, query, min_score):
+        query_grams = _trigrams(query)
+        words = query.split()
+        overlap = {}
+        for gram in query_grams:
+            for key in self._trigram_index.get(gram, ()):
+                overlap[key] = overlap.get(key, 0) + 1
+        best_key, best_score = None, min_score
+        for key, shared in overlap.items():
+            if not _covers(words, key, min_score):
+                continue
+            # Dice coefficient over trigram sets
+            score = 2 * shared / (len(query_grams) + len(_trigrams(key)))
+            if score > best_score or (score == best_score and best_key and len(key) < len(best_key)):
+                best_key, best_score = key, score
+        return best_key
+
+    # Best matching Food for a free-text name, or None. Fuzzy matches must
+    # account for every word of the name (see _covers).
+    def lookup(self, name, min_score=0.5):
+        query = normalize_name(name)
+        if not query:
+            return None
+        singular = " ".join(_singular(w) for w in query.split())
+        for candidate in (query, singular):
+            if candidate in self._exact:
+                return self.foods[self._exact[candidate]]
+        for candidate in (query, singular):
+            words = candidate.split()
+            matches = [key for key in self._by_prefix(candidate) if _covers(words, key, min_score)]
+            if matches:
+                return self.foods[self._exact[min(matches, key=len)]]
+        key = self._by_trigram(singular, min_score)
+        return self.foods[self._exact[key]] if key else None
+
+
+_index = None
+_index_lock = threading.Lock()
+
+# Loaded on first use so startup doesn't pay for it
+def get_index():
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = FoodIndex.load()
+    return _index
+
+
+def _parse_quantity(rest):
+    for pattern in (_LEADING_QUANTITY, _TRAILING_QUANTITY):
+        match = pattern.match(rest)
+        if match:
+            qty = match.group("qty")
+            qty = float(_WORD_NUMBERS.get(qty, qty))
+            return qty, match.group("unit"), match.group("food").strip()
+    return None, None, rest.strip()
+
+
+# Answer a simple "nutrient in <quantity> <food>" question from the bundled
+# table. Returns None for anything it can't answer confidently, so callers
+# fall back to the LLM.
+def answer_quantity_question(message):
+    match = _QUESTION.match(message.strip().casefold())
+    if not match:
+        return None
+    nutrient = _NUTRIENT_WORDS[match.group("nutrient")]
+    qty, unit, food_name = _parse_quantity(match.group("rest"))
+
+    food = get_index().lookup(food_name)
+    if food is None:
+        return None
+
+    if qty is None:
+        grams, label = 100, f"100g {food.name}"
+    elif unit is None or UNITS[unit] is None:
+        if food.piece_grams is None:
+            return None
+        grams = qty * food.piece_grams
+        label = f"{qty:g} {unit or ('piece' if qty == 1 else 'pieces')} of {food.name} (~{grams:g}g)"
+    else:
+        grams = qty * UNITS[unit]
+        label = f"{qty:g}{unit} {food.name}" if UNITS[unit] == 1 else f"{qty:g} {unit} {food.name} ({grams:g}g)"
+
+    values = food.per_grams(grams)
+    parts = {
+        "kcal": f"{values['kcal']:g} kcal",
+        "protein": f"{values['protein']:g}g protein",
+        "carbs": f"{values['carbs']:g}g carbs",
+        "fat": f"{values['fat']:g}g fat",
+        "fiber": f"{values['fiber']:g}g fiber",
+    }
+    lead = nutrient or "kcal"
+    others = ", ".join(parts[n] for n in NUTRIENTS if n != lead)
+    return (
+        f"**{label}** has about **{parts[lead]}** ({others}).\n\n"
+        f"_Estimate from FitVisor's food table; actual values vary with recipe and brand._"
+    )
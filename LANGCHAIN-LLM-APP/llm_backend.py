@@ -0,0 +1,397 @@
+import json
+import os
+import random
+import threading
+import time
+from collections import Counter
+from context_cache import ContextCache, enabled_from_env
+from meal_plan import MealPlan, detect_target_section
+from workout_parser import DAYS
+
+MODEL_NAME = "gemini-1.5-flash"
+TEMPERATURE = 0.7
+
+# Load API key from Streamlit secrets or environment
+def get_api_key():
+    try:
+        import streamlit as st
+        return st.secrets["GOOGLE_API_KEY"]
+    except:
+        return os.getenv("GOOGLE_API_KEY")
+
+# Rough token count (~4 characters per token) used for accounting and pacing
+def estimate_tokens(text):
+    return max(1, len(text) // 4)
+
+
+# LangChain and the Google GenAI client take seconds to import, so they load
+# on the first real generation (or in the background warm-up) instead of
+# with this module. The fake backend never needs them.
+def load_llm_libraries():
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    from langchain.chains import LLMChain
+    from langchain.prompts import PromptTemplate
+    return ChatGoogleGenerativeAI, LLMChain, PromptTemplate
+
+
+# Stands in for the provider's 5xx / 429 responses, so it is retried
+class FakeBackendError(RuntimeError):
+    transient = True
+
+class CachedContentNotFound(FakeBackendError):
+    pass
+
+
+# Every helper in Langchain_helper.py goes through a backend. `name` is the
+# prompt name from Langchain_helper.PROMPTS, `prompt` its CacheablePrompt.
+class LLMBackend:
+    name = "base"
+    context_cache = None
+
+    def invoke(self, name, prompt, variables):
+        raise NotImplementedError
+
+    # Backends without native streaming yield the whole completion at once
+    def stream(self, name, prompt, variables):
+        yield self.invoke(name, prompt, variables)
+
+    def warm_up(self, prompts):
+        return True
+
+    # Cached-content handle for the prompt's static prefix, or None to send
+    # the full prompt. Caching is only an optimization, so a failed create
+    # falls back to the uncached call.
+    def _context_handle(self, prompt):
+        if self.context_cache is None:
+            return None
+        try:
+            return self.context_cache.handle(prompt)
+        except Exception:
+            return None
+
+
+class GeminiBackend(LLMBackend):
+    # One model client per backend and one chain per prompt,
+    # shared process-wide so sessions reuse the same HTTP connections
+    # instead of rebuilding the client, template and chain on every call.
+    # Prompts keep their static instructions as a byte-stable prefix, which
+    # Gemini caches implicitly. Explicit cached contents are not used: every
+    # prefix is a few hundred tokens, far below the provider's minimum size.
+    def __init__(self, model=MODEL_NAME, temperature=TEMPERATURE):
+        self.model = model
+        self.temperature = temperature
+        self.name = f"gemini:{model}"
+        self._lock = threading.Lock()
+        self._llm = None
+        self._chains = {}
+
+    def get_llm(self):
+        if self._llm is None:
+            ChatGoogleGenerativeAI, _, _ = load_llm_libraries()
+            with self._lock:
+                if self._llm is None:
+                    self._llm = ChatGoogleGenerativeAI(
+                        model=self.model,
+                        temperature=self.temperature,
+                        google_api_key=get_api_key()
+                    )
+        return self._llm
+
+    def get_chain(self, name, prompt):
+        chain = self._chains.get(name)
+        if chain is None:
+            llm = self.get_llm()
+            _, LLMChain, PromptTemplate = load_llm_libraries()
+            with self._lock:
+                chain = self._chains.get(name)
+                if chain is None:
+                    template = PromptTemplate(input_variables=prompt.input_variables, template=prompt.template)
+                    chain = LLMChain(llm=llm, prompt=template)
+                    self._chains[name] = chain
+        return chain
+
+    def invoke(self, name, prompt, variables):
+        response = self.get_chain(name, prompt).invoke(variables)
+        return response["text"]
+
+    def stream(self, name, prompt, variables):
+        for chunk in self.get_llm().stream(prompt.format(**variables)):
+            if chunk.content:
+                yield chunk.content
+
+    # Build the shared client and every chain ahead of the first request.
+    # Failures (e.g. a missing API key) are left for the first real call to report.
+    def warm_up(self, prompts):
+        try:
+            for name, prompt in prompts.items():
+                self.get_chain(name, prompt)
+        except Exception:
+            return False
+        return True
+
+
+# ---------------- FAKE BACKEND ----------------
+# Deterministic offline stand-in for benchmarks and development. Responses
+# are templated from the prompt variables; latency, token rate and failures
+# are drawn from a seeded RNG so runs are reproducible.
+
+def _fake_fitness_plan(v):
+    return (
+        f"## Weekly Workout Split Overview\n"
+        f"A {v['workout_days']}-day {v['workout_level'].lower()} {v['workout_type'].lower()} programme "
+        f"focused on {v['fitness_goal'].lower()}.\n\n"
+        f"## Daily Calorie Requirements\n"
+        f"- Estimated for a {v['age']}yo {v['gender'].lower()}, {v['weight']}kg, {v['height']}cm\n\n"
+        f"## Macronutrient Targets\n"
+        f"- Protein: {int(float(v['weight']) * 1.8)}g\n"
+        f"- Carbohydrates: {int(float(v['weight']) * 3)}g\n"
+        f"- Fats: {int(float(v['weight']) * 0.9)}g\n\n"
+        f"## General Recommendations\n"
+        f"- Follow a {v['diet_pref'].lower()} diet built around whole foods\n"
+        f"- Sleep 7-9 hours and track progress weekly\n"
+    )
+
+def _fake_daily_workouts(v):
+    workout_days = int(v["workout_days"])
+    lines = []
+    for i, day in enumerate(DAYS):
+        if i < workout_days:
+            lines.append(json.dumps({
+                "day": day, "rest": False,
+                "focus": f"{v['workout_type']} session {i + 1} for {v['fitness_goal']}",
+                "exercises": [
+                    {"name": "Squats", "sets": 3, "reps": 12},
+                    {"name": "Push-ups", "sets": 3, "reps": 10},
+                    {"name": "Plank", "sets": 3, "reps": "30 seconds"},
+                ],
+                "notes": "Rest 60s between sets",
+            }))
+        else:
+            lines.append(json.dumps({"day": day, "rest": True, "exercises": [], "notes": "Light stretching or a walk"}))
+    return "\n".join(lines)
+
+def _fake_workout_notes(v):
+    return (
+        f"**Coach's notes**\n"
+        f"- Add a rep or a little load each week while every set stays in good form ({v['fitness_goal']}).\n"
+        f"- Warm up well; at {v['age']} recovery matters as much as effort.\n"
+        f"- Use rest days for walking and stretching.\n"
+    )
+
+def _fake_nutrition_plan(v):
+    return (
+        f"## Macronutrient Breakdown\n"
+        f"- **Protein:** {v['protein_grams']}g ({v['protein_cals']} calories)\n"
+        f"- **Carbohydrates:** {v['carb_grams']}g ({v['carb_cals']} calories)\n"
+        f"- **Fats:** {v['fat_grams']}g ({v['fat_cals']} calories)\n"
+        f"- **Fiber:** {v['fiber_grams']}g\n\n"
+        f"## Sample Daily Meal Plan ({v['country']} Cuisine)\n"
+        f"### 🌅 Breakfast ({v['breakfast_cals']} calories)\n"
+        f"- {v['diet_pref']} oats with fruit and nuts\n\n"
+        f"### 🍽️ Lunch ({v['lunch_cals']} calories)\n"
+        f"- {v['diet_pref']} rice bowl with lentils and vegetables\n\n"
+        f"### 🥜 Snacks ({v['snack_cals']} calories)\n"
+        f"- Roasted chickpeas and a piece of fruit\n\n"
+        f"### 🌙 Dinner ({v['dinner_cals']} calories)\n"
+        f"- {v['diet_pref']} curry with whole wheat roti\n\n"
+        f"## 💧 Hydration & Supplements\n"
+        f"- Water intake: {v['water_intake']}L per day\n"
+    )
+
+def _fake_chat(v):
+    return (
+        f"For a {v['diet_pref']} diet at {v['daily_calories']} calories/day, here is my take on "
+        f"\"{v['user_message']}\": pick whole foods, keep portions measured and favour lean protein."
+    )
+
+def _fake_modification(v):
+    return (
+        f"I can help you replace that! Here are {v['country']} {v['diet_pref']} alternatives "
+        f"for \"{v['user_message']}\" with similar macros:\n\n"
+        f"🍛 **Option 1: Paneer Bhurji with Roti** (~400 calories)\n"
+        f"- Protein: 25g | Carbs: 30g | Fat: 18g"
+    )
+
+def _fake_updated_plan(v):
+    return (
+        f"## Macronutrient Breakdown\n"
+        f"- Protein: keep as before\n\n"
+        f"## Sample Daily Meal Plan\n"
+        f"### 🌅 Breakfast\n- Updated for: {v['user_request']}\n\n"
+        f"### 🍽️ Lunch\n- Unchanged\n\n"
+        f"### 🥜 Snacks\n- Unchanged\n\n"
+        f"### 🌙 Dinner\n- Unchanged\n\n"
+        f"## 💧 Hydration & Supplements\n- Unchanged\n"
+    )
+
+def _fake_updated_section(v):
+    heading = v["section"].split("\n", 1)[0]
+    return f"{heading}\n- Updated for: {v['user_request']}\n"
+
+def _fake_modify_plan(v):
+    reply = _fake_modification(v)
+    target = detect_target_section(v["user_message"])
+    heading = MealPlan.parse(v["current_plan"]).heading(target) if target else None
+    if not heading:
+        return reply
+    return f"{reply}\n\n<<<UPDATE {target}>>>\n{heading}\n- Updated for: {v['user_message']}\n<<<END>>>"
+
+FAKE_RESPONSES = {
+    "generate_fitness_plan": _fake_fitness_plan,
+    "get_daily_workouts": _fake_daily_workouts,
+    "personalize_workouts": _fake_workout_notes,
+    "get_nutrition_plan": _fake_nutrition_plan,
+    "chat_with_nutritionist": _fake_chat,
+    "chat_nutrition_modification": _fake_modification,
+    "generate_updated_nutrition_plan": _fake_updated_plan,
+    "generate_updated_section": _fake_updated_section,
+    "modify_nutrition_plan": _fake_modify_plan,
+}
+
+
+class FakeBackend(LLMBackend):
+    name = "fake"
+
+    # latency: seconds to first token ("fixed"), mean ("uniform", +/- jitter)
+    # or median ("lognormal", jitter is sigma). tokens_per_second paces the
+    # rest of the completion; None returns it instantly. context_cache_ttl
+    # turns on a simulated provider context cache with that TTL, so handle
+    # reuse and expiry can be checked offline.
+    def __init__(self, latency=0.0, jitter=0.0, distribution="fixed", tokens_per_second=None,
+                 failure_rate=0.0, seed=0, responses=None, context_cache_ttl=None, clock=time.monotonic):
+        self.latency = latency
+        self.jitter = jitter
+        self.distribution = distribution
+        self.tokens_per_second = tokens_per_second
+        self.failure_rate = failure_rate
+        self.responses = dict(FAKE_RESPONSES, **(responses or {}))
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = Counter()
+        self.prompt_tokens = Counter()
+        self.cached_tokens = Counter()
+        self.completion_tokens = Counter()
+        self._clock = clock
+        self._cached_contents = {}  # handle -> expires_at, as the provider sees it
+        self._created_contents = 0
+        if context_cache_ttl:
+            self.context_cache = ContextCache(
+                self._create_cached_content, ttl_seconds=context_cache_ttl,
+                count_tokens=estimate_tokens, clock=clock
+            )
+
+    @classmethod
+    def from_env(cls):
+        tps = os.getenv("FITVISOR_FAKE_TOKENS_PER_SEC")
+        return cls(
+            latency=float(os.getenv("FITVISOR_FAKE_LATENCY", "0")),
+            jitter=float(os.getenv("FITVISOR_FAKE_JITTER", "0")),
+            distribution=os.getenv("FITVISOR_FAKE_DISTRIBUTION", "fixed"),
+            tokens_per_second=float(tps) if tps else None,
+            failure_rate=float(os.getenv("FITVISOR_FAKE_FAILURE_RATE", "0")),
+            seed=int(os.getenv("FITVISOR_FAKE_SEED", "0")),
+            context_cache_ttl=int(os.getenv("FITVISOR_CONTEXT_CACHE_TTL", "3600")) if enabled_from_env() else None,
+        )
+
+    def _sample(self):
+        with self._lock:
+            if self.distribution == "uniform":
+                delay = self._rng.uniform(self.latency - self.jitter, self.latency + self.jitter)
+            elif self.distribution == "lognormal":
+                delay = self.latency * self._rng.lognormvariate(0, self.jitter) if self.latency else 0.0
+            else:
+                delay = self.latency
+            failed = self._rng.random() < self.failure_rate
+        return max(0.0, delay), failed
+
+    def _create_cached_content(self, prefix, ttl_seconds):
+        with self._lock:
+            self._created_contents += 1
+            handle = f"cachedContents/fake-{self._created_contents}"
+            self._cached_contents[handle] = self._clock() + ttl_seconds
+        return handle
+
+    # Simulate the provider evicting every cached content early
+    def expire_cached_contents(self):
+        with self._lock:
+            self._cached_contents.clear()
+
+    # Bill like the provider: a live handle covers the prefix, so only the
+    # suffix counts as fresh prompt tokens
+    def _respond(self, name, prompt, variables, handle=None):
+        if handle:
+            with self._lock:
+                expires_at = self._cached_contents.get(handle)
+            if expires_at is None or expires_at <= self._clock():
+                raise CachedContentNotFound(f"{handle} not found or expired")
+            prompt_text, cached_text = prompt.format_suffix(**variables), prompt.prefix
+        else:
+            prompt_text, cached_text = prompt.format(**variables), ""
+        response = self.responses[name]
+        text = response(variables) if callable(response) else response.format(**variables)
+        with self._lock:
+            self.calls[name] += 1
+            self.prompt_tokens[name] += estimate_tokens(prompt_text)
+            if cached_text:
+                self.cached_tokens[name] += estimate_tokens(cached_text)
+            self.completion_tokens[name] += estimate_tokens(text)
+        return text
+
+    def invoke(self, name, prompt, variables):
+        return "".join(self.stream(name, prompt, variables))
+
+    def stream(self, name, prompt, variables):
+        delay, failed = self._sample()
+        time.sleep(delay)
+        if failed:
+            raise FakeBackendError(f"Injected failure for {name}")
+        handle = self._context_handle(prompt)
+        try:
+            text = self._respond(name, prompt, variables, handle)
+        except CachedContentNotFound:
+            # Refresh the expired handle and retry once
+            self.context_cache.invalidate(prompt)
+            text = self._respond(name, prompt, variables, self._context_handle(prompt))
+        if not self.tokens_per_second:
+            yield text
+            return
+        # Yield word by word at the configured token rate
+        words = text.split(" ")
+        for i, word in enumerate(words):
+            chunk = word if i == len(words) - 1 else word + " "
+            time.sleep(estimate_tokens(chunk) / self.tokens_per_second)
+            yield chunk
+
+    def reset_stats(self):
+        with self._lock:
+            self.calls.clear()
+            self.prompt_tokens.clear()
+            self.cached_tokens.clear()
+            self.completion_tokens.clear()
+
+
+# ---------------- REGISTRY ----------------
+_backend = None
+_backend_lock = threading.Lock()
+
+def create_backend(kind=None):
+    kind = (kind or os.getenv("FITVISOR_LLM_BACKEND", "gemini")).lower()
+    if kind == "fake":
+        return FakeBackend.from_env()
+    if kind == "gemini":
+        return GeminiBackend()
+    raise ValueError(f"Unknown LLM backend: {kind}")
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = create_backend()
+    return _backend
+
+def set_backend(backend):
+    global _backend
+    with _backend_lock:
+        _backend = backend
+    return backend
@@ -0,0 +1,248 @@
+"""Load-test the FitVisor JSON API (api.py).
+
+By default starts the API in a subprocess against the offline fake LLM
+backend (with configurable latency and token rate), then runs N concurrent
+virtual users. Each user walks the onboarding journey: targets, streamed
+fitness plan, workouts, streamed nutrition plan, then a few chat messages.
+Reports per-endpoint latency (and time to first streamed line), status
+codes and throughput.
+
+    python load_test.py --users 200 --iterations 3
+    python load_test.py --users 50 --fake-latency 1.5 --tokens-per-sec 80 --json load.json
+    python load_test.py --url http://127.0.0.1:8000 --users 20
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+import httpx
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+GOALS = ["Weight Loss", "Weight Gain", "Build Muscle", "Improve Flexibility", "Maintain"]
+LEVELS = ["Beginner", "Intermediate", "Advanced"]
+TYPES = ["Home", "Gym", "Yoga"]
+DIETS = ["Vegetarian", "Non-Vegetarian", "Vegan"]
+COUNTRIES = ["India", "USA", "UK", "Canada", "Australia", "Singapore", "UAE", "Other"]
+QUESTIONS = [
+    "What is a quick high protein breakfast?",
+    "calories in 100g paneer",
+    "Can I swap rice for quinoa at dinner?",
+    "How much water should I drink on workout days?",
+    "protein in 2 eggs",
+    "Give me a post-workout snack idea",
+]
+
+
+def make_profiles(count, seed):
+    rng = random.Random(seed)
+    return [{
+        "age": rng.randint(18, 65),
+        "gender": rng.choice(["Male", "Female"]),
+        "weight": rng.randint(50, 110),
+        "height": rng.randint(150, 195),
+        "fitness_goal": rng.choice(GOALS),
+        "workout_days": rng.randint(2, 6),
+        "workout_level": rng.choice(LEVELS),
+        "workout_type": rng.choice(TYPES),
+        "diet_pref": rng.choice(DIETS),
+        "country": rng.choice(COUNTRIES),
+    } for _ in range(count)]
+
+
+class Recorder:
+    def __init__(self):
+        self.latency = defaultdict(list)
+        self.first_line = defaultdict(list)
+        self.status = defaultdict(Counter)
+        self.errors = Counter()
+
+    def summary(self, seconds):
+        requests = sum(sum(c.values()) for c in self.status.values())
+        endpoints = {}
+        for name in sorted(self.status):
+            row = {"requests": sum(self.status[name].values()),
+                   "status": dict(self.status[name]),
+                   "latency": _stats(self.latency[name])}
+            if self.first_line[name]:
+                row["first_line"] = _stats(self.first_line[name])
+            endpoints[name] = row
+        return {
+            "seconds": round(seconds, 3),
+            "requests": requests,
+            "requests_per_second": round(requests / seconds, 2) if seconds else 0.0,
+            "errors": dict(self.errors),
+            "endpoints": endpoints,
+        }
+
+
+def _stats(values):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+
+    def pct(q):
+        return round(ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))], 4)
+
+    return {"p50": pct(0.5), "p95": pct(0.95), "p99": pct(0.99), "max": round(ordered[-1], 4)}
+
+
+async def post(client, recorder, name, path, body):
+    started = time.perf_counter()
+    try:
+        if body.get("stream"):
+            async with client.stream("POST", path, json=body) as response:
+                last = None
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    if last is None:
+                        recorder.first_line[name].append(time.perf_counter() - started)
+                    last = json.loads(line)
+                if response.status_code == 200 and (last is None or "error" in last):
+                    recorder.errors[f"{name}: {(last or {}).get('error', 'empty stream')}"] += 1
+                status = response.status_code
+                result = last
+        else:
+            response = await client.post(path, json=body)
+            status = response.status_code
+            result = response.json()
+    except httpx.HTTPError as e:
+        recorder.errors[f"{name}: {type(e).__name__}"] += 1
+        recorder.status[name]["exception"] += 1
+        return None
+    recorder.latency[name].append(time.perf_counter() - started)
+    recorder.status[name][status] += 1
+    if status != 200:
+        recorder.errors[f"{name}: {status} {result.get('error') if isinstance(result, dict) else ''}"] += 1
+        return None
+    return result
+
+
+async def journey(client, recorder, profile, rng, chats):
+    p = profile
+    body = {key: p[key] for key in ("age", "gender", "weight", "height", "fitness_goal")}
+    result = await post(client, recorder, "targets", "/v1/targets", body)
+    calories = result["targets"]["daily_calories"] if result else 2000
+    await post(client, recorder, "fitness-plan", "/v1/fitness-plan", {**p, "stream": True})
+    await post(client, recorder, "workouts", "/v1/workouts", {
+        key: p[key] for key in ("workout_days", "fitness_goal", "workout_level", "workout_type")
+    })
+    await post(client, recorder, "nutrition-plan", "/v1/nutrition-plan", {**p, "stream": True})
+    history = []
+    for _ in range(chats):
+        message = rng.choice(QUESTIONS)
+        result = await post(client, recorder, "chat", "/v1/chat", {
+            "message": message, "diet_pref": p["diet_pref"], "daily_calories": calories,
+            "history": history[-6:], "stream": True,
+        })
+        history += [{"role": "user", "content": message}, {"role": "assistant", "content": "ok"}]
+
+
+async def run_load(url, users, iterations, profiles, chats, seed, timeout):
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=users, max_keepalive_connections=users)
+    async with httpx.AsyncClient(base_url=url, timeout=timeout, limits=limits) as client:
+        async def user(index):
+            rng = random.Random(seed * 1000003 + index)
+            for iteration in range(iterations):
+                await journey(client, recorder, profiles[(index + iteration * users) % len(profiles)], rng, chats)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(user(i) for i in range(users)))
+        seconds = time.perf_counter() - started
+    return recorder.summary(seconds)
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+# Start api.py on the fake backend and wait until it answers
+def start_server(args):
+    port = _free_port()
+    env = dict(os.environ,
+               FITVISOR_LLM_BACKEND="fake",
+               FITVISOR_FAKE_LATENCY=str(args.fake_latency),
+               FITVISOR_FAKE_DISTRIBUTION="lognormal" if args.fake_jitter else "fixed",
+               FITVISOR_FAKE_JITTER=str(args.fake_jitter),
+               FITVISOR_TRACE_LOG="")
+    if args.tokens_per_sec:
+        env["FITVISOR_FAKE_TOKENS_PER_SEC"] = str(args.tokens_per_sec)
+    process = subprocess.Popen([sys.executable, "api.py", "--port", str(port)], cwd=HERE, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"api.py exited:\n{process.stderr.read().decode()}")
+        try:
+            if httpx.get(f"{url}/healthz", timeout=1).status_code == 200:
+                return process, url
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("api.py did not start within 60s")
+
+
+def print_report(report, log=sys.stderr):
+    print(f"{report['requests']} requests in {report['seconds']:.1f}s "
+          f"({report['requests_per_second']} req/s)", file=log)
+    for name, row in report["endpoints"].items():
+        latency = row["latency"] or {}
+        first = row.get("first_line")
+        line = (f"  {name:16} n={row['requests']:<6} p50 {latency.get('p50', 0):.3f}s  "
+                f"p95 {latency.get('p95', 0):.3f}s  p99 {latency.get('p99', 0):.3f}s")
+        if first:
+            line += f"  first line p50 {first['p50']:.3f}s"
+        print(line + f"  {row['status']}", file=log)
+    for error, count in report["errors"].items():
+        print(f"  ! {count} x {error}", file=log)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the FitVisor JSON API.")
+    parser.add_argument("--url", help="Target a running API instead of starting one on the fake backend")
+    parser.add_argument("-u", "--users", type=int, default=50, help="Concurrent virtual users")
+    parser.add_argument("-n", "--iterations", type=int, default=2, help="Journeys per user")
+    parser.add_argument("--profiles", type=int, default=100, help="Distinct user profiles (cache diversity)")
+    parser.add_argument("--chats", type=int, default=3, help="Chat messages per journey")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=180, help="Client timeout per request in seconds")
+    parser.add_argument("--fake-latency", type=float, default=0.5, help="Fake backend seconds to first token")
+    parser.add_argument("--fake-jitter", type=float, default=0.0, help="Fake backend lognormal sigma")
+    parser.add_argument("--tokens-per-sec", type=float, default=200, help="Fake backend streaming rate")
+    parser.add_argument("--json", metavar="PATH", help="Also write the report as JSON")
+    args = parser.parse_args(argv)
+
+    process = None
+    url = args.url
+    if url is None:
+        process, url = start_server(args)
+    try:
+        report = asyncio.run(run_load(url, args.users, args.iterations, make_profiles(args.profiles, args.seed),
+                                      args.chats, args.seed, args.timeout))
+        report["config"] = {key: value for key, value in vars(args).items() if key != "json"}
+        report["health"] = httpx.get(f"{url}/healthz", timeout=5).json()
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0 if not report["errors"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
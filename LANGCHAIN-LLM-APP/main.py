@@ -1,40 +1,293 @@
+import datetime
+import os
+import time
+from collections import Counter
 import streamlit as st
+from chat_history import ChatHistory
+import fallbacks
 import Langchain_helper as lch
+import metabolic
+import prefetch
+import progress_store
+import resilience
+import session_store
+import telemetry
+import workout_engine
+import workout_library
+from workout_parser import is_rest_day
 
 st.set_page_config(page_title="FitVisor", page_icon="💪", layout="centered")
+_run_started = time.perf_counter()
+
+# Build the shared LLM client and chains once per server process, in a
+# background thread so the first page paints without waiting on LangChain
+@st.cache_resource
+def warm_up_llm():
+    if os.getenv("FITVISOR_BACKGROUND_WARMUP", "1") == "1":
+        return lch.warm_up_in_background()
+    return None
+
+warm_up_llm()
+
+# Prometheus scrape endpoint, if FITVISOR_METRICS_PORT is set
+@st.cache_resource
+def start_metrics_server():
+    port = os.getenv("FITVISOR_METRICS_PORT")
+    return telemetry.serve_metrics(int(port)) if port else None
+
+start_metrics_server()
+
+# Map the precomputed workout library (if built) before anyone opens Workouts
+@st.cache_resource
+def load_workout_library():
+    return workout_library.get_library()
+
+load_workout_library()
 
 # ---------------- STATE ----------------
-if "step" not in st.session_state:
-    st.session_state.step = 1
-if "plan" not in st.session_state:
-    st.session_state.plan = None
-if "user_data" not in st.session_state:
-    st.session_state.user_data = {}
-if "chat_history" not in st.session_state:
-    st.session_state.chat_history = []
-
-def next_step():
+# Backed by the durable session store (see session_store.py): fields are
+# restored the first time a page needs them and saved whenever they change
+session = session_store.bind(st.session_state, st.query_params)
+session.restore("step", 1)
+session.restore("plan", None)
+session.restore("user_data", {})
+
+def next_step(persist=True):
     st.session_state.step += 1
+    if persist:
+        session.save("step")
 
 def prev_step():
     if st.session_state.step > 1:
         st.session_state.step -= 1
+        session.save("step")
+
+# Persist a generated plan unless the model was unavailable and it is a
+# template or cut short: that copy lives only in this session, so the next
+# visit (or "Try again") generates the real plan. Returns whether it was saved.
+def save_plan(field):
+    if fallbacks.is_degraded(st.session_state.get(field)):
+        return False
+    session.save(field)
+    return True
+
+# Targets depend only on the profile, so they are computed once per distinct
+# profile instead of on every rerun
+@st.cache_data(show_spinner=False)
+def _profile_targets(weight, height, age, gender, fitness_goal):
+    return metabolic.profile_targets(weight, height, age, gender, fitness_goal)
+
+def profile_targets(user_data):
+    return _profile_targets(
+        user_data["weight"], user_data["height"], user_data["age"],
+        user_data["gender"], user_data["fitness_goal"]
+    )
+
+def calculation_note(targets):
+    tdee, adjustment = targets["tdee"], targets["calorie_adjustment"]
+    if adjustment < 0:
+        return f"TDEE ({tdee}) - {-adjustment} deficit"
+    if adjustment > 0:
+        return f"TDEE ({tdee}) + {adjustment} surplus"
+    return f"TDEE ({tdee}) maintenance"
+
+def render_workout_day(slot, day, day_plan):
+    with slot.container():
+        with st.expander(f"📅 {day}", expanded=False):
+            if day_plan is None:
+                st.caption("⏳ Generating...")
+            elif is_rest_day(day_plan):
+                st.info(f"🛌 **Rest Day** - Focus on recovery, light stretching, or a gentle walk")
+            else:
+                st.markdown(day_plan)
+
+def workout_inputs(user_data):
+    return [user_data["workout_days"], user_data["fitness_goal"],
+            user_data["workout_level"], user_data["workout_type"]]
+
+# The week shown on Workouts, without a model call: the saved week for the
+# current inputs, or the rule-built one; None if only the model can make it
+def known_workouts(user_data):
+    inputs = workout_inputs(user_data)
+    session.restore("workouts")
+    saved = st.session_state.get("workouts")
+    if saved and saved["inputs"] == inputs:
+        return saved["plans"]
+    if lch.WORKOUT_SOURCE == "rules":
+        return workout_engine.build_week(*inputs)
+    return None
+
+# "Push", "Rest Day", ... from a day's markdown
+def workout_focus(plans, day):
+    plan = (plans or {}).get(day)
+    if not plan:
+        return "See Workouts"
+    if is_rest_day(plan):
+        return "Rest Day"
+    return plan.split("\n", 1)[0].strip("*# ") or "Workout"
+
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+# Progress page chart choices: (progress_store metric, label)
+PROGRESS_CHARTS = [
+    ("weight", "Weight (kg)"), ("calories_out", "Calories burned"), ("calories_in", "Calories eaten"),
+    ("steps", "Steps"), ("workouts", "Workouts completed"),
+]
+
+CHAT_PAGE_SIZE = int(os.getenv("FITVISOR_CHAT_PAGE_SIZE", "10"))
+
+# Restore a ChatHistory field (older sessions stored a plain list)
+def restore_chat(field):
+    session.restore(field)
+    if field in st.session_state:
+        st.session_state[field] = ChatHistory.from_value(st.session_state[field])
+
+# Render one page of a chat, newest first, so each rerun draws at most
+# CHAT_PAGE_SIZE messages however long the conversation gets
+def render_chat(history, key):
+    page_key = f"{key}_page"
+    pages = history.page_count(CHAT_PAGE_SIZE)
+    page = min(st.session_state.get(page_key, 0), pages - 1)
+    if page == pages - 1 and history.dropped and history.summary:
+        with st.expander(f"🗂️ Summary of {history.dropped} earlier messages"):
+            st.markdown("\n".join(f"- {line}" for line in history.summary))
+    if page < pages - 1 and st.button("⬆️ Earlier messages", key=f"{key}_older"):
+        st.session_state[page_key] = page + 1
+        st.rerun()
+    for message in history.page(page, CHAT_PAGE_SIZE):
+        with st.chat_message(message["role"]):
+            st.write(message["content"])
+    if page > 0 and st.button("⬇️ Newer messages", key=f"{key}_newer"):
+        st.session_state[page_key] = page - 1
+        st.rerun()
+
+# ---------------- PANELS ----------------
+def nutrition_metrics(user_data, targets):
+    bmi, bmr, daily_calories = targets["bmi"], targets["bmr"], targets["daily_calories"]
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("BMI", f"{bmi}")
+        if bmi < 18.5:
+            st.info("Underweight")
+        elif 18.5 <= bmi < 25:
+            st.success("Normal weight")
+        elif 25 <= bmi < 30:
+            st.warning("Overweight")
+        else:
+            st.error("Obese")
+    
+    with col2:
+        st.metric("BMR", f"{int(bmr)} cal/day")
+        st.caption("Basal Metabolic Rate")
+    
+    with col3:
+        st.metric("Daily Calorie Target", f"{daily_calories} cal")
+        st.caption(calculation_note(targets))
+        if user_data["fitness_goal"] == "Weight Loss":
+            st.info(f"⚠️ Never eat below BMR: {int(bmr)} calories")
+
+# The chat panels are fragments: sending a message reruns only the panel,
+# not the page's metrics and plan above it
+@st.fragment
+@telemetry.timed_render("Meal Customization panel")
+def nutrition_chat_panel(user_data, daily_calories):
+    # Meal Customization Chatbot
+    st.subheader("🤖 Meal Customization Assistant")
+    st.write("Don't like a specific meal? Ask me to modify it while keeping the same macros!")
+    
+    # Initialize nutrition chat history
+    restore_chat("nutrition_chat_history")
+    if "nutrition_chat_history" not in st.session_state:
+        st.session_state.nutrition_chat_history = ChatHistory()
+        # Add welcome message
+        welcome_msg = f"""Hi! I'm your meal customization assistant for **{user_data['country']}**. I can help you:
 
-def calculate_bmr_bmi(weight, height, age, gender):
-    # BMI calculation
-    height_m = height / 100
-    bmi = weight / (height_m ** 2)
+🔄 **Replace meals** - "Change the grilled chicken lunch to something local"
+📊 **Adjust macros** - "Make the breakfast higher in protein"  
+🥗 **Suggest alternatives** - "Give me traditional {user_data['country']} options for dinner"
+📱 **Calculate calories** - "How many calories in 100g paneer?"
+
+Your current targets: **{daily_calories} calories/day** | **{user_data['diet_pref']} diet** | **{user_data['country']} cuisine**
+
+What would you like to modify in your meal plan?"""
+        
+        st.session_state.nutrition_chat_history.append({
+            "role": "assistant", 
+            "content": welcome_msg
+        })
+    
+    # Display chat history
+    render_chat(st.session_state.nutrition_chat_history, "nutrition_chat")
+    
+    # Chat input for meal modifications
+    user_message = st.chat_input("Ask me to modify meals, suggest alternatives, or adjust macros...")
+    
+    if user_message:
+        st.session_state.nutrition_chat_page = 0
+        st.session_state.nutrition_chat_history.append({"role": "user", "content": user_message})
+        
+        with st.chat_message("user"):
+            st.write(user_message)
+        
+        # One call returns both the reply and any plan edits it implies
+        modification = lch.stream_modify_nutrition_plan(
+            user_message, 
+            st.session_state.nutrition_plan,
+            user_data["diet_pref"], 
+            daily_calories,
+            user_data["fitness_goal"],
+            st.session_state.nutrition_chat_history,
+            user_data["country"]
+        )
+        with st.chat_message("assistant"):
+            st.write_stream(modification)
+        bot_response = modification.reply
+        
+        st.session_state.nutrition_chat_history.append({"role": "assistant", "content": bot_response})
+        session.save("nutrition_chat_history")
+        
+        # Patch the edited sections into the plan; the plan lives outside
+        # this fragment, so only an actual edit reruns the whole page
+        updated_plan = modification.apply(st.session_state.nutrition_plan)
+        if updated_plan:
+            st.session_state.nutrition_plan = updated_plan
+            st.session_state.nutrition_plan_updated = True
+            save_plan("nutrition_plan")
+            st.rerun(scope="app")
+
+@st.fragment
+@telemetry.timed_render("Recipe Chat panel")
+def recipe_chat_panel(user_data, daily_calories):
+    restore_chat("chat_history")
+    if "chat_history" not in st.session_state:
+        st.session_state.chat_history = ChatHistory()
     
-    # BMR calculation using Harris-Benedict equation
-    if gender.lower() == "male":
-        bmr = 88.362 + (13.397 * weight) + (4.799 * height) - (5.677 * age)
-    else:
-        bmr = 447.593 + (9.247 * weight) + (3.098 * height) - (4.330 * age)
+    # Display chat history first
+    render_chat(st.session_state.chat_history, "recipe_chat")
     
-    return round(bmi, 1), round(bmr, 0)
+    # Chat input
+    user_message = st.chat_input("Ask about recipes, calories, meal prep...")
+    
+    if user_message:
+        st.session_state.recipe_chat_page = 0
+        st.session_state.chat_history.append({"role": "user", "content": user_message})
+        
+        with st.chat_message("user"):
+            st.write(user_message)
+        
+        # Get chatbot response
+        with st.chat_message("assistant"):
+            bot_response = st.write_stream(lch.stream_chat_with_nutritionist(
+                user_message, user_data["diet_pref"], 
+                daily_calories, st.session_state.chat_history
+            ))
+        
+        st.session_state.chat_history.append({"role": "assistant", "content": bot_response})
+        session.save("chat_history")
 
 # ---------------- UI FLOW ----------------
 st.title("🏋️ FitVisor - Your AI Fitness Coach")
+telemetry.set_page("Onboarding")
 
 # ---------------- STEP 1 ----------------
 if st.session_state.step == 1:
@@ -64,6 +317,7 @@ if st.session_state.step == 1:
                 "weight": weight,
                 "country": country
             }
+            session.save("user_data")
             next_step()
             st.rerun()
 
@@ -91,6 +345,7 @@ elif st.session_state.step == 2:
                 "workout_level": workout_level,
                 "workout_type": workout_type
             })
+            session.save("user_data")
             next_step()
             st.rerun()
 
@@ -122,16 +377,23 @@ elif st.session_state.step == 3:
                 "diet_pref": diet_pref,
                 "food_allergy": food_allergy
             })
+            session.save("user_data")
             
-            # Generate Plan
-            with st.spinner("Generating your personalized fitness plan..."):
-                user = st.session_state.user_data
-                st.session_state.plan = lch.generate_fitness_plan(
-                    user["age"], user["gender"], user["weight"], 
-                    user["height"], user["fitness_goal"], user["workout_days"],
-                    user["workout_level"], user["workout_type"], user["diet_pref"]
-                )
-            next_step()
+            # Start workouts and nutrition in the background, then stream the
+            # plan in the foreground so all three generate concurrently
+            user = st.session_state.user_data
+            daily_calories = profile_targets(user)["daily_calories"]
+            st.session_state.prefetch = prefetch.start_prefetch(user, daily_calories, include_plan=False)
+            
+            st.caption("Generating your personalized fitness plan...")
+            st.session_state.plan = st.write_stream(lch.stream_fitness_plan(
+                user["age"], user["gender"], user["weight"], 
+                user["height"], user["fitness_goal"], user["workout_days"],
+                user["workout_level"], user["workout_type"], user["diet_pref"]
+            ))
+            # Onboarding only counts as finished once the plan is stored, so
+            # after a templated plan a refresh comes back here to generate it
+            next_step(persist=save_plan("plan"))
             st.rerun()
 
 # ---------------- FINAL DASHBOARD ----------------
@@ -140,174 +402,156 @@ elif st.session_state.step == 4:
     
     # Sidebar Navigation
     page = st.sidebar.radio("📂 Sections", ["Home", "Workouts", "Nutrition", "Recipe Chat", "Progress"])
+    telemetry.set_page(page)
+    
+    # Logged activity (see progress_store.py); pages read its day and week
+    # buckets, never the full history
+    progress = progress_store.get_log(session.token)
+    today = progress_store.today()
     
     if page == "Home":
         st.header("📊 Today's Activity")
+        user_data = st.session_state.user_data
+        daily_calories = profile_targets(user_data)["daily_calories"]
+        plans = known_workouts(user_data)
+        weekday = datetime.date.fromordinal(today).weekday()
+        
+        burned = progress["calories_out"].on(today)
+        intake = progress["calories_in"].on(today)
+        steps = progress["steps"].on(today)
         col1, col2 = st.columns(2)
         with col1:
-            st.metric("Calories Burned", "450 Cal")
-            st.metric("Calories Intake", "1600 Cal")
+            st.metric("Calories Burned", f"{burned:,.0f} Cal" if burned is not None else "—")
+            st.metric("Calories Intake", f"{intake:,.0f} Cal" if intake is not None else "—",
+                      delta=f"{intake - daily_calories:+,.0f} vs target" if intake is not None else None,
+                      delta_color="inverse")
         with col2:
-            st.metric("Step Count", "5432 Steps")
-            st.metric("Today's Workout", "Push Day")
+            st.metric("Step Count", f"{steps:,.0f} Steps" if steps is not None else "—")
+            st.metric("Today's Workout", workout_focus(plans, DAYS[weekday]))
+        
+        done = int(progress["workouts"].week(today) or 0)
+        target = user_data["workout_days"]
+        st.progress(min(done / target, 1.0), text=f"{done} of {target} workouts done this week")
+        st.info(f"Tomorrow's Workout: {workout_focus(plans, DAYS[(weekday + 1) % 7])}")
         
-        st.progress(5/7)
-        st.info("Tomorrow's Workout: Pull Day")
+        with st.expander("📝 Log today's activity", expanded=progress.empty):
+            with st.form("log_activity", clear_on_submit=True):
+                st.caption("Enter totals for the day; saving again replaces the values you fill in.")
+                col1, col2 = st.columns(2)
+                with col1:
+                    weight = st.number_input("Weight (kg)", min_value=30.0, max_value=200.0, value=None, step=0.1)
+                    calories_in = st.number_input("Calories eaten", min_value=0, max_value=10000, value=None, step=50)
+                with col2:
+                    step_count = st.number_input("Steps", min_value=0, max_value=100000, value=None, step=500)
+                    calories_out = st.number_input("Calories burned", min_value=0, max_value=10000, value=None, step=50)
+                completed = st.checkbox("I completed today's workout")
+                if st.form_submit_button("Save"):
+                    entries = {metric: value for metric, value in [
+                        ("weight", weight), ("calories_in", calories_in),
+                        ("calories_out", calories_out), ("steps", step_count),
+                    ] if value is not None}
+                    if completed:
+                        entries["workouts"] = 1
+                    if entries:
+                        progress.log(entries)
+                        st.rerun()
+                    st.caption("Enter at least one value to log.")
     
     if page == "Workouts":
         st.header("🏋️ Weekly Workout Plan")
         st.write("Your personalized workout schedule:")
         
-        # Get day-specific workouts
+        days = DAYS
+        slots = {day: st.empty() for day in days}
+        
+        # The week is fetched once per set of workout inputs and kept with
+        # the session, so revisiting the page doesn't go back to the model
         user_data = st.session_state.user_data
-        workout_plans = lch.get_daily_workouts(
-            user_data["workout_days"], user_data["fitness_goal"], 
-            user_data["workout_level"], user_data["workout_type"]
-        )
+        inputs = workout_inputs(user_data)
+        session.restore("workouts")
+        saved = st.session_state.get("workouts")
+        workout_plans = saved["plans"] if saved and saved["inputs"] == inputs else None
+        
+        # Otherwise reuse the onboarding prefetch if it ran
+        prefetched = st.session_state.get("prefetch")
+        if workout_plans is None and prefetched and "workouts" in prefetched:
+            with st.spinner("Loading your workouts..."):
+                workout_plans = prefetch.get_result(prefetched, "workouts", lambda: None)
+        
+        # Otherwise stream the week, filling each day as soon as it arrives
+        if workout_plans is None:
+            workout_plans = {}
+            for day in days:
+                render_workout_day(slots[day], day, None)
+            for day, day_plan in lch.stream_daily_workouts(*inputs):
+                workout_plans[day] = day_plan
+                render_workout_day(slots[day], day, day_plan)
         
-        days = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+        if not saved or saved["inputs"] != inputs:
+            st.session_state.workouts = {"inputs": inputs, "plans": workout_plans}
+            session.save("workouts")
         
         for day in days:
-            with st.expander(f"📅 {day}", expanded=False):
-                day_plan = workout_plans.get(day, "Rest Day - Recovery and stretching")
-                if "rest" in day_plan.lower():
-                    st.info(f"🛌 **Rest Day** - Focus on recovery, light stretching, or a gentle walk")
-                else:
-                    st.markdown(day_plan)
+            render_workout_day(slots[day], day, workout_plans.get(day, "Rest Day - Recovery and stretching"))
+        
+        # The rule-built week needs no model call; coaching notes on it are
+        # optional and streamed only when asked for
+        if lch.WORKOUT_SOURCE == "rules":
+            notes_slot = st.empty()
+            notes = st.session_state.workouts.get("notes")
+            if notes:
+                notes_slot.markdown(notes)
+            elif st.button("✨ Personalize with coach notes"):
+                notes = ""
+                for chunk in lch.stream_workout_notes(*inputs, user_data["age"], user_data["gender"]):
+                    notes += chunk
+                    notes_slot.markdown(notes)
+                st.session_state.workouts["notes"] = notes
+                session.save("workouts")
     
     elif page == "Nutrition":
         st.header("🥗 Nutrition Plan")
         
         user_data = st.session_state.user_data
-        bmi, bmr = calculate_bmr_bmi(
-            user_data["weight"], user_data["height"], 
-            user_data["age"], user_data["gender"]
-        )
-        
-        # Calculate TDEE and weight loss calories with better clarity
-        activity_multiplier = 1.6  # Moderate activity
-        tdee = int(bmr * activity_multiplier)  # Total Daily Energy Expenditure
-        
-        if user_data["fitness_goal"] == "Weight Loss":
-            daily_calories = tdee - 500  # Safe 500 cal deficit
-            calculation_note = f"TDEE ({tdee}) - 500 deficit"
-        elif user_data["fitness_goal"] == "Weight Gain":
-            daily_calories = tdee + 500  # 500 cal surplus
-            calculation_note = f"TDEE ({tdee}) + 500 surplus"
-        elif user_data["fitness_goal"] == "Build Muscle":
-            daily_calories = tdee + 200  # Slight surplus
-            calculation_note = f"TDEE ({tdee}) + 200 surplus"
-        else:
-            daily_calories = tdee  # Maintenance
-            calculation_note = f"TDEE ({tdee}) maintenance"
-        
-        # Display BMR, BMI and Calorie targets
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            st.metric("BMI", f"{bmi}")
-            if bmi < 18.5:
-                st.info("Underweight")
-            elif 18.5 <= bmi < 25:
-                st.success("Normal weight")
-            elif 25 <= bmi < 30:
-                st.warning("Overweight")
-            else:
-                st.error("Obese")
-        
-        with col2:
-            st.metric("BMR", f"{int(bmr)} cal/day")
-            st.caption("Basal Metabolic Rate")
+        targets = profile_targets(user_data)
+        daily_calories = targets["daily_calories"]
         
-        with col3:
-            st.metric("Daily Calorie Target", f"{daily_calories} cal")
-            st.caption(calculation_note)
-            if user_data["fitness_goal"] == "Weight Loss":
-                st.info(f"⚠️ Never eat below BMR: {int(bmr)} calories")
+        nutrition_metrics(user_data, targets)
         
         st.divider()
         
-        # Initialize nutrition plan in session state
+        # Display current nutrition plan. Take the onboarding prefetch if it
+        # exists, otherwise stream a fresh one on first visit.
+        st.subheader("📋 Your Personalized Meal Plan")
+        session.restore("nutrition_plan")
+        prefetched = st.session_state.get("prefetch")
+        if "nutrition_plan" not in st.session_state and prefetched and "nutrition_plan" in prefetched:
+            with st.spinner("Finishing your personalized nutrition plan..."):
+                plan = prefetch.get_result(prefetched, "nutrition_plan", lambda: None)
+            if plan:
+                st.session_state.nutrition_plan = plan
+                save_plan("nutrition_plan")
+        plan_slot = st.empty()
         if "nutrition_plan" not in st.session_state:
-            with st.spinner("Generating your personalized nutrition plan..."):
-                st.session_state.nutrition_plan = lch.get_nutrition_plan(
+            with plan_slot.container():
+                st.session_state.nutrition_plan = st.write_stream(lch.stream_nutrition_plan(
                     user_data["age"], user_data["gender"], user_data["weight"],
                     user_data["height"], user_data["fitness_goal"], user_data["diet_pref"],
                     daily_calories, user_data["country"]
-                )
-        
-        # Display current nutrition plan
-        st.subheader("📋 Your Personalized Meal Plan")
-        st.markdown(st.session_state.nutrition_plan)
+                ))
+            save_plan("nutrition_plan")
+        else:
+            plan_slot.markdown(st.session_state.nutrition_plan)
+        if fallbacks.is_degraded(st.session_state.nutrition_plan) and st.button("🔄 Try again for a personalised plan"):
+            del st.session_state["nutrition_plan"]
+            if prefetched:
+                prefetched.pop("nutrition_plan", None)
+            st.rerun()
+        if st.session_state.pop("nutrition_plan_updated", False):
+            st.success("✅ Meal plan updated!")
         
         st.divider()
-        
-        # Meal Customization Chatbot
-        st.subheader("🤖 Meal Customization Assistant")
-        st.write("Don't like a specific meal? Ask me to modify it while keeping the same macros!")
-        
-        # Initialize nutrition chat history
-        if "nutrition_chat_history" not in st.session_state:
-            st.session_state.nutrition_chat_history = []
-            # Add welcome message
-            welcome_msg = f"""Hi! I'm your meal customization assistant for **{user_data['country']}**. I can help you:
-
-🔄 **Replace meals** - "Change the grilled chicken lunch to something local"
-📊 **Adjust macros** - "Make the breakfast higher in protein"  
-🥗 **Suggest alternatives** - "Give me traditional {user_data['country']} options for dinner"
-📱 **Calculate calories** - "How many calories in 100g paneer?"
-
-Your current targets: **{daily_calories} calories/day** | **{user_data['diet_pref']} diet** | **{user_data['country']} cuisine**
-
-What would you like to modify in your meal plan?"""
-            
-            st.session_state.nutrition_chat_history.append({
-                "role": "assistant", 
-                "content": welcome_msg
-            })
-        
-        # Display chat history
-        for message in st.session_state.nutrition_chat_history:
-            with st.chat_message(message["role"]):
-                st.write(message["content"])
-        
-        # Chat input for meal modifications
-        user_message = st.chat_input("Ask me to modify meals, suggest alternatives, or adjust macros...")
-        
-        if user_message:
-            st.session_state.nutrition_chat_history.append({"role": "user", "content": user_message})
-            
-            with st.chat_message("user"):
-                st.write(user_message)
-            
-            # Get nutritionist response for meal modification
-            with st.chat_message("assistant"):
-                with st.spinner("Thinking..."):
-                    bot_response = lch.chat_nutrition_modification(
-                        user_message, 
-                        st.session_state.nutrition_plan,
-                        user_data["diet_pref"], 
-                        daily_calories,
-                        user_data["fitness_goal"],
-                        st.session_state.nutrition_chat_history,
-                        user_data["country"]
-                    )
-                    st.write(bot_response)
-            
-            st.session_state.nutrition_chat_history.append({"role": "assistant", "content": bot_response})
-            
-            # If the response contains a new meal plan, update it
-            if "## Updated Meal Plan" in bot_response or "**Updated" in bot_response:
-                with st.spinner("Updating your meal plan..."):
-                    # Generate updated plan
-                    updated_plan = lch.generate_updated_nutrition_plan(
-                        user_message, 
-                        st.session_state.nutrition_plan,
-                        user_data, 
-                        daily_calories
-                    )
-                    if updated_plan:
-                        st.session_state.nutrition_plan = updated_plan
-                        st.success("✅ Meal plan updated! Refresh to see changes above.")
+        nutrition_chat_panel(user_data, daily_calories)
     
     elif page == "Recipe Chat":
         st.header("👨‍🍳 Recipe & Nutrition Chat")
@@ -316,50 +560,81 @@ What would you like to modify in your meal plan?"""
         user_data = st.session_state.user_data
         
         # Calculate daily calories for recipe chat
-        bmi, bmr = calculate_bmr_bmi(
-            user_data["weight"], user_data["height"], 
-            user_data["age"], user_data["gender"]
-        )
-        activity_multiplier = 1.6
-        tdee = int(bmr * activity_multiplier)
+        daily_calories = profile_targets(user_data)["daily_calories"]
+        recipe_chat_panel(user_data, daily_calories)
+    
+    elif page == "Progress":
+        st.header("📈 Progress Tracking")
         
-        if user_data["fitness_goal"] == "Weight Loss":
-            daily_calories = tdee - 500
-        elif user_data["fitness_goal"] == "Weight Gain":
-            daily_calories = tdee + 500
-        elif user_data["fitness_goal"] == "Build Muscle":
-            daily_calories = tdee + 200
+        if progress.empty:
+            st.info("Nothing logged yet. Log your weight, meals, steps and workouts from Home.")
         else:
-            daily_calories = tdee
-        
-        # Display chat history first
-        for message in st.session_state.chat_history:
-            with st.chat_message(message["role"]):
-                st.write(message["content"])
-        
-        # Chat input
-        user_message = st.chat_input("Ask about recipes, calories, meal prep...")
-        
-        if user_message:
-            st.session_state.chat_history.append({"role": "user", "content": user_message})
-            
-            with st.chat_message("user"):
-                st.write(user_message)
+            burned = progress["calories_out"].week(today)
+            steps = progress["steps"].week(today)
+            done = progress["workouts"].week(today)
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Calories Burned this week", f"{burned or 0:,.0f} Cal")
+            with col2:
+                st.metric("Steps Count this week", f"{steps or 0:,.0f}")
+            with col3:
+                st.metric("Workouts this week", f"{done or 0:.0f} / {st.session_state.user_data['workout_days']}")
             
-            # Get chatbot response
-            with st.chat_message("assistant"):
-                with st.spinner("Thinking..."):
-                    bot_response = lch.chat_with_nutritionist(
-                        user_message, user_data["diet_pref"], 
-                        daily_calories, st.session_state.chat_history
-                    )
-                    st.write(bot_response)
+            weight = progress["weight"].rolling(today)
+            if weight is not None:
+                before = progress["weight"].rolling(today - 7)
+                st.metric("Weight (7-day average)", f"{weight:.1f} kg",
+                          delta=f"{weight - before:+.1f} kg vs previous week" if before is not None else None,
+                          delta_color="off")
             
-            st.session_state.chat_history.append({"role": "assistant", "content": bot_response})
-    
-    elif page == "Progress":
-        st.header("📈 Progress Tracking")
-        st.metric("Calories Burned this week", "4250 Cal")
-        st.metric("Steps Count this week", "57,252")
-        st.line_chart([10, 30, 50, 20, 60, 80, 40])
-        st.caption("Weekly activity trend")
+            labels = {label: metric for metric, label in PROGRESS_CHARTS}
+            label = st.selectbox("Chart", list(labels))
+            series = progress[labels[label]]
+            resolution, points = series.chart(today)
+            if points:
+                st.line_chart({"date": [date for date, _ in points], label: [value for _, value in points]},
+                              x="date", y=label)
+                st.caption(f"{resolution.capitalize()} {label.lower()}"
+                           + (" (average)" if series.kind == "mean" else " (total)"))
+            else:
+                st.caption(f"No {label.lower()} logged yet.")
+
+# ---------------- PERFORMANCE PANEL ----------------
+# Hidden unless FITVISOR_PERF_PANEL=1 or the URL has ?perf=1
+if os.getenv("FITVISOR_PERF_PANEL") == "1" or st.query_params.get("perf") == "1":
+    with st.sidebar.expander("⏱️ Performance"):
+        summary = telemetry.metrics.summary()
+        if not summary:
+            st.caption("No LLM helper calls in this process yet.")
+        else:
+            st.dataframe([
+                {
+                    "function": function,
+                    "calls": row["calls"],
+                    "p50 (s)": round(row["p50"], 3),
+                    "p95 (s)": round(row["p95"], 3),
+                    "TTFT p50 (s)": round(row["ttft_p50"], 3) if row["ttft_p50"] is not None else None,
+                    "cache hits": f"{row['cache_hit_rate']:.0%}",
+                    "tokens": row["prompt_tokens"] + row["completion_tokens"],
+                    "cost ($)": round(row["cost_usd"], 5),
+                }
+                for function, row in summary.items()
+            ], hide_index=True)
+            st.caption("Current server process only; tokens and cost are estimates.")
+        renders = telemetry.metrics.render_summary()
+        if renders:
+            st.dataframe([
+                {"rerun": scope, "runs": row["runs"], "p50 (ms)": round(row["p50"] * 1000, 1),
+                 "p95 (ms)": round(row["p95"] * 1000, 1)}
+                for scope, row in renders.items()
+            ], hide_index=True)
+            st.caption("\"app\" is a full script rerun; panels rerun on their own when you chat.")
+        llm = resilience.guard.stats()
+        events = Counter()
+        for counts in llm["functions"].values():
+            events.update(counts)
+        if events:
+            st.caption(f"Model calls: breaker {llm['breaker']}, " + ", ".join(
+                f"{count} {event.replace('_', ' ')}" for event, count in sorted(events.items())))
+
+telemetry.metrics.observe_render("app", time.perf_counter() - _run_started)
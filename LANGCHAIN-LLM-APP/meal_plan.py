@@ -0,0 +1,193 @@
+import re
+
+# Addressable sections of the plan get_nutrition_plan asks for, in order.
+# Each maps to the keyword that identifies its markdown heading.
+SECTIONS = {
+    "macros": "macronutrient",
+    "breakfast": "breakfast",
+    "lunch": "lunch",
+    "snacks": "snack",
+    "dinner": "dinner",
+    "hydration": "hydration",
+}
+MEALS = ["breakfast", "lunch", "snacks", "dinner"]
+
+_HEADING = re.compile(r"^\s*#{1,6}\s+(.*)$")
+
+# Words in a chat request that point at one section
+_REQUEST_KEYWORDS = {
+    "breakfast": ["breakfast", "morning meal"],
+    "lunch": ["lunch", "midday"],
+    "snacks": ["snack", "snacks"],
+    "dinner": ["dinner", "supper", "evening meal"],
+    "hydration": ["water", "hydration", "supplement", "supplements"],
+    "macros": ["macro", "macros", "macronutrient"],
+}
+
+
+def section_for_heading(heading):
+    heading = heading.lower()
+    for key, keyword in SECTIONS.items():
+        if keyword in heading:
+            return key
+    return None
+
+
+# The one section a modification request is about, or None when it names
+# none or several (those need the whole plan)
+def detect_target_section(user_message):
+    text = user_message.lower()
+    matches = [
+        key for key, words in _REQUEST_KEYWORDS.items()
+        if any(re.search(rf"\b{re.escape(word)}\b", text) for word in words)
+    ]
+    return matches[0] if len(matches) == 1 else None
+
+
+class MealPlan:
+    # A nutrition plan split at its headings. Blocks keep their original
+    # text and order, so to_markdown() round-trips the plan exactly; blocks
+    # under a known heading are addressable by section key.
+    def __init__(self, blocks):
+        self.blocks = blocks  # list of [section key or None, text]
+
+    @classmethod
+    def parse(cls, markdown):
+        blocks = [[None, []]]
+        for line in (markdown or "").split("\n"):
+            match = _HEADING.match(line)
+            if match:
+                blocks.append([section_for_heading(match.group(1)), [line]])
+            else:
+                blocks[-1][1].append(line)
+        parsed = [[key, "\n".join(lines)] for key, lines in blocks]
+        if parsed[0] == [None, ""] and len(parsed) > 1:
+            parsed.pop(0)
+        return cls(parsed)
+
+    def _index(self, key):
+        for i, (block_key, _) in enumerate(self.blocks):
+            if block_key == key:
+                return i
+        return None
+
+    def has(self, key):
+        return self._index(key) is not None
+
+    def section(self, key):
+        i = self._index(key)
+        return self.blocks[i][1].strip("\n") if i is not None else None
+
+    def heading(self, key):
+        section = self.section(key)
+        return section.split("\n", 1)[0].strip() if section else None
+
+    # Swap one section's text. A replacement without a heading keeps the
+    # original one; trailing blank lines are preserved so spacing is stable.
+    def replace(self, key, text):
+        i = self._index(key)
+        if i is None:
+            raise KeyError(key)
+        text = text.strip("\n")
+        if not _HEADING.match(text.split("\n", 1)[0]):
+            text = f"{self.heading(key)}\n{text}"
+        old = self.blocks[i][1]
+        trailing = old[len(old.rstrip("\n")):]
+        self.blocks[i][1] = text + trailing
+
+    # Macro breakdown plus each meal's heading (which carries its calories):
+    # enough context to keep an edited section consistent with the day
+    def totals(self):
+        lines = []
+        if self.has("macros"):
+            lines.append(self.section("macros"))
+        meal_headings = [self.heading(key) for key in MEALS if self.has(key)]
+        if meal_headings:
+            lines.append("Meal calorie split:\n" + "\n".join(f"- {h.lstrip('#').strip()}" for h in meal_headings))
+        return "\n\n".join(lines)
+
+    # What a modification prompt needs to see: the targeted section plus the
+    # totals, or the whole plan when no single section is targeted
+    def excerpt(self, key):
+        if key is None or not self.has(key):
+            return self.to_markdown()
+        if key == "macros":
+            return self.totals()
+        return f"{self.totals()}\n\n{self.section(key)}"
+
+    def to_markdown(self):
+        return "\n".join(text for _, text in self.blocks)
+
+
+# ---------------- PLAN PATCHES ----------------
+# A modification reply carries its plan edits after the conversational
+# text, one block per changed section:
+#
+#   <<<UPDATE lunch>>>
+#   ### 🍽️ Lunch (600 calories)
+#   - ...
+#   <<<END>>>
+
+PATCH_MARKER = "<<<UPDATE"
+_PATCH_BLOCK = re.compile(r"<<<UPDATE\s+(\w+)\s*>>>\s*\n(.*?)(?:<<<END>>>|\Z)", re.DOTALL)
+
+
+def parse_patches(text):
+    patches = []
+    for match in _PATCH_BLOCK.finditer(text):
+        key = match.group(1).lower()
+        if key in SECTIONS and match.group(2).strip():
+            patches.append((key, match.group(2).strip()))
+    return patches
+
+
+# Apply (section, content) patches to a plan; sections the plan doesn't
+# have are skipped. Returns the new markdown, or None if nothing applied.
+def apply_patches(current_plan, patches):
+    plan = MealPlan.parse(current_plan)
+    applied = False
+    for key, content in patches:
+        if plan.has(key):
+            plan.replace(key, content)
+            applied = True
+    return plan.to_markdown() if applied else None
+
+
+class ModificationStreamParser:
+    # Splits a streamed modification reply: feed() returns the text that is
+    # safe to show (holding back anything that could be the start of a
+    # patch marker), and everything after the marker is collected for
+    # parse_patches() once the stream closes.
+    def __init__(self):
+        self._buffer = ""
+        self._in_patch = False
+        self.reply = ""
+        self.patches = []
+
+    def feed(self, chunk):
+        self._buffer += chunk
+        if self._in_patch:
+            return ""
+        index = self._buffer.find(PATCH_MARKER)
+        if index >= 0:
+            visible, self._buffer = self._buffer[:index], self._buffer[index:]
+            self._in_patch = True
+        else:
+            safe = max(len(self._buffer) - (len(PATCH_MARKER) - 1), 0)
+            # Only hold back a suffix that actually could begin the marker
+            while safe < len(self._buffer) and not PATCH_MARKER.startswith(self._buffer[safe:]):
+                safe += 1
+            visible, self._buffer = self._buffer[:safe], self._buffer[safe:]
+        self.reply += visible
+        return visible
+
+    def close(self):
+        if self._in_patch:
+            self.patches = parse_patches(self._buffer)
+            visible = ""
+        else:
+            visible = self._buffer
+            self.reply += visible
+        self._buffer = ""
+        self.reply = self.reply.rstrip()
+        return visible
@@ -0,0 +1,164 @@
+# Single source for the BMI/BMR/TDEE, calorie target and macro arithmetic.
+# compute_targets() works on whole arrays of profiles at once;
+# profile_targets() is the pure-Python fast path for one user in the UI.
+# Both produce identical numbers.
+
+ACTIVITY_MULTIPLIER = 1.6  # Moderate activity
+
+# Daily calorie adjustment on top of TDEE
+GOAL_ADJUSTMENTS = {
+    "Weight Loss": -500,   # Safe 500 cal deficit
+    "Weight Gain": 500,    # 500 cal surplus
+    "Build Muscle": 200,   # Slight surplus
+}
+
+# (protein, carbs, fat) share of daily calories
+GOAL_MACROS = {
+    "Build Muscle": (0.30, 0.40, 0.30),
+    "Weight Gain": (0.30, 0.40, 0.30),
+    "Weight Loss": (0.35, 0.35, 0.30),
+}
+DEFAULT_MACROS = (0.25, 0.45, 0.30)  # Maintain, Flexibility
+
+# Share of daily calories per meal; dinner takes the remainder
+MEAL_SPLIT = {"breakfast": 0.25, "lunch": 0.30, "snack": 0.15}
+
+# Harris-Benedict coefficients: (base, weight, height, age)
+BMR_MALE = (88.362, 13.397, 4.799, 5.677)
+BMR_FEMALE = (447.593, 9.247, 3.098, 4.330)
+
+
+# ---------------- SCALAR FAST PATH ----------------
+
+def calculate_bmi(weight, height):
+    height_m = height / 100
+    return round(weight / (height_m ** 2), 1)
+
+def calculate_bmr(weight, height, age, gender):
+    base, w, h, a = BMR_MALE if gender.lower() == "male" else BMR_FEMALE
+    return round(base + (w * weight) + (h * height) - (a * age), 0)
+
+def macro_targets(daily_calories, weight, fitness_goal):
+    protein_pct, carb_pct, fat_pct = GOAL_MACROS.get(fitness_goal, DEFAULT_MACROS)
+
+    protein_cals = daily_calories * protein_pct
+    carb_cals = daily_calories * carb_pct
+    fat_cals = daily_calories * fat_pct
+
+    breakfast_cals = int(daily_calories * MEAL_SPLIT["breakfast"])
+    lunch_cals = int(daily_calories * MEAL_SPLIT["lunch"])
+    snack_cals = int(daily_calories * MEAL_SPLIT["snack"])
+
+    return {
+        "protein_cals": int(protein_cals),
+        "carb_cals": int(carb_cals),
+        "fat_cals": int(fat_cals),
+        "protein_grams": int(protein_cals / 4),
+        "carb_grams": int(carb_cals / 4),
+        "fat_grams": int(fat_cals / 9),
+        "fiber_grams": int(weight * 0.5),
+        "water_intake": round(weight * 35 / 1000, 1),
+        "breakfast_cals": breakfast_cals,
+        "lunch_cals": lunch_cals,
+        "snack_cals": snack_cals,
+        "dinner_cals": daily_calories - breakfast_cals - lunch_cals - snack_cals,
+    }
+
+def profile_targets(weight, height, age, gender, fitness_goal, activity_multiplier=ACTIVITY_MULTIPLIER):
+    bmr = calculate_bmr(weight, height, age, gender)
+    tdee = int(bmr * activity_multiplier)  # Total Daily Energy Expenditure
+    adjustment = GOAL_ADJUSTMENTS.get(fitness_goal, 0)
+    daily_calories = tdee + adjustment
+    targets = {
+        "bmi": calculate_bmi(weight, height),
+        "bmr": bmr,
+        "tdee": tdee,
+        "calorie_adjustment": adjustment,
+        "daily_calories": daily_calories,
+    }
+    targets.update(macro_targets(daily_calories, weight, fitness_goal))
+    return targets
+
+
+# ---------------- VECTORIZED ----------------
+# numpy is imported inside these so the UI's scalar path starts without it
+
+# np.round scales by 10**ndigits before rounding, which can flip exact
+# decimal ties the other way from Python's round(); redo those few with
+# round() so both paths agree to the digit
+def _round(values, ndigits):
+    import numpy as np
+    flat = np.atleast_1d(values)
+    rounded = np.round(flat, ndigits)
+    scaled = flat * 10 ** ndigits
+    ties = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if ties.any():
+        rounded[ties] = [round(float(v), ndigits) for v in flat[ties]]
+    return rounded.reshape(np.shape(values))
+
+# Map each goal string onto a per-goal table value, touching each distinct
+# goal once instead of every profile
+def _by_goal(goals, table, default):
+    import numpy as np
+    unique, inverse = np.unique(goals, return_inverse=True)
+    values = np.array([table.get(goal, default) for goal in unique], dtype=float)
+    return values[inverse.reshape(goals.shape)]
+
+# Same outputs as profile_targets(), as arrays aligned with the inputs
+def compute_targets(weight, height, age, gender, fitness_goal, activity_multiplier=ACTIVITY_MULTIPLIER):
+    import numpy as np
+    weight = np.asarray(weight, dtype=float)
+    height = np.asarray(height, dtype=float)
+    age = np.asarray(age, dtype=float)
+    gender = np.char.lower(np.asarray(gender, dtype=str))
+    goals = np.asarray(fitness_goal, dtype=str)
+
+    bmi = _round(weight / (height / 100) ** 2, 1)
+
+    coeffs = np.where((gender == "male")[..., None], BMR_MALE, BMR_FEMALE)
+    bmr = np.round(
+        coeffs[..., 0] + (coeffs[..., 1] * weight) + (coeffs[..., 2] * height) - (coeffs[..., 3] * age), 0
+    )
+    tdee = np.trunc(bmr * activity_multiplier).astype(np.int64)
+    adjustment = _by_goal(goals, GOAL_ADJUSTMENTS, 0).astype(np.int64)
+    daily_calories = tdee + adjustment
+
+    macros = _by_goal(goals, {goal: pcts for goal, pcts in GOAL_MACROS.items()}, DEFAULT_MACROS)
+    protein_cals = daily_calories * macros[..., 0]
+    carb_cals = daily_calories * macros[..., 1]
+    fat_cals = daily_calories * macros[..., 2]
+
+    breakfast_cals = np.trunc(daily_calories * MEAL_SPLIT["breakfast"]).astype(np.int64)
+    lunch_cals = np.trunc(daily_calories * MEAL_SPLIT["lunch"]).astype(np.int64)
+    snack_cals = np.trunc(daily_calories * MEAL_SPLIT["snack"]).astype(np.int64)
+
+    return {
+        "bmi": bmi,
+        "bmr": bmr,
+        "tdee": tdee,
+        "calorie_adjustment": adjustment,
+        "daily_calories": daily_calories,
+        "protein_cals": np.trunc(protein_cals).astype(np.int64),
+        "carb_cals": np.trunc(carb_cals).astype(np.int64),
+        "fat_cals": np.trunc(fat_cals).astype(np.int64),
+        "protein_grams": np.trunc(protein_cals / 4).astype(np.int64),
+        "carb_grams": np.trunc(carb_cals / 4).astype(np.int64),
+        "fat_grams": np.trunc(fat_cals / 9).astype(np.int64),
+        "fiber_grams": np.trunc(weight * 0.5).astype(np.int64),
+        "water_intake": _round(weight * 35 / 1000, 1),
+        "breakfast_cals": breakfast_cals,
+        "lunch_cals": lunch_cals,
+        "snack_cals": snack_cals,
+        "dinner_cals": daily_calories - breakfast_cals - lunch_cals - snack_cals,
+    }
+
+# Convenience wrapper for a list of user_data dicts as collected by main.py
+def targets_for_profiles(profiles, activity_multiplier=ACTIVITY_MULTIPLIER):
+    return compute_targets(
+        [p["weight"] for p in profiles],
+        [p["height"] for p in profiles],
+        [p["age"] for p in profiles],
+        [p["gender"] for p in profiles],
+        [p["fitness_goal"] for p in profiles],
+        activity_multiplier,
+    )
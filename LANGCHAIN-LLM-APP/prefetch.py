@@ -0,0 +1,55 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+import Langchain_helper as lch
+import telemetry
+
+# Shared by every session in the process. The helpers are I/O bound, so a
+# few threads are enough to overlap the plan, workout and nutrition calls.
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("FITVISOR_PREFETCH_WORKERS", "8")),
+    thread_name_prefix="fitvisor-prefetch"
+)
+
+# Worker threads don't inherit the session's page label
+def _submit(func, *args):
+    return _executor.submit(telemetry.run_on_page, "prefetch", func, *args)
+
+# Fire the onboarding generations concurrently and return their futures by
+# name. Results land in the response cache as well, so other sessions with
+# the same profile get them for free.
+def start_prefetch(user_data, daily_calories, include_plan=True):
+    futures = {}
+    if include_plan:
+        futures["plan"] = _submit(
+            lch.generate_fitness_plan,
+            user_data["age"], user_data["gender"], user_data["weight"],
+            user_data["height"], user_data["fitness_goal"], user_data["workout_days"],
+            user_data["workout_level"], user_data["workout_type"], user_data["diet_pref"]
+        )
+    futures["workouts"] = _submit(
+        lch.get_daily_workouts,
+        user_data["workout_days"], user_data["fitness_goal"],
+        user_data["workout_level"], user_data["workout_type"]
+    )
+    futures["nutrition_plan"] = _submit(
+        lch.get_nutrition_plan,
+        user_data["age"], user_data["gender"], user_data["weight"],
+        user_data["height"], user_data["fitness_goal"], user_data["diet_pref"],
+        daily_calories, user_data["country"]
+    )
+    return futures
+
+def is_ready(futures, name):
+    future = (futures or {}).get(name)
+    return future is not None and future.done()
+
+# Wait for a prefetched result; if it was never started or failed, run
+# `fallback` in the caller instead so the page still renders.
+def get_result(futures, name, fallback, timeout=None):
+    future = (futures or {}).get(name)
+    if future is not None:
+        try:
+            return future.result(timeout=timeout)
+        except Exception:
+            pass
+    return fallback()
@@ -0,0 +1,228 @@
+import array
+import datetime
+import os
+import struct
+import threading
+from collections import OrderedDict
+import session_store
+
+# Per-user activity log: weight, calories eaten and burned, steps and
+# completed workouts. Entries are appended to one small binary file per
+# session token and to in-memory arrays, and each entry updates its day,
+# week and month buckets as it arrives; a day's value is the last one
+# logged for it. Dashboards read a few buckets (or at most one chart's
+# worth), so rendering costs the same after a week of logging as after
+# years.
+
+# (metric, unit, how a bucket is summarised). A metric's id is its position
+# here and is written to disk: append new metrics, never reorder.
+METRICS = [
+    ("weight", "kg", "mean"),
+    ("calories_in", "kcal", "sum"),
+    ("calories_out", "kcal", "sum"),
+    ("steps", "steps", "sum"),
+    ("workouts", "sessions", "sum"),
+]
+_IDS = {name: index for index, (name, _, _) in enumerate(METRICS)}
+
+# metric id, day (date ordinal), value: 13 bytes per entry
+_RECORD = struct.Struct("<BId")
+
+# Most buckets a chart returns; longer histories use coarser buckets
+CHART_POINTS = 60
+
+# Logs kept in memory per process (least recently used are dropped)
+MAX_OPEN_LOGS = 256
+
+
+def today():
+    return datetime.date.today().toordinal()
+
+def week_start(day):
+    return day - (day - 1) % 7  # ordinal 1 is a Monday
+
+def month_key(day):
+    date = datetime.date.fromordinal(day)
+    return date.year * 12 + date.month - 1
+
+def _month_start(key):
+    return datetime.date(key // 12, key % 12 + 1, 1).toordinal()
+
+
+class Bucket:
+    __slots__ = ("count", "total")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+
+    def value(self, kind):
+        return self.total if kind == "sum" else self.total / self.count
+
+
+class Series:
+    # Raw entries in parallel append-only arrays, each day's value (the
+    # last entry logged for it wins, so saving a day twice doesn't count
+    # it twice), and week and month buckets over those day values
+    def __init__(self, kind):
+        self.kind = kind
+        self.days = array.array("I")
+        self.values = array.array("d")
+        self.daily = {}
+        self.weekly = {}
+        self.monthly = {}
+        self.first_day = None
+
+    def __len__(self):
+        return len(self.values)
+
+    # Most recently logged value, or None
+    @property
+    def latest(self):
+        return self.values[-1] if self.values else None
+
+    def add(self, day, value):
+        self.days.append(day)
+        self.values.append(value)
+        if self.first_day is None or day < self.first_day:
+            self.first_day = day
+        previous = self.daily.get(day)
+        self.daily[day] = value
+        for buckets, key in ((self.weekly, week_start(day)), (self.monthly, month_key(day))):
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = Bucket()
+            if previous is None:
+                bucket.count += 1
+                bucket.total += value
+            else:
+                bucket.total += value - previous
+
+    # Value for one day / summary of the Monday-Sunday week containing
+    # `day`, or None
+    def on(self, day):
+        return self.daily.get(day)
+
+    def week(self, day):
+        bucket = self.weekly.get(week_start(day))
+        return bucket.value(self.kind) if bucket else None
+
+    # The `days` days ending on `end`: a total for sums, the mean of the
+    # logged days for means; None when nothing was logged
+    def rolling(self, end, days=7):
+        values = [self.daily[day] for day in range(end - days + 1, end + 1) if day in self.daily]
+        if not values:
+            return None
+        return sum(values) if self.kind == "sum" else sum(values) / len(values)
+
+    # Downsampled history ending on `end`: daily buckets while they fit in
+    # `points`, then weekly, then monthly. Returns (resolution, [(date,
+    # value)]) for the buckets that have entries.
+    def chart(self, end, points=CHART_POINTS):
+        if self.first_day is None:
+            return "daily", []
+        span = end - self.first_day + 1
+        if span <= points:
+            keys = range(max(self.first_day, end - points + 1), end + 1)
+            return "daily", [(datetime.date.fromordinal(day), self.daily[day]) for day in keys if day in self.daily]
+        if span <= points * 7:
+            last = week_start(end)
+            keys = range(last - 7 * (points - 1), last + 1, 7)
+            return "weekly", self._points(self.weekly, keys, datetime.date.fromordinal)
+        last = month_key(end)
+        keys = range(last - points + 1, last + 1)
+        return "monthly", self._points(self.monthly, keys,
+                                       lambda key: datetime.date.fromordinal(_month_start(key)))
+
+    def _points(self, buckets, keys, to_date):
+        return [(to_date(key), buckets[key].value(self.kind)) for key in keys if key in buckets]
+
+
+class ProgressLog:
+    # With a path, entries are appended to the file and read back from it,
+    # so processes sharing the file see each other's entries on refresh();
+    # without one the log lives in memory only
+    def __init__(self, path=None):
+        self.path = path
+        self.series = {name: Series(kind) for name, _, kind in METRICS}
+        self._offset = 0
+        self._lock = threading.Lock()
+        self.refresh()
+
+    def __getitem__(self, metric):
+        return self.series[metric]
+
+    @property
+    def empty(self):
+        return not any(len(series) for series in self.series.values())
+
+    # Append {metric: value} entries for `day` (default today) in one
+    # write; each replaces that metric's earlier value for the day
+    def log(self, entries, day=None):
+        day = today() if day is None else day
+        records = [(_IDS[metric], day, float(value)) for metric, value in entries.items()]
+        if self.path is None:
+            with self._lock:
+                for record in records:
+                    self._add(*record)
+            return
+        with open(self.path, "ab") as f:
+            f.write(b"".join(_RECORD.pack(*record) for record in records))
+        self.refresh()
+
+    # Read entries appended to the file since the last refresh. A record
+    # another process is still writing is left for the next call.
+    def refresh(self):
+        if self.path is None:
+            return
+        try:
+            size = os.path.getsize(self.path)
+        except FileNotFoundError:
+            return
+        complete = size - size % _RECORD.size
+        if complete <= self._offset:
+            return
+        with self._lock:
+            if complete <= self._offset:
+                return
+            with open(self.path, "rb") as f:
+                f.seek(self._offset)
+                data = f.read(complete - self._offset)
+            for record in _RECORD.iter_unpack(data):
+                self._add(*record)
+            self._offset += len(data)
+
+    def _add(self, metric_id, day, value):
+        if metric_id < len(METRICS):  # ids from a newer version are skipped
+            self.series[METRICS[metric_id][0]].add(day, value)
+
+
+PROGRESS_DIR = os.getenv("FITVISOR_PROGRESS_DIR", os.path.join("data", "progress"))
+
+_logs = OrderedDict()
+_logs_lock = threading.Lock()
+
+def _path(token):
+    if not PROGRESS_DIR or not session_store.is_valid_token(token):
+        return None
+    try:
+        os.makedirs(PROGRESS_DIR, exist_ok=True)
+    except OSError:
+        return None  # e.g. read-only filesystem: keep the log in memory
+    return os.path.join(PROGRESS_DIR, f"{token}.bin")
+
+# The session's log, loaded once per process and refreshed on each call
+def get_log(token):
+    with _logs_lock:
+        log = _logs.get(token)
+        if log is not None:
+            _logs.move_to_end(token)
+    if log is None:
+        log = ProgressLog(_path(token))
+        with _logs_lock:
+            log = _logs.setdefault(token, log)
+            while len(_logs) > MAX_OPEN_LOGS:
+                _logs.popitem(last=False)
+    else:
+        log.refresh()
+    return log
@@ -0,0 +1,420 @@
+import contextlib
+import contextvars
+import functools
+import inspect
+import math
+import os
+import random
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import telemetry
+
+# Bounds how long a model call may take. Every backend call runs under a
+# per-prompt deadline on a worker thread, transient failures are retried with
+# jittered backoff while the deadline allows, a slow attempt can be hedged
+# with a duplicate request, and a circuit breaker stops calling a backend
+# that keeps failing. When the budget is spent the call raises Unavailable
+# and the helpers (see degrade()) answer from a stale cache entry or a
+# local template instead.
+
+# Only errors that say the backend is unreachable, slow or overloaded are
+# retried and answered by a fallback; anything else (a KeyError in a
+# parser, a prompt missing a variable) is a bug and propagates unchanged.
+# Exceptions can opt in or out with a `transient` attribute; provider
+# errors are matched by HTTP status or by class name, so this module needs
+# none of the client libraries.
+TRANSIENT_STATUSES = {408, 429, 500, 502, 503, 504}
+TRANSIENT_ERROR_NAMES = {
+    "ServiceUnavailable", "TooManyRequests", "ResourceExhausted", "InternalServerError",
+    "GatewayTimeout", "DeadlineExceeded", "TransportError", "ConnectionError", "Timeout",
+}
+
+# Seconds per prompt name (Langchain_helper.PROMPTS) from the first attempt
+# to the answer, or to the first chunk when streaming. Override with
+# FITVISOR_DEADLINES="chat_with_nutritionist=15,get_nutrition_plan=40".
+DEFAULT_DEADLINES = {
+    "generate_fitness_plan": 45,
+    "get_daily_workouts": 45,
+    "personalize_workouts": 20,
+    "get_nutrition_plan": 60,
+    "chat_with_nutritionist": 25,
+    "chat_nutrition_modification": 25,
+    "modify_nutrition_plan": 40,
+    "generate_updated_nutrition_plan": 60,
+    "generate_updated_section": 30,
+}
+DEFAULT_DEADLINE = 45
+
+# Successful attempts needed before an adaptive (p95) hedge delay is used
+HEDGE_MIN_SAMPLES = 20
+
+_END = object()
+
+
+class Unavailable(RuntimeError):
+    pass
+
+class DeadlineExceeded(Unavailable):
+    pass
+
+class CircuitOpen(Unavailable):
+    pass
+
+
+def _status(error):
+    for source in (error, getattr(error, "response", None)):
+        for attr in ("status_code", "code"):
+            value = getattr(source, attr, None)
+            if isinstance(value, int):
+                return value
+    return None
+
+def is_transient(error):
+    flag = getattr(error, "transient", None)
+    if flag is not None:
+        return bool(flag)
+    if isinstance(error, (Unavailable, TimeoutError, ConnectionError)):
+        return True
+    status = _status(error)
+    if status is not None:
+        return status in TRANSIENT_STATUSES
+    return any(cls.__name__ in TRANSIENT_ERROR_NAMES for cls in type(error).__mro__)
+
+
+def parse_deadlines(text):
+    deadlines = dict(DEFAULT_DEADLINES)
+    for item in filter(None, (part.strip() for part in (text or "").split(","))):
+        name, _, value = item.partition("=")
+        deadlines[name.strip()] = float(value)
+    return deadlines
+
+
+class CircuitBreaker:
+    # Closed: calls go through. After `failures` consecutive failures it
+    # opens and calls fail fast for `cooldown` seconds; then one trial call
+    # is let through (half open) and its outcome closes or reopens it.
+    # failures=0 disables the breaker.
+    def __init__(self, failures=5, cooldown=30.0, clock=time.monotonic):
+        self.failures = failures
+        self.cooldown = cooldown
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.state = "closed"
+        self.opened = 0
+        self._consecutive = 0
+        self._opened_at = None
+        self._trial = False
+
+    def allow(self):
+        if not self.failures:
+            return True
+        with self._lock:
+            if self.state == "open" and self._clock() - self._opened_at >= self.cooldown:
+                self.state = "half_open"
+                self._trial = False
+            if self.state == "half_open" and not self._trial:
+                self._trial = True
+                return True
+            return self.state == "closed"
+
+    def success(self):
+        with self._lock:
+            self.state = "closed"
+            self._consecutive = 0
+            self._trial = False
+
+    # A call that ended without saying anything about the backend's health
+    # (e.g. a bug on our side): free the half-open trial slot for the next
+    def release(self):
+        with self._lock:
+            self._trial = False
+
+    def failure(self):
+        with self._lock:
+            self._consecutive += 1
+            if self.failures and (self.state == "half_open" or self._consecutive >= self.failures):
+                if self.state != "open":
+                    self.opened += 1
+                self.state = "open"
+                self._opened_at = self._clock()
+                self._trial = False
+
+
+class Guard:
+    # hedge_after: None (no hedging), seconds, or "p95" to hedge once an
+    # attempt is slower than the prompt's recent p95. idle_timeout bounds
+    # the gap between streamed chunks; None streams on the caller's thread.
+    def __init__(self, deadlines=None, retries=2, backoff=0.5, hedge_after=None, breaker=None,
+                 idle_timeout=30.0, max_workers=32, clock=time.monotonic):
+        self.deadlines = dict(DEFAULT_DEADLINES if deadlines is None else deadlines)
+        self.retries = retries
+        self.backoff = backoff
+        self.hedge_after = hedge_after
+        self.breaker = breaker or CircuitBreaker()
+        self.idle_timeout = idle_timeout
+        self._clock = clock
+        # Timed-out attempts can't be interrupted and finish in the
+        # background, so the pool also bounds abandoned upstream calls
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fitvisor-llm")
+        self._lock = threading.Lock()
+        self._latencies = defaultdict(lambda: deque(maxlen=200))  # name -> successful attempt seconds
+        self._counts = defaultdict(Counter)
+
+    @classmethod
+    def from_env(cls):
+        hedge = os.getenv("FITVISOR_HEDGE_AFTER", "").strip().lower()
+        idle = os.getenv("FITVISOR_STREAM_IDLE_TIMEOUT", "30")
+        return cls(
+            deadlines=parse_deadlines(os.getenv("FITVISOR_DEADLINES")),
+            retries=int(os.getenv("FITVISOR_LLM_RETRIES", "2")),
+            backoff=float(os.getenv("FITVISOR_LLM_BACKOFF", "0.5")),
+            hedge_after=hedge if hedge == "p95" else float(hedge) if hedge else None,
+            breaker=CircuitBreaker(
+                failures=int(os.getenv("FITVISOR_BREAKER_FAILURES", "5")),
+                cooldown=float(os.getenv("FITVISOR_BREAKER_COOLDOWN", "30")),
+            ),
+            idle_timeout=float(idle) if idle else None,
+            max_workers=int(os.getenv("FITVISOR_LLM_THREADS", "32")),
+        )
+
+    def deadline(self, name):
+        return self.deadlines.get(name, DEFAULT_DEADLINE)
+
+    def count(self, name, event, n=1):
+        with self._lock:
+            self._counts[name][event] += n
+
+    # Seconds after which a second attempt is started, or None
+    def hedge_delay(self, name):
+        if self.hedge_after != "p95":
+            return self.hedge_after
+        with self._lock:
+            samples = sorted(self._latencies[name])
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, math.ceil(0.95 * len(samples)) - 1)]
+
+    # Run func() on a worker with a copy of the caller's context
+    def _submit(self, func, *args):
+        return self._executor.submit(contextvars.copy_context().run, func, *args)
+
+    # The caller's before_attempt() hook, run once per backend request
+    @staticmethod
+    def _charge():
+        hook = _before_attempt.get()
+        if hook is not None:
+            hook()
+
+    # One deadline-bounded attempt, hedged with a duplicate if it is slow.
+    # Returns the first successful result; `abandon(future)` is called for
+    # attempts that lose the race or outlive the deadline.
+    def _attempt(self, name, func, deadline, abandon):
+        hedge = self.hedge_delay(name)
+        primary = self._submit(func)
+        first_started = self._clock()
+        started = {primary: first_started}
+        hedged = hedge is None
+        error = None
+        while True:
+            now = self._clock()
+            timeout = deadline - now
+            if not hedged:
+                timeout = min(timeout, first_started + hedge - now)
+            done, _ = wait(list(started), timeout=max(0.0, timeout), return_when=FIRST_COMPLETED)
+            for future in done:
+                began = started.pop(future)
+                if future.exception() is None:
+                    with self._lock:
+                        self._latencies[name].append(self._clock() - began)
+                    if future is not primary:
+                        self.count(name, "hedge_wins")
+                    for other in started:
+                        abandon(other)
+                    return future.result()
+                error = future.exception()
+            now = self._clock()
+            if started and now >= deadline:
+                for future in started:
+                    abandon(future)
+                raise DeadlineExceeded(f"{name} did not answer within {self.deadline(name):g}s")
+            if not started:
+                raise error
+            if not hedged and now >= first_started + hedge:
+                hedged = True
+                self.count(name, "hedges")
+                self._charge()
+                started[self._submit(func)] = self._clock()
+
+    # Retry transient failures with full-jitter backoff until the deadline
+    def _run(self, name, func, abandon):
+        deadline = None
+        error = None
+        for attempt in range(self.retries + 1):
+            if not self.breaker.allow():
+                self.count(name, "short_circuited")
+                raise CircuitOpen(f"{name}: backend circuit is open") from error
+            self._charge()
+            # The deadline starts once the first attempt may go out, so
+            # waiting on a rate limiter doesn't eat into it
+            if deadline is None:
+                deadline = self._clock() + self.deadline(name)
+            self.count(name, "attempts")
+            try:
+                result = self._attempt(name, func, deadline, abandon)
+            except DeadlineExceeded:
+                self.breaker.failure()
+                self.count(name, "timeouts")
+                raise
+            except Exception as e:
+                if not is_transient(e):
+                    self.breaker.release()
+                    raise
+                self.breaker.failure()
+                self.count(name, "errors")
+                error = e
+            else:
+                self.breaker.success()
+                return result
+            pause = random.uniform(0, self.backoff * (2 ** attempt))
+            if attempt == self.retries or self._clock() + pause >= deadline:
+                break
+            time.sleep(pause)
+        raise Unavailable(f"{name} failed after {attempt + 1} attempt(s): {error}") from error
+
+    def call(self, name, func):
+        return self._run(name, func, lambda future: future.cancel())
+
+    # Chunks of make_stream(). Opening the stream and its first chunk get
+    # the deadline, retries and hedging; after that each chunk must arrive
+    # within idle_timeout. A transient failure after the first chunk raises
+    # Unavailable (the chunks already yielded can't be taken back).
+    def stream(self, name, make_stream):
+        def open_stream():
+            chunks = iter(make_stream())
+            return chunks, next(chunks, _END)
+
+        def abandon(future):
+            # Close the losing stream once its pending read returns
+            if not future.cancel():
+                future.add_done_callback(lambda f: f.exception() is None and f.result()[0].close())
+
+        chunks, chunk = self._run(name, open_stream, abandon)
+        try:
+            while chunk is not _END:
+                yield chunk
+                if self.idle_timeout is None:
+                    chunk = next(chunks, _END)
+                    continue
+                future = self._submit(next, chunks, _END)
+                done, _ = wait([future], timeout=self.idle_timeout)
+                if not done:
+                    future.add_done_callback(lambda f, closing=chunks: closing.close())
+                    chunks = None
+                    self.breaker.failure()
+                    self.count(name, "timeouts")
+                    raise DeadlineExceeded(f"{name} stopped streaming for {self.idle_timeout:g}s")
+                chunk = future.result()
+        except Unavailable:
+            raise
+        except Exception as e:
+            if not is_transient(e):
+                raise
+            self.breaker.failure()
+            self.count(name, "errors")
+            raise Unavailable(f"{name} failed mid-stream: {e}") from e
+        finally:
+            if chunks is not None:
+                chunks.close()
+
+    def stats(self):
+        with self._lock:
+            functions = {name: dict(counts) for name, counts in self._counts.items()}
+        return {"breaker": self.breaker.state, "breaker_opened": self.breaker.opened, "functions": functions}
+
+
+guard = Guard.from_env()
+
+_strict = contextvars.ContextVar("fitvisor_strict", default=False)
+_before_attempt = contextvars.ContextVar("fitvisor_before_attempt", default=None)
+
+# Within this block helpers raise Unavailable instead of degrading, for
+# callers that store or publish the answers (batch_generate.py)
+@contextlib.contextmanager
+def no_fallback():
+    token = _strict.set(True)
+    try:
+        yield
+    finally:
+        _strict.reset(token)
+
+
+# Within this block hook() runs before every request sent to the backend,
+# retries and hedges included, e.g. to charge a rate limiter per model call
+@contextlib.contextmanager
+def before_attempt(hook):
+    token = _before_attempt.set(hook)
+    try:
+        yield
+    finally:
+        _before_attempt.reset(token)
+
+
+def _fallback(name, alternatives, args, kwargs, error):
+    if _strict.get():
+        raise error
+    for alternative in alternatives:
+        value = alternative(*args, **kwargs)
+        if value is not None:
+            telemetry.mark_cache_hit("fallback")
+            guard.count(name, "fallbacks")
+            return value
+    raise error
+
+
+# Answer from `alternatives` (called with the helper's arguments, first
+# non-None wins) when the helper raises Unavailable; helpers wrapped in
+# cached()/cached_stream() try their expired cache entry first. For
+# generator helpers the fallback value is yielded as replay(value); if the
+# model failed after some chunks were already yielded, resume(chunks_so_far,
+# value) yields the rest (value may be None), or the error is raised when
+# resume is None.
+def degrade(*alternatives, replay=lambda value: [value], resume=None):
+    def decorator(func):
+        name = func.__name__
+        candidates = ([func.stale] if hasattr(func, "stale") else []) + list(alternatives)
+
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                sent = []
+                try:
+                    for chunk in func(*args, **kwargs):
+                        sent.append(chunk)
+                        yield chunk
+                    return
+                except Unavailable as e:
+                    error = e
+                if not sent:
+                    yield from replay(_fallback(name, candidates, args, kwargs, error))
+                    return
+                if resume is None or _strict.get():
+                    raise error
+                try:
+                    value = _fallback(name, candidates, args, kwargs, error)
+                except Unavailable:
+                    value = None
+                guard.count(name, "resumed")
+                yield from resume(sent, value)
+            return wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                return func(*args, **kwargs)
+            except Unavailable as e:
+                return _fallback(name, candidates, args, kwargs, e)
+        return wrapper
+
+    return decorator
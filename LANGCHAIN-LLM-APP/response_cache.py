@@ -0,0 +1,255 @@
+import copy
+import functools
+import hashlib
+import inspect
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+import telemetry
+from single_flight import flights
+
+_MISSING = object()
+
+
+# Normalize helper arguments so equivalent inputs share a cache entry
+def normalize_value(value):
+    if isinstance(value, str):
+        return " ".join(value.split()).casefold()
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, dict):
+        return {str(k): normalize_value(v) for k, v in sorted(value.items(), key=lambda kv: str(kv[0]))}
+    if isinstance(value, (list, tuple)):
+        return [normalize_value(v) for v in value]
+    return str(value)
+
+
+# `version` may be a callable so the key can follow runtime state such as
+# the active LLM backend
+def make_key(namespace, version, args):
+    if callable(version):
+        version = version()
+    payload = json.dumps([namespace, version, normalize_value(args)], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    # Process-wide LRU cache with a TTL and an optional on-disk tier.
+    # Memory hits are served without touching disk; disk hits are promoted
+    # back into memory so later reruns stay in-process.
+    def __init__(self, max_entries=256, ttl_seconds=24 * 60 * 60, disk_dir=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_dir = disk_dir
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_entries=int(os.getenv("FITVISOR_CACHE_SIZE", "256")),
+            ttl_seconds=float(os.getenv("FITVISOR_CACHE_TTL", str(24 * 60 * 60))),
+            disk_dir=os.getenv("FITVISOR_CACHE_DIR") or None,
+        )
+
+    def _expired(self, created):
+        return self.ttl_seconds is not None and time.time() - created > self.ttl_seconds
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _read_disk(self, key):
+        try:
+            with open(self._disk_path(key), "r", encoding="utf-8") as f:
+                record = json.load(f)
+            created, value = record["created"], record["value"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return _MISSING
+        return created, value
+
+    def _write_disk(self, key, created, value):
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"created": created, "value": value}, f)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError):
+            # The disk tier is best effort; the memory tier still holds the value
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def _store(self, key, created, value):
+        self._entries[key] = (created, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    # Expired entries are not served but stay until evicted (or
+    # overwritten), so get_stale() can still answer while the model is down
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not self._expired(entry[0]):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return copy.deepcopy(entry[1])
+
+        if self.disk_dir:
+            record = self._read_disk(key)
+            if record is not _MISSING and not self._expired(record[0]):
+                with self._lock:
+                    self._store(key, *record)
+                    self.hits += 1
+                return copy.deepcopy(record[1])
+
+        with self._lock:
+            self.misses += 1
+        return default
+
+    # Any stored value, however old; doesn't count as a hit or refresh LRU order
+    def get_stale(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None and self.disk_dir:
+            record = self._read_disk(key)
+            entry = None if record is _MISSING else record
+        return default if entry is None else copy.deepcopy(entry[1])
+
+    def set(self, key, value):
+        created = time.time()
+        with self._lock:
+            self._store(key, created, copy.deepcopy(value))
+        if self.disk_dir:
+            self._write_disk(key, created, value)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+        if self.disk_dir:
+            try:
+                os.remove(self._disk_path(key))
+            except OSError:
+                pass
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+        if self.disk_dir:
+            for name in os.listdir(self.disk_dir):
+                if name.endswith(".json"):
+                    try:
+                        os.remove(os.path.join(self.disk_dir, name))
+                    except OSError:
+                        pass
+
+    def __len__(self):
+        return len(self._entries)
+
+
+response_cache = ResponseCache.from_env()
+
+
+def _mark_coalesced():
+    telemetry.mark_cache_hit("coalesced")
+
+# The stored answer for a decorated helper's arguments even if expired, or
+# None; the helpers' fallback while the model is unavailable
+def _stale_lookup(cache, cache_key):
+    def stale(*args, **kwargs):
+        target = cache if cache is not None else response_cache
+        value = target.get_stale(cache_key(*args, **kwargs))
+        if value is not None:
+            telemetry.mark_cache_hit("stale")
+        return value
+    return stale
+
+
+# Memoize a helper on its normalized arguments and the prompt version.
+# Empty results are not cached so a bad generation is retried next time.
+# Concurrent misses for the same key share one call (see single_flight).
+def cached(namespace, version, cache=None):
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        def cache_key(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            return make_key(namespace, version, bound.arguments)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            target = cache if cache is not None else response_cache
+            key = cache_key(*args, **kwargs)
+            result = target.get(key, _MISSING)
+            if result is not _MISSING:
+                telemetry.mark_cache_hit("response")
+                return result
+
+            def compute():
+                result = func(*args, **kwargs)
+                if result:
+                    target.set(key, result)
+                return result
+
+            return flights.do(key, compute, on_follow=_mark_coalesced)
+
+        wrapper.cache_key = cache_key
+        wrapper.stale = _stale_lookup(cache, cache_key)
+        return wrapper
+
+    return decorator
+
+
+# Streaming counterpart of cached(): a miss passes chunks through and
+# caches collect(chunks) once the stream completes; a hit yields
+# replay(value). The defaults join text chunks and replay them as one.
+# Concurrent misses for the same key share one upstream stream.
+# Shares keys with cached() for the same namespace and signature, so
+# streamed and blocking calls warm each other.
+def cached_stream(namespace, version, cache=None, collect="".join, replay=lambda value: [value]):
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        def cache_key(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            return make_key(namespace, version, bound.arguments)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            target = cache if cache is not None else response_cache
+            key = cache_key(*args, **kwargs)
+            result = target.get(key, _MISSING)
+            if result is not _MISSING:
+                telemetry.mark_cache_hit("response")
+                yield from replay(result)
+                return
+            chunks = []
+            source = flights.stream("stream:" + key, lambda: func(*args, **kwargs), on_follow=_mark_coalesced)
+            for chunk in source:
+                chunks.append(chunk)
+                yield chunk
+            result = collect(chunks)
+            if result:
+                target.set(key, result)
+
+        wrapper.cache_key = cache_key
+        wrapper.stale = _stale_lookup(cache, cache_key)
+        return wrapper
+
+    return decorator
@@ -0,0 +1,199 @@
+import os
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+_STOP_WORDS = {
+    "a", "an", "the", "is", "are", "was", "in", "of", "for", "to", "on", "with", "and", "or",
+    "me", "my", "i", "you", "your", "can", "could", "would", "please", "what", "whats",
+    "how", "many", "much", "do", "does", "there", "some", "give", "tell", "about",
+}
+_UNIT_SPACING = re.compile(r"(\d+(?:\.\d+)?)\s+(g|kg|ml|l|oz|lb|cal|kcal)\b")
+_NON_WORD = re.compile(r"[^a-z0-9.\s]")
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+
+
+# Lowercase, strip punctuation and filler words, and glue units to numbers
+# ("100 g" -> "100g") so trivially different phrasings normalize alike.
+def normalize_query(query):
+    text = _NON_WORD.sub(" ", query.casefold())
+    text = _UNIT_SPACING.sub(r"\1\2", text)
+    words = [w.strip(".") for w in text.split()]
+    return " ".join(w for w in words if w and w not in _STOP_WORDS)
+
+
+def shingles(text, n=3):
+    padded = f" {text} "
+    if len(padded) <= n:
+        return {padded}
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+@dataclass
+class _Entry:
+    scope: tuple
+    shingles: set
+    numbers: tuple
+    answer: str
+    created: float
+    band_keys: list
+
+
+class SemanticCache:
+    # On-box near-duplicate cache for chat answers. Queries are turned into
+    # character shingles and a MinHash signature; LSH bands over the
+    # signature find candidates in O(bands), and the exact shingle Jaccard
+    # decides the hit. Entries are scoped by diet preference and a daily
+    # calorie bucket, and questions quoting different numbers never match
+    # ("100g paneer" vs "200g paneer").
+    def __init__(self, threshold=0.8, max_entries=1000, ttl_seconds=7 * 24 * 60 * 60,
+                 num_perm=64, bands=16, calorie_bucket=250, min_words=2, seed=1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.calorie_bucket = calorie_bucket
+        self.min_words = min_words
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._buckets = {}
+        self._next_id = 0
+        # Random affine permutations (a*x + b) mod p, fixed by the seed
+        state = seed
+        self._perms = []
+        for _ in range(num_perm):
+            state = (state * 6364136223846793005 + 1442695040888963407) % (1 << 64)
+            a = (state >> 3) % (_MERSENNE_PRIME - 1) + 1
+            state = (state * 6364136223846793005 + 1442695040888963407) % (1 << 64)
+            b = (state >> 3) % _MERSENNE_PRIME
+            self._perms.append((a, b))
+        self.hits = 0
+        self.misses = 0
+        self.skips = 0
+        self.stores = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            threshold=float(os.getenv("FITVISOR_CHAT_CACHE_THRESHOLD", "0.8")),
+            max_entries=int(os.getenv("FITVISOR_CHAT_CACHE_SIZE", "1000")),
+            calorie_bucket=int(os.getenv("FITVISOR_CHAT_CACHE_CALORIE_BUCKET", "250")),
+        )
+
+    def _scope(self, diet_pref, daily_calories):
+        return (str(diet_pref).casefold(), int(daily_calories) // self.calorie_bucket)
+
+    def _signature(self, shingle_set):
+        hashes = [zlib.crc32(s.encode("utf-8")) & _MAX_HASH for s in shingle_set]
+        return [min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in self._perms]
+
+    def _band_keys(self, scope, signature):
+        return [
+            (scope, band, tuple(signature[band * self.rows:(band + 1) * self.rows]))
+            for band in range(self.bands)
+        ]
+
+    # Returns (scope, shingles, numbers, band_keys), or None when the query
+    # is too short to be answered without the conversation around it
+    def _prepare(self, query, diet_pref, daily_calories):
+        normalized = normalize_query(query)
+        if len(normalized.split()) < self.min_words:
+            return None
+        scope = self._scope(diet_pref, daily_calories)
+        shingle_set = shingles(normalized)
+        numbers = tuple(sorted(_NUMBER.findall(normalized)))
+        return scope, shingle_set, numbers, self._band_keys(scope, self._signature(shingle_set))
+
+    def _remove(self, entry_id):
+        entry = self._entries.pop(entry_id)
+        for key in entry.band_keys:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self._buckets[key]
+
+    def lookup(self, query, diet_pref, daily_calories):
+        prepared = self._prepare(query, diet_pref, daily_calories)
+        with self._lock:
+            if prepared is None:
+                self.skips += 1
+                return None
+            scope, shingle_set, numbers, band_keys = prepared
+            candidates = set()
+            for key in band_keys:
+                candidates.update(self._buckets.get(key, ()))
+
+            now = time.time()
+            best_id, best_score = None, 0.0
+            for entry_id in candidates:
+                entry = self._entries[entry_id]
+                if now - entry.created > self.ttl_seconds:
+                    self._remove(entry_id)
+                    self.expirations += 1
+                    continue
+                if entry.numbers != numbers:
+                    continue
+                score = jaccard(shingle_set, entry.shingles)
+                if score > best_score:
+                    best_id, best_score = entry_id, score
+
+            if best_id is not None and best_score >= self.threshold:
+                self._entries.move_to_end(best_id)
+                self.hits += 1
+                return self._entries[best_id].answer
+            self.misses += 1
+            return None
+
+    def store(self, query, diet_pref, daily_calories, answer):
+        prepared = self._prepare(query, diet_pref, daily_calories)
+        if prepared is None or not answer:
+            return
+        scope, shingle_set, numbers, band_keys = prepared
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = _Entry(scope, shingle_set, numbers, answer, time.time(), band_keys)
+            for key in band_keys:
+                self._buckets.setdefault(key, set()).add(entry_id)
+            self.stores += 1
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "skips": self.skips,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
@@ -0,0 +1,227 @@
+import json
+import logging
+import os
+import random
+import re
+import secrets
+import sqlite3
+import threading
+import time
+import zlib
+
+# Durable copy of the session fields that are expensive to rebuild (plans,
+# chats, onboarding answers), so a refresh, reconnect or redeploy picks up
+# where the user left off. One row per (token, field): pages load only the
+# fields they render and each change rewrites only its own field.
+
+# The token is a bearer credential: anyone with the URL can open the
+# session and read its plans, chats and progress log (see "Saved sessions"
+# in the README). Idle sessions are pruned, which also retires old links.
+TOKEN_PARAM = "session"
+_TOKEN = re.compile(r"[A-Za-z0-9_-]{16,64}")
+
+# Share of new sessions that also prune expired ones (besides once at startup)
+PRUNE_CHANCE = 0.01
+
+_log = logging.getLogger("fitvisor.sessions")
+
+# Values at least this large are zlib-compressed (plans and chat histories)
+_COMPRESS_OVER = 512
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS session_fields (
+    token TEXT NOT NULL,
+    field TEXT NOT NULL,
+    value BLOB NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (token, field)
+) WITHOUT ROWID
+"""
+
+
+# Objects that know how to flatten themselves (e.g. ChatHistory) are stored
+# as their to_dict(); the page rebuilds them after restore
+def _to_json(value):
+    if hasattr(value, "to_dict"):
+        return value.to_dict()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+def encode(value):
+    data = json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=_to_json).encode("utf-8")
+    if len(data) >= _COMPRESS_OVER:
+        return b"z" + zlib.compress(data, 6)
+    return b"j" + data
+
+def decode(blob):
+    blob = bytes(blob)
+    data = zlib.decompress(blob[1:]) if blob[:1] == b"z" else blob[1:]
+    return json.loads(data.decode("utf-8"))
+
+
+class SessionStore:
+    # SQLite in WAL mode: readers never block the writer, and several
+    # Streamlit processes on one host can share the file. Each thread gets
+    # its own connection; busy_timeout rides out brief write locks held by
+    # other processes.
+    # max_age_seconds: prune_expired() drops sessions idle for longer;
+    # None keeps them forever
+    def __init__(self, path, busy_timeout_ms=5000, max_age_seconds=None):
+        self.path = path
+        self.busy_timeout_ms = busy_timeout_ms
+        self.max_age_seconds = max_age_seconds
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(_SCHEMA)
+
+    @classmethod
+    def from_env(cls):
+        path = os.getenv("FITVISOR_SESSION_DB", os.path.join("data", "sessions.db"))
+        days = float(os.getenv("FITVISOR_SESSION_MAX_AGE_DAYS", "30") or 0)
+        return cls(path, max_age_seconds=days * 24 * 60 * 60 or None) if path else None
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout_ms / 1000, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+            self._local.conn = conn
+        return conn
+
+    def load(self, token, field, default=None):
+        row = self._connect().execute(
+            "SELECT value FROM session_fields WHERE token = ? AND field = ?", (token, field)
+        ).fetchone()
+        return decode(row[0]) if row else default
+
+    def load_many(self, token, fields):
+        fields = list(fields)
+        placeholders = ",".join("?" * len(fields))
+        rows = self._connect().execute(
+            f"SELECT field, value FROM session_fields WHERE token = ? AND field IN ({placeholders})",
+            (token, *fields)
+        ).fetchall()
+        return {field: decode(value) for field, value in rows}
+
+    # Writes are best effort: if the database stays locked past
+    # busy_timeout the value is kept in the session only, and the failure is
+    # logged. Returns whether it was written.
+    def save(self, token, field, value):
+        try:
+            self._connect().execute(
+                "INSERT INTO session_fields (token, field, value, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(token, field) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at",
+                (token, field, encode(value), time.time())
+            )
+        except sqlite3.OperationalError as e:
+            _log.warning("Could not save session field %s: %s", field, e)
+            return False
+        return True
+
+    def delete(self, token, field=None):
+        try:
+            if field is None:
+                self._connect().execute("DELETE FROM session_fields WHERE token = ?", (token,))
+            else:
+                self._connect().execute("DELETE FROM session_fields WHERE token = ? AND field = ?", (token, field))
+        except sqlite3.OperationalError as e:
+            _log.warning("Could not delete session field %s: %s", field or "*", e)
+
+    # Drop sessions nobody has touched for max_age_seconds; returns rows removed
+    def prune(self, max_age_seconds):
+        cutoff = time.time() - max_age_seconds
+        cursor = self._connect().execute(
+            "DELETE FROM session_fields WHERE token IN "
+            "(SELECT token FROM session_fields GROUP BY token HAVING MAX(updated_at) < ?)",
+            (cutoff,)
+        )
+        return cursor.rowcount
+
+    # prune() with the configured max age; a locked database just skips
+    # this round
+    def prune_expired(self):
+        if not self.max_age_seconds:
+            return 0
+        try:
+            return self.prune(self.max_age_seconds)
+        except sqlite3.OperationalError as e:
+            _log.warning("Could not prune expired sessions: %s", e)
+            return 0
+
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                try:
+                    _store = SessionStore.from_env() or False
+                except (OSError, sqlite3.Error):
+                    _store = False  # e.g. read-only filesystem: run without persistence
+                if _store:
+                    _store.prune_expired()
+    return _store or None
+
+
+def new_token():
+    return secrets.token_urlsafe(18)
+
+def is_valid_token(token):
+    return bool(token) and _TOKEN.fullmatch(token) is not None
+
+
+class SessionBinding:
+    # Ties one Streamlit session's state to its rows in the store. With no
+    # store configured it only manages defaults, so the app runs unchanged.
+    def __init__(self, state, token, store):
+        self.state = state
+        self.token = token
+        self.store = store
+
+    # Fill `field` from the store the first time this session reads it;
+    # falls back to `default` when given and nothing was stored
+    def restore(self, field, *default):
+        if field in self.state:
+            return
+        value = self.store.load(self.token, field) if self.store else None
+        if value is not None:
+            self.state[field] = value
+        elif default:
+            self.state[field] = default[0]
+
+    # Write-through: persist the current value of each field
+    def save(self, *fields):
+        if not self.store:
+            return
+        for field in fields:
+            if field in self.state:
+                self.store.save(self.token, field, self.state[field])
+            else:
+                self.store.delete(self.token, field)
+
+    def clear(self):
+        if self.store:
+            self.store.delete(self.token)
+
+
+# The session's token lives in the URL (?session=...), which survives
+# refreshes, websocket reconnects and server restarts. It also means the
+# URL is the key to the session and must not be shared.
+def bind(state, query_params, store=None):
+    store = store if store is not None else get_store()
+    token = query_params.get(TOKEN_PARAM)
+    if not is_valid_token(token):
+        token = state.get("session_token")
+        if token is None:
+            token = new_token()
+            if store and random.random() < PRUNE_CHANCE:
+                store.prune_expired()
+        query_params[TOKEN_PARAM] = token
+    state["session_token"] = token
+    return SessionBinding(state, token, store)
@@ -0,0 +1,186 @@
+import copy
+import os
+import threading
+from resilience import Unavailable
+
+# Collapses concurrent identical requests into one upstream call. The first
+# caller for a key runs it; callers arriving while it is in flight wait for
+# and share its result (or, for streams, its chunks as they arrive).
+
+
+# An Unavailable, so helpers wrapped in resilience.degrade() fall back when
+# a follower gives up waiting, just as when their own call times out
+class FlightTimeout(Unavailable, TimeoutError):
+    pass
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.abandoned = False
+
+
+class _Stream:
+    def __init__(self, source):
+        self.source = source
+        self.chunks = []
+        self.finished = False
+        self.error = None
+        self.pulling = False
+        self.consumers = 0
+
+
+class SingleFlight:
+    def __init__(self, timeout=None):
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._streams = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.timeouts = 0
+
+    @classmethod
+    def from_env(cls):
+        timeout = os.getenv("FITVISOR_SINGLE_FLIGHT_TIMEOUT", "120")
+        return cls(timeout=float(timeout) if timeout else None)
+
+    # Run func() once per key among concurrent callers. Followers wait up to
+    # `timeout` seconds and then raise FlightTimeout, leaving the call
+    # running for everyone else. Followers get their own copy of the result.
+    # If the leader is interrupted (e.g. a Streamlit rerun stops its thread)
+    # a waiting follower takes over.
+    def do(self, key, func, timeout=None, on_follow=None):
+        timeout = self.timeout if timeout is None else timeout
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = _Call()
+                    self.leaders += 1
+                else:
+                    self.coalesced += 1
+
+            if leader:
+                try:
+                    call.result = func()
+                    return call.result
+                except Exception as e:
+                    call.error = e
+                    raise
+                except BaseException:
+                    call.abandoned = True
+                    raise
+                finally:
+                    with self._lock:
+                        if self._calls.get(key) is call:
+                            del self._calls[key]
+                    call.done.set()
+
+            if on_follow:
+                on_follow()
+            if not call.done.wait(timeout):
+                with self._lock:
+                    self.timeouts += 1
+                raise FlightTimeout(f"Timed out after {timeout}s waiting for an in-flight request")
+            if call.abandoned:
+                continue
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+    # Streaming counterpart: every concurrent consumer sees the full chunk
+    # sequence, but the source generator runs once. Whichever consumer needs
+    # the next chunk first pulls it from the source, so nobody depends on a
+    # particular consumer staying connected; the source is closed when the
+    # last consumer leaves early. `timeout` bounds the wait for each chunk.
+    def stream(self, key, make_source, timeout=None, on_follow=None):
+        timeout = self.timeout if timeout is None else timeout
+        with self._lock:
+            flight = self._streams.get(key)
+            following = flight is not None
+            if following:
+                self.coalesced += 1
+            else:
+                flight = self._streams[key] = _Stream(make_source())
+                flight.cond = threading.Condition(self._lock)
+                self.leaders += 1
+            flight.consumers += 1
+        if following and on_follow:
+            on_follow()
+
+        index = 0
+        try:
+            while True:
+                with self._lock:
+                    while index >= len(flight.chunks) and not flight.finished and flight.pulling:
+                        if not flight.cond.wait(timeout):
+                            self.timeouts += 1
+                            raise FlightTimeout(f"Timed out after {timeout}s waiting for an in-flight stream")
+                    if index < len(flight.chunks):
+                        chunk = flight.chunks[index]
+                    elif flight.finished:
+                        if flight.error is not None:
+                            raise flight.error
+                        return
+                    else:
+                        flight.pulling = True
+                        chunk = _PULL
+                if chunk is _PULL:
+                    self._pull(key, flight)
+                    continue
+                index += 1
+                yield chunk
+        finally:
+            with self._lock:
+                flight.consumers -= 1
+                abandon = flight.consumers == 0 and not flight.finished
+                if abandon:
+                    flight.finished = True
+                    if self._streams.get(key) is flight:
+                        del self._streams[key]
+            if abandon:
+                flight.source.close()
+
+    def _pull(self, key, flight):
+        try:
+            chunk = next(flight.source)
+            finished, error = False, None
+        except StopIteration:
+            chunk, finished, error = _PULL, True, None
+        except Exception as e:
+            chunk, finished, error = _PULL, True, e
+        except BaseException:
+            # This consumer was interrupted mid-pull; let another one retry
+            with self._lock:
+                flight.pulling = False
+                flight.cond.notify_all()
+            raise
+        with self._lock:
+            if chunk is not _PULL:
+                flight.chunks.append(chunk)
+            if finished:
+                flight.finished = True
+                flight.error = error
+                # Later identical requests start fresh (or hit the cache)
+                if self._streams.get(key) is flight:
+                    del self._streams[key]
+            flight.pulling = False
+            flight.cond.notify_all()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "leaders": self.leaders,
+                "coalesced": self.coalesced,
+                "timeouts": self.timeouts,
+                "in_flight": len(self._calls) + len(self._streams),
+            }
+
+
+_PULL = object()
+
+flights = SingleFlight.from_env()
@@ -0,0 +1,381 @@
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import logging.handlers
+import math
+import os
+import threading
+import time
+from collections import defaultdict, deque
+
+# Per-call tracing for the Langchain_helper entry points: wall time,
+# time-to-first-token, estimated tokens and cost, which cache (if any)
+# answered, and the main.py page that asked. Aggregates live in-process
+# (see `metrics`); each call is also appended to a rotating JSONL log.
+
+# USD per million tokens; defaults are gemini-1.5-flash list prices
+PRICE_INPUT_PER_M = float(os.getenv("FITVISOR_PRICE_INPUT_PER_M", "0.075"))
+PRICE_OUTPUT_PER_M = float(os.getenv("FITVISOR_PRICE_OUTPUT_PER_M", "0.30"))
+
+LOG_PATH = os.getenv("FITVISOR_TRACE_LOG", os.path.join("logs", "llm_calls.jsonl"))
+LOG_MAX_BYTES = int(os.getenv("FITVISOR_TRACE_LOG_BYTES", str(5 * 1024 * 1024)))
+LOG_BACKUPS = int(os.getenv("FITVISOR_TRACE_LOG_BACKUPS", "3"))
+
+_page = contextvars.ContextVar("fitvisor_page", default="unknown")
+_span = contextvars.ContextVar("fitvisor_span", default=None)
+
+
+# ---------------- CONTEXT ----------------
+
+# Label calls made from here on (in this thread/context) with a page name
+def set_page(page):
+    _page.set(page)
+
+def current_page():
+    return _page.get()
+
+# Run func with a page label; for worker threads, which don't inherit the
+# caller's context
+def run_on_page(page, func, *args, **kwargs):
+    token = _page.set(page)
+    try:
+        return func(*args, **kwargs)
+    finally:
+        _page.reset(token)
+
+
+class Span:
+    def __init__(self, function, page):
+        self.function = function
+        self.page = page
+        self.started = time.perf_counter()
+        self.duration = None
+        self.ttft = None
+        self.llm_calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cache = None
+        self.error = None
+
+    @property
+    def cost(self):
+        return (self.prompt_tokens * PRICE_INPUT_PER_M + self.completion_tokens * PRICE_OUTPUT_PER_M) / 1e6
+
+    def to_dict(self):
+        return {
+            "ts": round(time.time(), 3),
+            "function": self.function,
+            "page": self.page,
+            "seconds": round(self.duration, 4),
+            "ttft_seconds": round(self.ttft, 4) if self.ttft is not None else None,
+            "llm_calls": self.llm_calls,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cost_usd": round(self.cost, 8),
+            "cache": self.cache,
+            "error": self.error,
+        }
+
+
+# Called from the caches: the current call was answered without the LLM.
+# `kind` names the cache ("response", "semantic", "food_db", "library"),
+# "rules" when workout_engine.py built the answer, "coalesced" when the
+# call shared another session's in-flight request, or
+# "stale"/"fallback" when the model was unavailable and the answer came
+# from an expired cache entry or a local template (see resilience.py).
+def mark_cache_hit(kind):
+    span = _span.get()
+    if span is not None and span.cache is None:
+        span.cache = kind
+
+# Called once per model round trip with its token counts
+def record_llm_call(prompt_tokens, completion_tokens):
+    span = _span.get()
+    if span is not None:
+        span.llm_calls += 1
+        span.prompt_tokens += prompt_tokens
+        span.completion_tokens += completion_tokens
+
+
+# ---------------- AGGREGATES ----------------
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    # Nearest-rank
+    index = min(len(sorted_values) - 1, max(0, math.ceil(q * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class Metrics:
+    # Cumulative counters for export plus a sliding window of recent
+    # durations per function for percentiles
+    def __init__(self, window=1000):
+        self.window = window
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._durations = defaultdict(lambda: deque(maxlen=self.window))
+            self._ttfts = defaultdict(lambda: deque(maxlen=self.window))
+            self._calls = defaultdict(int)       # (function, page, cache) -> count
+            self._errors = defaultdict(int)      # function -> count
+            self._seconds = defaultdict(float)   # function -> total seconds
+            self._ttft_seconds = defaultdict(float)
+            self._ttft_count = defaultdict(int)
+            self._llm_calls = defaultdict(int)
+            self._prompt_tokens = defaultdict(int)
+            self._completion_tokens = defaultdict(int)
+            self._cost = defaultdict(float)
+            self._renders = defaultdict(lambda: deque(maxlen=self.window))  # scope -> seconds
+            self._render_seconds = defaultdict(float)
+            self._render_count = defaultdict(int)
+
+    def observe(self, span):
+        f = span.function
+        with self._lock:
+            self._durations[f].append(span.duration)
+            self._seconds[f] += span.duration
+            if span.ttft is not None:
+                self._ttfts[f].append(span.ttft)
+                self._ttft_seconds[f] += span.ttft
+                self._ttft_count[f] += 1
+            self._calls[(f, span.page, "hit" if span.cache else "miss")] += 1
+            if span.error:
+                self._errors[f] += 1
+            self._llm_calls[f] += span.llm_calls
+            self._prompt_tokens[f] += span.prompt_tokens
+            self._completion_tokens[f] += span.completion_tokens
+            self._cost[f] += span.cost
+
+    # One Streamlit script run: "app" for a full rerun, or a fragment's name
+    def observe_render(self, scope, seconds):
+        with self._lock:
+            self._renders[scope].append(seconds)
+            self._render_seconds[scope] += seconds
+            self._render_count[scope] += 1
+
+    def render_summary(self):
+        with self._lock:
+            rows = {}
+            for scope, window in self._renders.items():
+                ordered = sorted(window)
+                rows[scope] = {
+                    "runs": self._render_count[scope],
+                    "p50": _percentile(ordered, 0.50),
+                    "p95": _percentile(ordered, 0.95),
+                }
+        return rows
+
+    # {function: {...}} for the current process, slowest p95 first
+    def summary(self):
+        with self._lock:
+            rows = {}
+            for f, durations in self._durations.items():
+                ordered = sorted(durations)
+                ttfts = sorted(self._ttfts.get(f, ()))
+                calls = sum(n for (fn, _, _), n in self._calls.items() if fn == f)
+                hits = sum(n for (fn, _, cache), n in self._calls.items() if fn == f and cache == "hit")
+                rows[f] = {
+                    "calls": calls,
+                    "p50": _percentile(ordered, 0.50),
+                    "p95": _percentile(ordered, 0.95),
+                    "ttft_p50": _percentile(ttfts, 0.50),
+                    "ttft_p95": _percentile(ttfts, 0.95),
+                    "cache_hit_rate": hits / calls if calls else 0.0,
+                    "llm_calls": self._llm_calls[f],
+                    "prompt_tokens": self._prompt_tokens[f],
+                    "completion_tokens": self._completion_tokens[f],
+                    "cost_usd": self._cost[f],
+                    "errors": self._errors[f],
+                }
+        return dict(sorted(rows.items(), key=lambda item: -(item[1]["p95"] or 0)))
+
+    # Prometheus text exposition format (0.0.4)
+    def prometheus_text(self):
+        lines = []
+
+        def emit(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for suffix, labels, value in samples:
+                label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+                lines.append(f"{name}{suffix}{{{label_text}}} {value}")
+
+        def summary(windows, totals, counts, label="function"):
+            samples = []
+            for f, window in windows.items():
+                ordered = sorted(window)
+                if not ordered:
+                    continue
+                for q in (0.5, 0.95, 0.99):
+                    samples.append(("", ((label, f), ("quantile", q)), _percentile(ordered, q)))
+                samples.append(("_sum", ((label, f),), totals[f]))
+                samples.append(("_count", ((label, f),), counts[f]))
+            return samples
+
+        def per_function(values):
+            return [("", (("function", f),), v) for f, v in values.items()]
+
+        with self._lock:
+            call_counts = defaultdict(int)
+            for (f, _, _), n in self._calls.items():
+                call_counts[f] += n
+            emit("fitvisor_call_seconds", "summary", "Wall time of Langchain_helper calls",
+                 summary(self._durations, self._seconds, call_counts))
+            emit("fitvisor_ttft_seconds", "summary", "Time to first streamed chunk",
+                 summary(self._ttfts, self._ttft_seconds, self._ttft_count))
+            emit("fitvisor_calls_total", "counter", "Helper calls by page and cache outcome",
+                 [("", (("function", f), ("page", p), ("cache", c)), n) for (f, p, c), n in self._calls.items()])
+            emit("fitvisor_errors_total", "counter", "Helper calls that raised", per_function(self._errors))
+            emit("fitvisor_llm_calls_total", "counter", "Model round trips", per_function(self._llm_calls))
+            emit("fitvisor_prompt_tokens_total", "counter", "Estimated prompt tokens sent",
+                 per_function(self._prompt_tokens))
+            emit("fitvisor_completion_tokens_total", "counter", "Estimated completion tokens received",
+                 per_function(self._completion_tokens))
+            emit("fitvisor_cost_usd_total", "counter", "Estimated model spend in USD",
+                 [("", labels, round(v, 8)) for _, labels, v in per_function(self._cost)])
+            emit("fitvisor_render_seconds", "summary", "Streamlit script runs, full app or one fragment",
+                 summary(self._renders, self._render_seconds, self._render_count, label="scope"))
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+metrics = Metrics()
+
+
+# ---------------- LOG ----------------
+_logger = None
+_logger_lock = threading.Lock()
+
+def _get_logger():
+    global _logger
+    if _logger is None:
+        with _logger_lock:
+            if _logger is None:
+                logger = logging.getLogger("fitvisor.calls")
+                logger.propagate = False
+                logger.setLevel(logging.INFO)
+                if LOG_PATH:
+                    try:
+                        os.makedirs(os.path.dirname(LOG_PATH) or ".", exist_ok=True)
+                        handler = logging.handlers.RotatingFileHandler(
+                            LOG_PATH, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS, encoding="utf-8"
+                        )
+                        handler.setFormatter(logging.Formatter("%(message)s"))
+                        logger.addHandler(handler)
+                    except OSError:
+                        pass  # read-only deploys still get in-process metrics
+                _logger = logger
+    return _logger
+
+def _finish(span):
+    span.duration = time.perf_counter() - span.started
+    metrics.observe(span)
+    logger = _get_logger()
+    if logger.handlers:
+        logger.info(json.dumps(span.to_dict()))
+
+
+# ---------------- DECORATORS ----------------
+
+# Trace every chunk pulled from `iterable` as one call. The span is active
+# only while the producer runs, so caches and the backend below can report
+# into it.
+def trace_iter(function, iterable):
+    span = None
+    try:
+        iterator = iter(iterable)
+        while True:
+            if span is None:
+                span = Span(function, _page.get())
+            token = _span.set(span)
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                _span.reset(token)
+            if span.ttft is None:
+                span.ttft = time.perf_counter() - span.started
+            yield chunk
+    except GeneratorExit:
+        if span is not None:
+            span.error = "cancelled"
+        raise
+    except BaseException as e:
+        if span is not None:
+            span.error = type(e).__name__
+        raise
+    finally:
+        if span is not None:
+            _finish(span)
+
+
+def traced(function):
+    def decorator(func):
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                yield from trace_iter(function, func(*args, **kwargs))
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                span = Span(function, _page.get())
+                token = _span.set(span)
+                try:
+                    return func(*args, **kwargs)
+                except BaseException as e:
+                    span.error = type(e).__name__
+                    raise
+                finally:
+                    _span.reset(token)
+                    _finish(span)
+        return wrapper
+    return decorator
+
+
+# Time a Streamlit fragment's runs under `scope` (full-page runs are timed
+# in main.py). Runs cut short by st.rerun/st.stop are not counted.
+def timed_render(scope):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            result = func(*args, **kwargs)
+            metrics.observe_render(scope, time.perf_counter() - started)
+            return result
+        return wrapper
+    return decorator
+
+
+# ---------------- EXPORT ----------------
+
+# Serve /metrics for Prometheus on a daemon thread
+def serve_metrics(port, host="0.0.0.0"):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="fitvisor-metrics", daemon=True).start()
+    return server
@@ -0,0 +1,51 @@
+import asyncio
+import json
+import threading
+import pytest
+import api
+import resilience
+
+
+@pytest.fixture
+def endpoint(monkeypatch):
+    endpoint = api.Endpoint("chat", 1)
+    monkeypatch.setitem(api.ENDPOINTS, "chat", endpoint)
+    monkeypatch.setattr(api, "TIMEOUT", 0.05)
+    monkeypatch.setattr(api, "QUEUE_TIMEOUT", 0.05)
+    return endpoint
+
+
+def test_timed_out_call_keeps_its_slot_until_the_helper_finishes(endpoint):
+    release = threading.Event()
+
+    async def scenario():
+        with pytest.raises(api.ApiError) as timed_out:
+            await api.call("chat", lambda: release.wait(5))
+        assert timed_out.value.status == 504
+        assert endpoint.in_flight == 1
+        with pytest.raises(api.ApiError) as rejected:
+            await api.call("chat", lambda: {"reply": "hi"})
+        assert rejected.value.status == 503
+
+        release.set()
+        while endpoint.in_flight:
+            await asyncio.sleep(0.01)
+        response = await api.call("chat", lambda: {"reply": "hi"})
+        assert json.loads(response.body) == {"reply": "hi"}
+
+    asyncio.run(scenario())
+    assert endpoint.in_flight == 0
+
+
+def test_unavailable_model_is_a_503_with_a_json_body(endpoint):
+    def helper():
+        raise resilience.Unavailable("chat_with_nutritionist: backend circuit is open")
+
+    @api.handler
+    async def route(request):
+        return await api.call("chat", helper)
+
+    response = asyncio.run(route(None))
+    assert response.status_code == 503
+    assert json.loads(response.body) == {"error": "chat_with_nutritionist: backend circuit is open"}
+    assert endpoint.in_flight == 0
@@ -0,0 +1,27 @@
+import io
+import json
+import batch_generate
+import resilience
+
+
+def test_throughput_counts_generated_profiles_only(tmp_path, monkeypatch):
+    def generate(profile, daily_calories):
+        if int(profile["id"]) % 2:
+            raise resilience.CircuitOpen("backend circuit is open")
+        return {"plan": "plan", "workouts": {}, "nutrition_plan": "meals"}
+
+    monkeypatch.setattr(batch_generate, "_generate", generate)
+    profiles = [dict(id=str(i), age=30, gender="Male", weight=70, height=170, country="India",
+                     fitness_goal="Build Muscle", workout_days=3, workout_level="Beginner",
+                     workout_type="Gym", diet_pref="Vegan") for i in range(6)]
+    output = tmp_path / "results.jsonl"
+    summary = batch_generate.run(profiles, str(output), concurrency=2, log=io.StringIO())
+
+    assert (summary["ok"], summary["failed"]) == (3, 3)
+    assert summary["profiles_per_minute"] == summary["failures_per_minute"]  # 3 of each
+    records = [json.loads(line) for line in output.read_text().splitlines()]
+    assert sorted(r["status"] for r in records) == ["error"] * 3 + ["ok"] * 3
+
+    rerun = batch_generate.run(profiles, str(output), concurrency=2, log=io.StringIO())
+    assert (rerun["ok"], rerun["failed"], rerun["skipped"]) == (0, 3, 3)
+    assert rerun["profiles_per_minute"] == 0
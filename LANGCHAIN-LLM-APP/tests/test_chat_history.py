@@ -0,0 +1,54 @@
+import chat_history
+from chat_history import ChatHistory
+
+
+def conversation(exchanges, **kwargs):
+    history = ChatHistory(**kwargs)
+    for i in range(exchanges):
+        history.append({"role": "user", "content": f"Question {i}?"})
+        history.append({"role": "assistant", "content": f"**Answer {i}.** More detail follows."})
+    return history
+
+
+def test_ring_buffer_keeps_the_newest_messages():
+    history = conversation(10, max_messages=8)
+    assert len(history) == 8
+    assert history.total == 20 and history.dropped == 12
+    assert history[0]["content"] == "Question 6?"
+    assert history[-1]["content"] == "**Answer 9.** More detail follows."
+
+
+def test_messages_leaving_the_prompt_window_fold_into_the_summary():
+    history = conversation(5)
+    assert history.summarized == 10 - chat_history.RECENT_MESSAGES
+    assert history.summary == [
+        "User asked: Question 0? → Answer 0.",
+        "User asked: Question 1? → Answer 1.",
+    ]
+    context = history.context()
+    assert context.startswith("Summary of earlier conversation:\n- User asked: Question 0?")
+    assert "user: Question 2?" in context and "Question 4?" in context
+    assert "More detail follows" in context  # recent messages stay verbatim
+
+
+def test_summary_is_bounded():
+    history = conversation(200, summary_chars=200)
+    assert sum(len(line) for line in history.summary) <= 200
+    assert history.summary[-1] == "User asked: Question 196? → Answer 196."
+
+
+def test_round_trips_through_to_dict_and_reads_plain_lists():
+    history = conversation(7, max_messages=8)
+    restored = ChatHistory.from_value(history.to_dict())
+    assert list(restored) == list(history)
+    assert restored.context() == history.context()
+
+    legacy = ChatHistory.from_value([{"role": "user", "content": "hi"}])
+    assert legacy.total == 1 and legacy.context() == "user: hi\n"
+
+
+def test_pages_run_newest_first():
+    history = conversation(5)
+    assert history.page_count(4) == 3
+    assert [m["content"] for m in history.page(0, 4)][-1] == "**Answer 4.** More detail follows."
+    assert [m["content"] for m in history.page(2, 4)] == ["Question 0?", "**Answer 0.** More detail follows."]
@@ -0,0 +1,57 @@
+import Langchain_helper
+from llm_backend import FakeBackend, estimate_tokens
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def call(backend, name="chat_with_nutritionist"):
+    prompt = Langchain_helper.PROMPTS[name]
+    variables = {variable: "1" for variable in prompt.input_variables}
+    return backend.invoke(name, prompt, variables)
+
+
+def test_handle_is_reused_until_shortly_before_it_expires():
+    clock = Clock()
+    backend = FakeBackend(context_cache_ttl=600, clock=clock)
+    prefix = Langchain_helper.PROMPTS["chat_with_nutritionist"].prefix
+
+    for _ in range(3):
+        call(backend)
+    assert backend._created_contents == 1
+    assert backend.context_cache.stats()["hits"] == 2
+    assert backend.cached_tokens["chat_with_nutritionist"] == 3 * estimate_tokens(prefix)
+
+    clock.now = 600 - backend.context_cache.refresh_margin
+    call(backend)
+    stats = backend.context_cache.stats()
+    assert backend._created_contents == 2
+    assert (stats["misses"], stats["hits"], stats["refreshes"]) == (1, 2, 1)
+
+
+def test_handle_evicted_early_is_recreated_and_the_call_still_cached():
+    backend = FakeBackend(context_cache_ttl=600, clock=Clock())
+    call(backend)
+    backend.expire_cached_contents()
+
+    assert call(backend)
+    stats = backend.context_cache.stats()
+    assert backend._created_contents == 2
+    assert stats["invalidations"] == 1
+    assert backend.calls["chat_with_nutritionist"] == 2
+    assert backend.cached_tokens["chat_with_nutritionist"] > 0
+
+
+def test_each_prompt_prefix_gets_its_own_handle():
+    backend = FakeBackend(context_cache_ttl=600, clock=Clock())
+    call(backend, "chat_with_nutritionist")
+    call(backend, "generate_fitness_plan")
+    call(backend, "chat_with_nutritionist")
+
+    assert backend.context_cache.stats()["entries"] == 2
+    assert backend._created_contents == 2
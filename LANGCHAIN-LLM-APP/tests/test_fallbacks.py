@@ -0,0 +1,32 @@
+import pytest
+import fallbacks
+import Langchain_helper as lch
+import llm_backend
+import resilience
+
+
+@pytest.fixture
+def unavailable_model(monkeypatch):
+    monkeypatch.setattr(llm_backend, "_backend", llm_backend.FakeBackend(failure_rate=1.0))
+    monkeypatch.setattr(resilience.guard, "retries", 0)
+    yield
+    resilience.guard.breaker.success()
+
+
+PLAN = "## Sample Daily Meal Plan\n### 🌅 Breakfast (400 calories)\n- Oats\n"
+
+
+def test_modification_falls_back_when_called_with_keywords(unavailable_model):
+    modification = lch.modify_nutrition_plan(
+        user_message="swap my breakfast", current_plan=PLAN, diet_pref="Vegetarian",
+        daily_calories=2000, fitness_goal="Weight Loss", chat_history="", country="India",
+    )
+    assert modification.reply == fallbacks.modification_reply("swap my breakfast")
+    assert not modification.patches
+
+
+def test_plan_update_raises_instead_of_returning_the_plan_unchanged(unavailable_model):
+    user_data = {"age": 30, "gender": "Female", "weight": 60, "height": 165,
+                 "fitness_goal": "Weight Loss", "diet_pref": "Vegetarian"}
+    with pytest.raises(resilience.Unavailable):
+        lch.generate_updated_nutrition_plan("swap my breakfast", PLAN, user_data, 2000)
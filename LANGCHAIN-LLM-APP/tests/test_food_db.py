@@ -0,0 +1,38 @@
+import pytest
+import food_db
+
+
+def answered_food(question):
+    answer = food_db.answer_quantity_question(question)
+    return answer and answer.split("**")[1]
+
+
+@pytest.mark.parametrize("question", [
+    "calories in butter chicken",
+    "calories in apple pie",
+    "calories in rice pudding",
+    "calories in chicken biryani",
+    "calories in 100g chicken nuggets",
+    "calories in paneer tikka masala",
+])
+def test_dishes_named_after_an_ingredient_go_to_the_llm(question):
+    assert food_db.answer_quantity_question(question) is None
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("calories in 100g paneer", "100g paneer"),
+    ("calories in 100g panner", "100g paneer"),
+    ("calories in bananas", "100g banana"),
+    ("calories in chiken breast", "100g chicken breast (cooked)"),
+    ("calories in chicken bre", "100g chicken breast (cooked)"),
+    ("protein in 2 eggs", "2 pieces of egg (whole) (~100g)"),
+    ("macros of 1 roti", "1 piece of roti (~40g)"),
+])
+def test_names_aliases_typos_and_prefixes_are_answered(question, expected):
+    assert answered_food(question) == expected
+
+
+def test_lookup_rejects_partial_fuzzy_matches():
+    index = food_db.get_index()
+    assert index.lookup("butter chicken") is None
+    assert index.lookup("butter").name == "butter"
@@ -0,0 +1,49 @@
+import pytest
+import Langchain_helper
+import llm_backend
+from llm_backend import FakeBackend, FakeBackendError
+
+NAME = "chat_with_nutritionist"
+PROMPT = Langchain_helper.PROMPTS[NAME]
+VARIABLES = {variable: "1" for variable in PROMPT.input_variables}
+
+
+def outcomes(backend, calls=50):
+    results = []
+    for _ in range(calls):
+        try:
+            results.append(backend.invoke(NAME, PROMPT, VARIABLES))
+        except FakeBackendError:
+            results.append(None)
+    return results
+
+
+def test_same_seed_gives_the_same_answers_and_failures():
+    first = outcomes(FakeBackend(failure_rate=0.3, seed=7))
+    assert first == outcomes(FakeBackend(failure_rate=0.3, seed=7))
+    assert 0 < first.count(None) < len(first)
+
+
+def test_streaming_paces_the_same_text():
+    backend = FakeBackend(tokens_per_second=1e6)
+    chunks = list(backend.stream(NAME, PROMPT, VARIABLES))
+    assert len(chunks) > 1
+    assert "".join(chunks) == FakeBackend().invoke(NAME, PROMPT, VARIABLES)
+
+
+def test_counts_calls_and_tokens():
+    backend = FakeBackend()
+    backend.invoke(NAME, PROMPT, VARIABLES)
+    backend.invoke(NAME, PROMPT, VARIABLES)
+    assert backend.calls[NAME] == 2
+    assert backend.prompt_tokens[NAME] == 2 * llm_backend.estimate_tokens(PROMPT.format(**VARIABLES))
+
+
+def test_backend_is_chosen_from_the_environment(monkeypatch):
+    monkeypatch.setenv("FITVISOR_FAKE_FAILURE_RATE", "1")
+    backend = llm_backend.create_backend("fake")
+    assert isinstance(backend, FakeBackend)
+    with pytest.raises(FakeBackendError):
+        backend.invoke(NAME, PROMPT, VARIABLES)
+    with pytest.raises(ValueError):
+        llm_backend.create_backend("other")
@@ -0,0 +1,84 @@
+import pytest
+from meal_plan import MealPlan, ModificationStreamParser, apply_patches, detect_target_section
+
+PLAN = """## Macronutrient Breakdown
+- **Protein:** 120g
+
+## Sample Daily Meal Plan (India Cuisine)
+### 🌅 Breakfast (500 calories)
+- Oats with fruit
+
+### 🍽️ Lunch (700 calories)
+- Rice bowl with lentils
+
+### 🌙 Dinner (600 calories)
+- Vegetable curry with roti
+
+## 💧 Hydration & Supplements
+- Water intake: 2.5L per day
+"""
+
+
+def test_parse_round_trips_the_plan_exactly():
+    assert MealPlan.parse(PLAN).to_markdown() == PLAN
+
+
+@pytest.mark.parametrize("message, section", [
+    ("swap my breakfast for something savoury", "breakfast"),
+    ("something lighter for supper", "dinner"),
+    ("more water please", "hydration"),
+    ("change breakfast and lunch", None),
+    ("make it cheaper", None),
+])
+def test_detect_target_section(message, section):
+    assert detect_target_section(message) == section
+
+
+def test_replacing_a_section_leaves_the_rest_untouched():
+    plan = MealPlan.parse(PLAN)
+    plan.replace("lunch", "- Paneer wrap")
+    expected = PLAN.replace("- Rice bowl with lentils", "- Paneer wrap")
+    assert plan.to_markdown() == expected
+    assert plan.heading("lunch") == "### 🍽️ Lunch (700 calories)"
+
+
+def test_replacement_with_a_heading_replaces_the_heading_too():
+    plan = MealPlan.parse(PLAN)
+    plan.replace("dinner", "### 🌙 Dinner (550 calories)\n- Dal and salad\n")
+    assert "### 🌙 Dinner (550 calories)\n- Dal and salad\n\n## 💧" in plan.to_markdown()
+
+
+def test_excerpt_sends_totals_and_the_targeted_meal_only():
+    excerpt = MealPlan.parse(PLAN).excerpt("breakfast")
+    assert "Oats with fruit" in excerpt and "Protein" in excerpt
+    assert "Lunch (700 calories)" in excerpt  # from the calorie split
+    assert "Rice bowl" not in excerpt and "Water intake" not in excerpt
+
+
+def test_patches_for_missing_sections_are_skipped():
+    assert apply_patches(PLAN, [("snacks", "- Nuts")]) is None
+    updated = apply_patches(PLAN, [("snacks", "- Nuts"), ("breakfast", "- Poha")])
+    assert updated == PLAN.replace("- Oats with fruit", "- Poha")
+
+
+REPLY = ("Try poha instead <<< it keeps the calories.\n\n"
+         "<<<UPDATE breakfast>>>\n### 🌅 Breakfast (500 calories)\n- Poha with peanuts\n<<<END>>>")
+
+
+def stream(text, size):
+    parser = ModificationStreamParser()
+    shown = "".join(parser.feed(text[i:i + size]) for i in range(0, len(text), size))
+    return parser, shown + parser.close()
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 100, len(REPLY)])
+def test_stream_parser_hides_patches_however_the_stream_is_split(size):
+    parser, shown = stream(REPLY, size)
+    assert shown.rstrip() == parser.reply == "Try poha instead <<< it keeps the calories."
+    assert parser.patches == [("breakfast", "### 🌅 Breakfast (500 calories)\n- Poha with peanuts")]
+
+
+def test_stream_parser_shows_a_trailing_partial_marker_without_patches():
+    parser, shown = stream("Sure, see below <<<UPD", 4)
+    assert shown == "Sure, see below <<<UPD"
+    assert parser.patches == []
@@ -0,0 +1,31 @@
+import itertools
+import pytest
+import metabolic
+
+GOALS = ["Weight Loss", "Weight Gain", "Build Muscle", "Maintain Weight", "Improve Fitness"]
+
+# Weights of 50, 70 and 90 kg put water_intake on an exact .x5 tie, where
+# np.round and round() disagree without _round's correction
+PROFILES = [
+    {"weight": weight, "height": height, "age": age, "gender": gender, "fitness_goal": goal}
+    for weight, height, age, gender, goal in itertools.product(
+        [45, 50, 62.5, 70, 83.3, 90, 120], [150, 165, 172.5, 190], [18, 35, 64],
+        ["Male", "Female"], GOALS,
+    )
+]
+
+
+def test_batch_targets_match_the_scalar_path_exactly():
+    pytest.importorskip("numpy")
+    batch = metabolic.targets_for_profiles(PROFILES)
+    for i, profile in enumerate(PROFILES):
+        scalar = metabolic.profile_targets(
+            profile["weight"], profile["height"], profile["age"], profile["gender"], profile["fitness_goal"]
+        )
+        assert {key: batch[key][i].item() for key in scalar} == scalar, profile
+
+
+def test_round_breaks_exact_ties_like_round():
+    pytest.importorskip("numpy")
+    values = [1.75, 2.45, 0.15, 3.25, 1.749]
+    assert metabolic._round(values, 1).tolist() == [round(v, 1) for v in values]
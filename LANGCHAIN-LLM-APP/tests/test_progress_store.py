@@ -0,0 +1,24 @@
+import progress_store
+
+
+def test_logging_a_day_again_replaces_its_values(tmp_path):
+    path = str(tmp_path / "log.bin")
+    log = progress_store.ProgressLog(path)
+    today = progress_store.today()
+    log.log({"steps": 5000, "workouts": 1})
+    log.log({"steps": 8000, "workouts": 1})
+
+    for reloaded in (log, progress_store.ProgressLog(path)):
+        assert reloaded["steps"].on(today) == 8000
+        assert reloaded["workouts"].week(today) == 1
+
+
+def test_week_totals_and_means_use_each_days_value():
+    log = progress_store.ProgressLog()
+    monday = progress_store.week_start(progress_store.today())
+    log.log({"steps": 1000, "weight": 72}, day=monday)
+    log.log({"steps": 3000, "weight": 70}, day=monday + 1)
+    log.log({"weight": 71}, day=monday + 1)
+
+    assert log["steps"].week(monday) == 4000
+    assert log["weight"].week(monday) == 71.5
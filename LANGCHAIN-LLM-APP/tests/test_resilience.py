@@ -0,0 +1,138 @@
+import threading
+import time
+import pytest
+import resilience
+from llm_backend import FakeBackendError
+
+
+def make_guard(**kwargs):
+    kwargs.setdefault("backoff", 0)
+    kwargs.setdefault("idle_timeout", None)
+    return resilience.Guard(deadlines={}, **kwargs)
+
+
+def failing(errors, result="ok"):
+    errors = list(errors)
+
+    def func():
+        if errors:
+            raise errors.pop(0)
+        return result
+    return func
+
+
+class ServiceUnavailable(Exception):
+    code = 503
+
+
+class BadRequest(Exception):
+    code = 400
+
+
+@pytest.mark.parametrize("error", [
+    TimeoutError(), ConnectionResetError(), FakeBackendError("boom"), ServiceUnavailable(),
+])
+def test_transient_errors_are_retried(error):
+    guard = make_guard(retries=1)
+    assert guard.call("chat", failing([error])) == "ok"
+    assert guard.stats()["functions"]["chat"]["errors"] == 1
+
+
+@pytest.mark.parametrize("error", [KeyError("plan"), TypeError("bad"), BadRequest()])
+def test_other_errors_propagate_unchanged_without_retrying(error):
+    guard = make_guard(retries=3)
+    calls = []
+
+    def func():
+        calls.append(1)
+        raise error
+
+    with pytest.raises(type(error)) as raised:
+        guard.call("chat", func)
+    assert raised.value is error
+    assert len(calls) == 1
+    assert guard.breaker.state == "closed"
+
+
+def test_gives_up_after_the_last_retry():
+    guard = make_guard(retries=2)
+    with pytest.raises(resilience.Unavailable) as raised:
+        guard.call("chat", failing([TimeoutError()] * 3))
+    assert isinstance(raised.value.__cause__, TimeoutError)
+    assert guard.stats()["functions"]["chat"]["attempts"] == 3
+
+
+def test_slow_call_exceeds_its_deadline():
+    guard = resilience.Guard(deadlines={"chat": 0.05}, retries=2, backoff=0)
+    release = threading.Event()
+    started = time.monotonic()
+    with pytest.raises(resilience.DeadlineExceeded):
+        guard.call("chat", lambda: release.wait(5))
+    release.set()
+    assert time.monotonic() - started < 1
+    assert guard.stats()["functions"]["chat"]["timeouts"] == 1
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_breaker_opens_then_lets_one_trial_through():
+    clock = Clock()
+    breaker = resilience.CircuitBreaker(failures=2, cooldown=30, clock=clock)
+    breaker.failure()
+    assert breaker.allow()
+    breaker.failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    clock.now = 30
+    assert breaker.allow()
+    assert not breaker.allow()  # only one trial while half open
+    breaker.failure()
+    assert breaker.state == "open" and breaker.opened == 2
+
+    clock.now = 60
+    assert breaker.allow()
+    breaker.success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_open_breaker_fails_fast_without_calling():
+    guard = make_guard(breaker=resilience.CircuitBreaker(failures=1, cooldown=30))
+    guard.breaker.failure()
+    with pytest.raises(resilience.CircuitOpen):
+        guard.call("chat", lambda: pytest.fail("called with the circuit open"))
+
+
+def chunks_then_failure(chunks):
+    def helper(topic):
+        yield from chunks
+        raise resilience.Unavailable("model stopped")
+    return helper
+
+
+def test_generator_replays_the_fallback_when_nothing_was_sent():
+    helper = resilience.degrade(lambda topic: f"standard {topic}")(chunks_then_failure([]))
+    assert list(helper("plan")) == ["standard plan"]
+
+
+def test_generator_resumes_after_partial_output():
+    resume = lambda sent, value: [f" (+{len(sent)} then {value})"]
+    helper = resilience.degrade(lambda topic: "fallback", resume=resume)(chunks_then_failure(["a", "b"]))
+    assert list(helper("plan")) == ["a", "b", " (+2 then fallback)"]
+
+
+def test_generator_without_resume_raises_after_partial_output():
+    helper = resilience.degrade(lambda topic: "fallback")(chunks_then_failure(["a"]))
+    with pytest.raises(resilience.Unavailable):
+        list(helper("plan"))
+
+
+def test_no_fallback_raises_instead_of_degrading():
+    helper = resilience.degrade(lambda topic: "fallback")(chunks_then_failure([]))
+    with resilience.no_fallback(), pytest.raises(resilience.Unavailable):
+        list(helper("plan"))
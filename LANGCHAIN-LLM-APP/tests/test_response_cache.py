@@ -0,0 +1,74 @@
+import time
+import pytest
+from response_cache import ResponseCache, cached, make_key
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    return now
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResponseCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert len(cache) == 2
+
+
+def test_expired_entries_miss_but_stay_available_as_stale(clock):
+    cache = ResponseCache(ttl_seconds=60)
+    cache.set("plan", "weekly plan")
+    clock[0] += 61
+
+    assert cache.get("plan") is None
+    assert cache.get_stale("plan") == "weekly plan"
+    assert (cache.hits, cache.misses) == (0, 1)
+
+
+def test_entries_evicted_from_memory_are_served_from_disk(tmp_path):
+    cache = ResponseCache(max_entries=1, disk_dir=str(tmp_path))
+    cache.set("a", {"Monday": "Push"})
+    cache.set("b", {"Monday": "Pull"})
+    assert len(cache) == 1
+
+    assert cache.get("a") == {"Monday": "Push"}
+    assert len(cache) == 1  # promoted back, evicting "b" from memory
+    assert ResponseCache(disk_dir=str(tmp_path)).get("b") == {"Monday": "Pull"}
+
+
+def test_expired_disk_entries_are_not_served(tmp_path, clock):
+    ResponseCache(disk_dir=str(tmp_path)).set("a", "old")
+    clock[0] += 61
+    cache = ResponseCache(ttl_seconds=60, disk_dir=str(tmp_path))
+
+    assert cache.get("a") is None
+    assert cache.get_stale("a") == "old"
+    cache.delete("a")
+    assert cache.get_stale("a") is None
+
+
+def test_hits_are_copies():
+    cache = ResponseCache()
+    cache.set("a", {"Monday": "Push"})
+    cache.get("a")["Monday"] = "changed"
+    assert cache.get("a") == {"Monday": "Push"}
+
+
+def test_cached_helper_shares_entries_between_equivalent_arguments():
+    calls = []
+
+    @cached("plan", "v1", cache=ResponseCache())
+    def plan(goal, days):
+        calls.append((goal, days))
+        return f"{days} days of {goal}"
+
+    assert plan("Weight  Loss", 4.0) == plan("weight loss", days=4)
+    assert len(calls) == 1
+    assert make_key("plan", "v1", [1]) != make_key("plan", "v2", [1])
@@ -0,0 +1,55 @@
+import pytest
+from semantic_cache import SemanticCache, normalize_query
+
+QUESTION = "What is a good high protein vegetarian breakfast?"
+ANSWER = "Try besan chilla with paneer."
+
+
+@pytest.fixture
+def cache():
+    cache = SemanticCache()
+    cache.store(QUESTION, "Vegetarian", 2000, ANSWER)
+    return cache
+
+
+def test_normalize_query_drops_filler_and_glues_units():
+    assert normalize_query("How many calories are in 100 g of Paneer?") == "calories 100g paneer"
+
+
+@pytest.mark.parametrize("question", [
+    QUESTION,
+    "what's a good high-protein vegetarian breakfast",
+    "Can you tell me a good high protein vegetarian breakfast please?",
+])
+def test_near_duplicate_questions_hit(cache, question):
+    assert cache.lookup(question, "vegetarian", 2100) == ANSWER
+
+
+@pytest.mark.parametrize("question, diet_pref, daily_calories", [
+    ("What is a good high protein vegan dinner?", "Vegetarian", 2000),
+    (QUESTION, "Vegan", 2000),          # other diet
+    (QUESTION, "Vegetarian", 2600),     # other calorie bucket
+])
+def test_different_questions_or_scopes_miss(cache, question, diet_pref, daily_calories):
+    assert cache.lookup(question, diet_pref, daily_calories) is None
+
+
+def test_questions_quoting_different_amounts_never_match():
+    cache = SemanticCache()
+    cache.store("calories in 100g paneer curry", "Vegetarian", 2000, "About 300 kcal")
+    assert cache.lookup("calories in 200g paneer curry", "Vegetarian", 2000) is None
+    assert cache.lookup("calories in 100 g paneer curry", "Vegetarian", 2000) == "About 300 kcal"
+
+
+def test_short_follow_ups_are_not_cached(cache):
+    assert cache.lookup("why?", "Vegetarian", 2000) is None
+    assert cache.stats()["skips"] == 1
+
+
+def test_oldest_entries_are_evicted():
+    cache = SemanticCache(max_entries=2)
+    for food in ("paneer tikka", "chicken curry", "masala dosa"):
+        cache.store(f"calories in {food}", "Vegetarian", 2000, food)
+    assert cache.lookup("calories in paneer tikka", "Vegetarian", 2000) is None
+    assert cache.lookup("calories in masala dosa", "Vegetarian", 2000) == "masala dosa"
+    assert cache.stats()["evictions"] == 1
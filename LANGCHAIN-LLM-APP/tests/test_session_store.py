@@ -0,0 +1,49 @@
+import sqlite3
+import time
+import session_store
+from session_store import SessionStore
+
+
+def test_prune_expired_drops_only_idle_sessions(tmp_path, monkeypatch):
+    store = SessionStore(str(tmp_path / "sessions.db"), max_age_seconds=60)
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    store.save("old-session-token-1", "plan", "a")
+    store.save("new-session-token-1", "plan", "b")
+    now[0] += 50
+    store.save("new-session-token-1", "step", 4)
+    now[0] += 20
+
+    assert store.prune_expired() == 1
+    assert store.load("old-session-token-1", "plan") is None
+    assert store.load("new-session-token-1", "plan") == "b"
+
+
+def test_prune_expired_is_off_without_a_max_age(tmp_path):
+    store = SessionStore(str(tmp_path / "sessions.db"))
+    store.save("old-session-token-1", "plan", "a")
+    assert store.prune_expired() == 0
+
+
+def test_locked_database_does_not_break_saving(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    store = SessionStore(path, busy_timeout_ms=10)
+    locker = sqlite3.connect(path, isolation_level=None)
+    locker.execute("BEGIN IMMEDIATE")
+    try:
+        assert store.save("session-token-0001", "plan", "a") is False
+        store.delete("session-token-0001")
+    finally:
+        locker.rollback()
+    assert store.save("session-token-0001", "plan", "a") is True
+
+
+def test_new_sessions_sometimes_prune(tmp_path, monkeypatch):
+    store = SessionStore(str(tmp_path / "sessions.db"), max_age_seconds=60)
+    pruned = []
+    monkeypatch.setattr(store, "prune_expired", lambda: pruned.append(1))
+    monkeypatch.setattr(session_store, "PRUNE_CHANCE", 1.0)
+    state, params = {}, {}
+    session_store.bind(state, params, store)
+    session_store.bind(state, params, store)  # same session: no new token
+    assert len(pruned) == 1
@@ -0,0 +1,128 @@
+import threading
+import time
+import pytest
+import resilience
+from single_flight import FlightTimeout, SingleFlight
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def run_concurrently(flights, key, func, followers=3):
+    release = threading.Event()
+    results, errors = [], []
+
+    def leader_func():
+        release.wait(5)
+        return func()
+
+    def call(f):
+        try:
+            results.append(flights.do(key, f))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call, args=(leader_func,))]
+    threads[0].start()
+    wait_for(lambda: flights.stats()["in_flight"])
+    threads += [threading.Thread(target=call, args=(func,)) for _ in range(followers)]
+    for thread in threads[1:]:
+        thread.start()
+    wait_for(lambda: flights.stats()["coalesced"] == followers)
+    release.set()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+def test_concurrent_calls_share_one_result():
+    flights = SingleFlight(timeout=5)
+    calls = []
+
+    def plan():
+        calls.append(1)
+        return {"Monday": "Push"}
+
+    results, errors = run_concurrently(flights, "plan", plan)
+    assert not errors
+    assert len(calls) == 1
+    assert results == [{"Monday": "Push"}] * 4
+    assert len({id(result) for result in results}) == 4  # followers get copies
+    assert flights.stats() == {"leaders": 1, "coalesced": 3, "timeouts": 0, "in_flight": 0}
+
+
+def test_leader_error_reaches_every_follower():
+    flights = SingleFlight(timeout=5)
+    error = ValueError("bad plan")
+
+    def plan():
+        raise error
+
+    results, errors = run_concurrently(flights, "plan", plan)
+    assert not results
+    assert errors == [error] * 4
+    assert flights.do("plan", lambda: "retried") == "retried"
+
+
+def test_stream_consumers_share_one_source():
+    flights = SingleFlight(timeout=5)
+    gate = threading.Event()
+    opened = []
+
+    def source():
+        opened.append(1)
+        yield "a"
+        gate.wait(5)
+        yield "b"
+
+    first = flights.stream("plan", source)
+    assert next(first) == "a"
+    second = flights.stream("plan", source)
+    assert next(second) == "a"
+    gate.set()
+
+    assert list(first) == ["b"]
+    assert list(second) == ["b"]
+    assert len(opened) == 1
+    assert flights.stats()["in_flight"] == 0
+
+
+def test_stream_error_reaches_every_consumer():
+    flights = SingleFlight(timeout=5)
+
+    def source():
+        yield "a"
+        raise ValueError("cut off")
+
+    first = flights.stream("plan", source)
+    second = flights.stream("plan", source)
+    assert next(first) == next(second) == "a"
+    with pytest.raises(ValueError):
+        next(first)
+    with pytest.raises(ValueError):
+        next(second)
+
+
+def test_follower_timeout_falls_back_like_any_unavailable_call():
+    flights = SingleFlight(timeout=0.05)
+    release = threading.Event()
+    leader = threading.Thread(target=flights.do, args=("plan", lambda: release.wait(5)))
+    leader.start()
+    wait_for(lambda: flights.stats()["in_flight"])
+
+    @resilience.degrade(lambda: "standard plan")
+    def plan():
+        return flights.do("plan", lambda: "generated plan")
+
+    try:
+        assert plan() == "standard plan"
+        with pytest.raises(FlightTimeout):
+            flights.do("plan", lambda: "generated plan")
+    finally:
+        release.set()
+        leader.join()
+    assert flights.stats()["timeouts"] == 2
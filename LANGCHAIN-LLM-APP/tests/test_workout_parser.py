@@ -0,0 +1,26 @@
+import pytest
+import workout_engine
+import workout_library
+from workout_parser import is_rest_day
+
+
+@pytest.mark.parametrize("day_plan, rest", [
+    ("Rest Day - Light stretching or a walk", True),
+    ("Rest Day", True),
+    ("**Rest day**", True),
+    ("rest", True),
+    ("**Restorative Flow**\n- Child's pose", False),
+    ("Restorative yoga", False),
+    ("**Push**\n- Bench press: 3 sets x 8 reps", False),
+    ("", False),
+    (None, False),
+])
+def test_is_rest_day(day_plan, rest):
+    assert is_rest_day(day_plan) is rest
+
+
+@pytest.mark.parametrize("workout_type", ["Home", "Gym", "Yoga"])
+@pytest.mark.parametrize("workout_days", range(1, 8))
+def test_rule_built_weeks_pass_library_validation(workout_days, workout_type):
+    week = workout_engine.build_week(workout_days, "Weight Loss", "Beginner", workout_type)
+    assert workout_library.validate(week, workout_days) == []
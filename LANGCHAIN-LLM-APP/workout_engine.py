@@ -0,0 +1,297 @@
+import functools
+from collections import defaultdict
+from dataclasses import dataclass
+from workout_parser import DAYS, Exercise, WorkoutDay
+
+# Rule-based weekly workout programming. A week is built from standard
+# split templates (full body, upper/lower, push/pull/legs, yoga flows),
+# filled from an exercise catalogue indexed by workout type and movement
+# pattern, with sets, reps and rest set by level and goal. Deterministic,
+# no model call; the output is the {day: markdown} dict the Workouts page
+# renders. The LLM only adds optional coaching notes (see Langchain_helper).
+
+LEVELS = ["Beginner", "Intermediate", "Advanced"]
+_RANK = {level: rank for rank, level in enumerate(LEVELS)}
+
+
+@dataclass(frozen=True)
+class Movement:
+    name: str
+    types: tuple        # workout types it suits: "Home", "Gym", "Yoga"
+    pattern: str        # movement pattern the templates ask for
+    level: str = "Beginner"  # easiest level it is programmed for
+    timed: bool = False      # held or done for time rather than counted
+
+
+def _moves(types, pattern, *entries):
+    return [Movement(name, tuple(types.split()), pattern, level, timed)
+            for name, level, timed in (entry + (False,) * (3 - len(entry)) for entry in entries)]
+
+
+B, I, A = LEVELS
+
+CATALOGUE = [
+    # ---- strength: bodyweight at home, free weights and machines at the gym
+    *_moves("Home", "squat", ("Bodyweight Squat", B), ("Tempo Squat", I), ("Jump Squat", I),
+            ("Pistol Squat to Box", A)),
+    *_moves("Gym", "squat", ("Goblet Squat", B), ("Leg Press", B), ("Back Squat", I), ("Hack Squat", I),
+            ("Front Squat", A)),
+    *_moves("Home", "hinge", ("Glute Bridge", B), ("Single-Leg Glute Bridge", I),
+            ("Single-Leg Romanian Deadlift", I), ("Nordic Curl Negative", A)),
+    *_moves("Gym", "hinge", ("Dumbbell Romanian Deadlift", B), ("Back Extension", B), ("Romanian Deadlift", I),
+            ("Barbell Hip Thrust", I), ("Conventional Deadlift", A)),
+    *_moves("Home", "lunge", ("Reverse Lunge", B), ("Walking Lunge", I), ("Jumping Lunge", A)),
+    *_moves("Gym", "lunge", ("Dumbbell Step-up", B), ("Dumbbell Walking Lunge", I)),
+    *_moves("Home Gym", "lunge", ("Bulgarian Split Squat", I)),
+    *_moves("Home", "push_h", ("Incline Push-up", B), ("Knee Push-up", B), ("Push-up", I), ("Decline Push-up", A),
+            ("Archer Push-up", A)),
+    *_moves("Gym", "push_h", ("Machine Chest Press", B), ("Dumbbell Bench Press", B), ("Barbell Bench Press", I),
+            ("Incline Dumbbell Press", I), ("Weighted Dips", A)),
+    *_moves("Home", "push_v", ("Pike Push-up", B), ("Elevated Pike Push-up", I), ("Wall Handstand Push-up", A)),
+    *_moves("Gym", "push_v", ("Seated Dumbbell Shoulder Press", B), ("Overhead Barbell Press", I),
+            ("Arnold Press", I), ("Push Press", A)),
+    *_moves("Home", "pull_h", ("Backpack Row", B), ("Towel Door Row", I), ("Inverted Table Row", I)),
+    *_moves("Gym", "pull_h", ("Seated Cable Row", B), ("One-Arm Dumbbell Row", B), ("Barbell Row", I),
+            ("Chest-Supported T-Bar Row", I), ("Pendlay Row", A)),
+    *_moves("Home", "pull_v", ("Superman Pull", B), ("Doorframe Pull-up Negative", I), ("Doorframe Pull-up", A)),
+    *_moves("Gym", "pull_v", ("Lat Pulldown", B), ("Assisted Pull-up", B), ("Pull-up", I),
+            ("Weighted Pull-up", A)),
+    *_moves("Home", "triceps", ("Chair Dips", B), ("Diamond Push-up", I)),
+    *_moves("Gym", "triceps", ("Triceps Pushdown", B), ("Overhead Cable Extension", B), ("Skull Crusher", I)),
+    *_moves("Home", "biceps", ("Backpack Curl", B), ("Towel Isometric Curl", B, True)),
+    *_moves("Gym", "biceps", ("Dumbbell Curl", B), ("Hammer Curl", B), ("Barbell Curl", I)),
+    *_moves("Home", "shoulders", ("Prone Y-T-W Raise", B), ("Backpack Lateral Raise", B)),
+    *_moves("Gym", "shoulders", ("Lateral Raise", B), ("Face Pull", B), ("Rear Delt Fly", I)),
+    *_moves("Home", "legs_iso", ("Calf Raise", B), ("Wall Sit", B, True), ("Single-Leg Calf Raise", I)),
+    *_moves("Gym", "legs_iso", ("Lying Leg Curl", B), ("Leg Extension", B), ("Standing Calf Raise", B)),
+    *_moves("Home Gym", "core", ("Plank", B, True), ("Dead Bug", B), ("Side Plank", I, True),
+            ("Hollow Body Hold", I, True)),
+    *_moves("Home", "core", ("V-up", A)),
+    *_moves("Gym", "core", ("Pallof Press", B), ("Cable Crunch", B), ("Hanging Knee Raise", I),
+            ("Ab Wheel Rollout", A)),
+    *_moves("Home", "conditioning", ("Jumping Jacks", B, True), ("Mountain Climbers", B, True),
+            ("High Knees", B, True), ("Burpees", I, True), ("Skater Jumps", I, True)),
+    *_moves("Gym", "conditioning", ("Incline Treadmill Walk", B, True), ("Rowing Machine Intervals", B, True),
+            ("Assault Bike Intervals", I, True), ("Sled Push", A, True)),
+    # ---- yoga poses, held for breaths
+    *_moves("Yoga", "warmup", ("Cat-Cow", B, True), ("Sun Salutation A", B, True), ("Sun Salutation B", I, True)),
+    *_moves("Yoga", "standing", ("Warrior I", B, True), ("Warrior II", B, True), ("Triangle Pose", B, True),
+            ("Extended Side Angle", I, True), ("Revolved Side Angle", A, True)),
+    *_moves("Yoga", "balance", ("Tree Pose", B, True), ("Eagle Pose", I, True), ("Warrior III", I, True),
+            ("Half Moon", I, True), ("Crow Pose", A, True)),
+    *_moves("Yoga", "core", ("Plank Pose", B, True), ("Forearm Plank", B, True), ("Boat Pose", I, True),
+            ("Side Plank Pose", I, True)),
+    *_moves("Yoga", "hip", ("Low Lunge", B, True), ("Garland Pose", B, True), ("Lizard Pose", I, True),
+            ("Pigeon Pose", I, True)),
+    *_moves("Yoga", "backbend", ("Cobra Pose", B, True), ("Bridge Pose", B, True), ("Upward Dog", I, True),
+            ("Camel Pose", I, True), ("Wheel Pose", A, True)),
+    *_moves("Yoga", "twist", ("Seated Twist", B, True), ("Revolved Chair", I, True),
+            ("Revolved Triangle", A, True)),
+    *_moves("Yoga", "cooldown", ("Child's Pose", B, True), ("Seated Forward Fold", B, True),
+            ("Supine Twist", B, True), ("Legs Up the Wall", B, True)),
+]
+
+del B, I, A
+
+
+# (workout type, pattern) -> movements, hardest first, built once
+def _build_index(catalogue):
+    index = defaultdict(list)
+    for movement in catalogue:
+        for workout_type in movement.types:
+            index[(workout_type, movement.pattern)].append(movement)
+    for movements in index.values():
+        movements.sort(key=lambda m: -_RANK[m.level])
+    return dict(index)
+
+INDEX = _build_index(CATALOGUE)
+
+
+# Movements for a pattern that suit the level, hardest first
+def movements(workout_type, pattern, workout_level):
+    rank = _RANK[workout_level]
+    return [m for m in INDEX.get((workout_type, pattern), ()) if _RANK[m.level] <= rank]
+
+
+# ---------------- TEMPLATES ----------------
+
+# Session key -> (focus, patterns in order). Beginners do the first four
+# patterns, intermediates five, advanced lifters all of them.
+SESSIONS = {
+    "full": ("Full Body", ["squat", "push_h", "pull_h", "hinge", "push_v", "core"]),
+    "upper": ("Upper Body", ["push_h", "pull_v", "push_v", "pull_h", "triceps", "biceps"]),
+    "lower": ("Lower Body", ["squat", "hinge", "lunge", "legs_iso", "core", "legs_iso"]),
+    "push": ("Push", ["push_h", "push_v", "push_h", "triceps", "shoulders", "triceps"]),
+    "pull": ("Pull", ["pull_v", "pull_h", "pull_h", "biceps", "shoulders", "core"]),
+    "legs": ("Legs", ["squat", "hinge", "lunge", "legs_iso", "core", "legs_iso"]),
+    "conditioning": ("Conditioning & Core", ["conditioning", "core", "conditioning", "core", "conditioning", "core"]),
+    "vinyasa": ("Vinyasa Flow", ["warmup", "standing", "balance", "backbend", "cooldown", "standing"]),
+    "balance": ("Balance & Core", ["warmup", "balance", "core", "balance", "cooldown", "core"]),
+    "hips": ("Hip Mobility", ["warmup", "hip", "twist", "cooldown", "hip", "backbend"]),
+    "strength_flow": ("Strength Flow", ["warmup", "standing", "core", "balance", "cooldown", "backbend"]),
+    "restorative": ("Restorative Flow", ["hip", "twist", "cooldown", "backbend", "cooldown", "hip"]),
+}
+
+PATTERNS_PER_LEVEL = {"Beginner": 4, "Intermediate": 5, "Advanced": 6}
+
+_GYM = {
+    1: ["full"],
+    2: ["full", "full"],
+    3: ["push", "pull", "legs"],
+    4: ["upper", "lower", "upper", "lower"],
+    5: ["upper", "lower", "push", "pull", "legs"],
+    6: ["push", "pull", "legs", "push", "pull", "legs"],
+    7: ["push", "pull", "legs", "push", "pull", "legs", "conditioning"],
+}
+_HOME = {
+    1: ["full"],
+    2: ["full", "full"],
+    3: ["full", "full", "full"],
+    4: ["upper", "lower", "upper", "lower"],
+    5: ["upper", "lower", "conditioning", "upper", "lower"],
+    6: ["upper", "lower", "conditioning", "upper", "lower", "full"],
+    7: ["upper", "lower", "conditioning", "upper", "lower", "full", "conditioning"],
+}
+_YOGA = ["vinyasa", "balance", "hips", "strength_flow", "restorative"]
+
+
+# Session keys for the training days, in order
+def split(workout_type, workout_days, workout_level):
+    if workout_type == "Yoga":
+        return [_YOGA[i % len(_YOGA)] for i in range(workout_days)]
+    splits = _GYM if workout_type == "Gym" else _HOME
+    # New lifters repeat full-body sessions instead of a 3-day body-part split
+    if workout_days == 3 and workout_level == "Beginner":
+        return ["full"] * 3
+    return splits[workout_days]
+
+
+# Training days spread evenly through the week, e.g. 3 -> Mon, Wed, Sat
+def training_days(workout_days):
+    return {round(i * len(DAYS) / workout_days) for i in range(workout_days)}
+
+
+# ---------------- PRESCRIPTION ----------------
+
+# Goal -> (reps per set, rest between sets, finisher pattern or None)
+GOAL_SCHEMES = {
+    "Weight Loss": ("12-15", "45s", "conditioning"),
+    "Weight Gain": ("6-10", "90-120s", None),
+    "Build Muscle": ("8-12", "60-90s", None),
+    "Improve Flexibility": ("10-12", "60s", "mobility"),
+    "Maintain": ("10-12", "60s", None),
+}
+SETS = {"Beginner": 2, "Intermediate": 3, "Advanced": 4}
+WORK_SECONDS = {"Beginner": 30, "Intermediate": 40, "Advanced": 45}
+BREATHS = {"Beginner": 5, "Intermediate": 8, "Advanced": 10}
+
+REST_NOTES = {
+    "Weight Loss": "Active recovery: a 30-45 minute brisk walk",
+    "Improve Flexibility": "Gentle stretching for 15-20 minutes",
+}
+DEFAULT_REST_NOTE = "Light stretching or a walk"
+
+
+def _prescribe(movement, workout_type, workout_level, reps):
+    if workout_type == "Yoga" or movement.pattern in ("warmup", "cooldown", "hip", "twist"):
+        return Exercise(movement.name, reps=f"{BREATHS[workout_level]} breaths")
+    if movement.timed:
+        return Exercise(movement.name, reps=f"{SETS[workout_level]} x {WORK_SECONDS[workout_level]} seconds")
+    return Exercise(movement.name, SETS[workout_level], reps)
+
+
+# `occurrence` counts earlier sessions with the same key and `number` earlier
+# training days; they pick exercise variants so repeats differ
+def _session(key, occurrence, number, workout_type, workout_level, fitness_goal):
+    focus, patterns = SESSIONS[key]
+    reps, rest, finisher = GOAL_SCHEMES[fitness_goal]
+    patterns = patterns[:PATTERNS_PER_LEVEL[workout_level]]
+    if workout_type == "Yoga" or key == "conditioning":
+        finisher = None
+    elif finisher:
+        patterns = patterns + [finisher]
+
+    exercises, used, seen = [], set(), defaultdict(int)
+    for pattern in patterns:
+        if pattern == "mobility":
+            options = movements("Yoga", "hip", workout_level) + movements("Yoga", "cooldown", workout_level)
+        else:
+            options = movements(workout_type, pattern, workout_level)
+        options = [m for m in options if m.name not in used]
+        if not options:
+            continue
+        variant = number if pattern == finisher else occurrence + seen[pattern]
+        movement = options[variant % len(options)]
+        seen[pattern] += 1
+        used.add(movement.name)
+        exercises.append(_prescribe(movement, workout_type, workout_level, reps))
+
+    if workout_type == "Yoga":
+        notes = "Move with your breath; ease off any pose that pinches"
+    elif key == "conditioning":
+        notes = f"Work {WORK_SECONDS[workout_level]}s, rest 20s; repeat the circuit"
+    else:
+        notes = f"Rest {rest} between sets; add reps, then load, when every set hits the top of the range"
+    return focus, exercises, notes
+
+
+@functools.lru_cache(maxsize=None)
+def _week(workout_days, fitness_goal, workout_level, workout_type):
+    sessions = iter(split(workout_type, workout_days, workout_level))
+    active = training_days(workout_days)
+    occurrences = defaultdict(int)
+    week = []
+    for index, day in enumerate(DAYS):
+        if index not in active:
+            week.append((day, WorkoutDay(day, rest=True, notes=REST_NOTES.get(fitness_goal, DEFAULT_REST_NOTE))))
+            continue
+        key = next(sessions)
+        focus, exercises, notes = _session(key, occurrences[key], sum(occurrences.values()),
+                                           workout_type, workout_level, fitness_goal)
+        occurrences[key] += 1
+        week.append((day, WorkoutDay(day, focus=focus, exercises=exercises, notes=notes)))
+    return tuple((day, workout.to_markdown()) for day, workout in week), tuple(week)
+
+
+def _normalize(workout_days, fitness_goal, workout_level, workout_type):
+    return (
+        max(1, min(len(DAYS), int(workout_days))),
+        fitness_goal if fitness_goal in GOAL_SCHEMES else "Maintain",
+        workout_level if workout_level in _RANK else "Beginner",
+        workout_type if workout_type in ("Home", "Gym", "Yoga") else "Home",
+    )
+
+
+# {day: markdown} for Monday..Sunday with exactly `workout_days` training
+# days. Cached per input combination (there are only a few hundred).
+def build_week(workout_days, fitness_goal, workout_level, workout_type):
+    return dict(_week(*_normalize(workout_days, fitness_goal, workout_level, workout_type))[0])
+
+
+# One line per day ("Monday: Push - Bench Press, ..."), for prompts
+def outline(workout_days, fitness_goal, workout_level, workout_type):
+    lines = []
+    for day, workout in _week(*_normalize(workout_days, fitness_goal, workout_level, workout_type))[1]:
+        if workout.rest:
+            lines.append(f"{day}: Rest")
+        else:
+            lines.append(f"{day}: {workout.focus} - {', '.join(e.name for e in workout.exercises)}")
+    return "\n".join(lines)
+
+
+# Generic coaching notes for the week, shown when personalised notes from
+# the model are unavailable
+def coach_notes(workout_days, fitness_goal, workout_level, workout_type, *args):
+    _, goal, level, workout_type = _normalize(workout_days, fitness_goal, workout_level, workout_type)
+    reps, rest, _ = GOAL_SCHEMES[goal]
+    if workout_type == "Yoga":
+        progression = "Hold each pose a few breaths longer as it gets comfortable before trying harder variations."
+    else:
+        progression = (f"Work in the {reps} rep range with {rest} rest; when every set reaches the top of the "
+                       f"range, add a little load or a harder variation.")
+    return (
+        f"**Coach's notes**\n"
+        f"- {progression}\n"
+        f"- Warm up for 5-10 minutes before each session and stop any exercise that causes pain.\n"
+        f"- Keep rest days easy so you recover for the next {level.lower()} session.\n"
+    )
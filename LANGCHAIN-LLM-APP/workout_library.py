@@ -0,0 +1,169 @@
+import json
+import mmap
+import os
+import struct
+import threading
+import zlib
+from workout_parser import DAYS, is_rest_day
+
+# get_daily_workouts depends only on these four choices (the onboarding
+# options in main.py), so every possible week can be generated ahead of time
+# and served without the model. The library file holds one zlib-compressed
+# JSON {day: markdown} per combination behind a fixed-size offset table
+# indexed by the combination's position, so a lookup is one slice of the
+# memory-mapped file.
+
+WORKOUT_DAYS = [1, 2, 3, 4, 5, 6, 7]
+FITNESS_GOALS = ["Weight Loss", "Weight Gain", "Build Muscle", "Improve Flexibility", "Maintain"]
+WORKOUT_LEVELS = ["Beginner", "Intermediate", "Advanced"]
+WORKOUT_TYPES = ["Home", "Gym", "Yoga"]
+_AXES = [WORKOUT_DAYS, FITNESS_GOALS, WORKOUT_LEVELS, WORKOUT_TYPES]
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "workout_library.bin")
+
+# File layout (little-endian):
+#   magic "FVWL", format (uint16), version length (uint16), version (utf-8),
+#   entry count (uint32), count x (offset uint32, length uint32), blobs
+MAGIC = b"FVWL"
+FORMAT = 1
+_HEADER = struct.Struct("<4sHH")
+_COUNT = struct.Struct("<I")
+_ENTRY = struct.Struct("<II")
+
+
+def combination_count():
+    count = 1
+    for axis in _AXES:
+        count *= len(axis)
+    return count
+
+# Every input combination, in index order
+def combinations():
+    for index in range(combination_count()):
+        combo = []
+        for axis in reversed(_AXES):
+            index, position = divmod(index, len(axis))
+            combo.append(axis[position])
+        yield tuple(reversed(combo))
+
+# Position of a combination in the library, or None for inputs outside the
+# onboarding options
+def combination_index(workout_days, fitness_goal, workout_level, workout_type):
+    index = 0
+    for axis, value in zip(_AXES, (workout_days, fitness_goal, workout_level, workout_type)):
+        try:
+            position = axis.index(value)
+        except ValueError:
+            return None
+        index = index * len(axis) + position
+    return index
+
+
+# Problems that would make a generated week unfit to serve to everyone with
+# these inputs; empty when the week is usable
+def validate(plans, workout_days):
+    problems = []
+    if not isinstance(plans, dict):
+        return ["not a {day: markdown} mapping"]
+    missing = [day for day in DAYS if not plans.get(day)]
+    if missing:
+        problems.append(f"missing {', '.join(missing)}")
+    extra = sorted(set(plans) - set(DAYS))
+    if extra:
+        problems.append(f"unexpected keys {', '.join(map(str, extra))}")
+    training = sum(1 for day in DAYS if plans.get(day) and not is_rest_day(plans[day]))
+    if training != workout_days:
+        problems.append(f"{training} workout days instead of {workout_days}")
+    return problems
+
+
+# Write a complete library; `plans` lists {day: markdown} in combination
+# order. Written to a temporary file and renamed so a running app never
+# maps a half-written library.
+def write_library(path, version, plans):
+    if len(plans) != combination_count():
+        raise ValueError(f"Expected {combination_count()} weeks, got {len(plans)}")
+    version_bytes = version.encode("utf-8")
+    blobs = [zlib.compress(json.dumps(week, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 9)
+             for week in plans]
+
+    offset = _HEADER.size + len(version_bytes) + _COUNT.size + _ENTRY.size * len(blobs)
+    table = []
+    for blob in blobs:
+        table.append(_ENTRY.pack(offset, len(blob)))
+        offset += len(blob)
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, FORMAT, len(version_bytes)))
+            f.write(version_bytes)
+            f.write(_COUNT.pack(len(blobs)))
+            f.write(b"".join(table))
+            f.write(b"".join(blobs))
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    return offset
+
+
+class WorkoutLibrary:
+    # Read-only view over a library file. The file is memory-mapped, so
+    # processes on one host share its pages and opening it costs nothing
+    # beyond reading the header.
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, file_format, version_length = _HEADER.unpack_from(self._map, 0)
+            if magic != MAGIC or file_format != FORMAT:
+                raise ValueError(f"{path} is not a format {FORMAT} workout library")
+            position = _HEADER.size
+            self.version = self._map[position:position + version_length].decode("utf-8")
+            position += version_length
+            (self._count,) = _COUNT.unpack_from(self._map, position)
+            self._table = position + _COUNT.size
+            if self._count != combination_count():
+                raise ValueError(f"{path} has {self._count} weeks, expected {combination_count()}")
+        except (struct.error, UnicodeDecodeError):
+            self._map.close()
+            raise ValueError(f"{path} is truncated or corrupt")
+        except ValueError:
+            self._map.close()
+            raise
+
+    def get(self, workout_days, fitness_goal, workout_level, workout_type):
+        index = combination_index(workout_days, fitness_goal, workout_level, workout_type)
+        if index is None:
+            return None
+        offset, length = _ENTRY.unpack_from(self._map, self._table + index * _ENTRY.size)
+        return json.loads(zlib.decompress(self._map[offset:offset + length]).decode("utf-8"))
+
+    def __len__(self):
+        return self._count
+
+    def close(self):
+        self._map.close()
+
+
+_library = None
+_library_lock = threading.Lock()
+
+# The library named by FITVISOR_WORKOUT_LIBRARY (empty disables it), or
+# None when it hasn't been built; the app then generates workouts live
+def get_library():
+    global _library
+    if _library is None:
+        with _library_lock:
+            if _library is None:
+                path = os.getenv("FITVISOR_WORKOUT_LIBRARY", DEFAULT_PATH)
+                try:
+                    _library = WorkoutLibrary(path) if path else False
+                except (OSError, ValueError):
+                    _library = False
+    return _library or None
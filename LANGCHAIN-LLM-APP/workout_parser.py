@@ -0,0 +1,138 @@
+import json
+import re
+from dataclasses import dataclass, field
+
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+# A day heading in free-form output: "**Monday:**", "### Monday -", "1. Monday", ...
+_DAY_HEADER = re.compile(
+    r"^[\s*#>\-\d.)]*(" + "|".join(DAYS) + r")\b[\s*:\-–—]*(.*)$",
+    re.IGNORECASE
+)
+
+# A rest day's markdown: "Rest Day - notes", "**Rest day**", "Rest", but not
+# "Restorative Flow"
+_REST_DAY = re.compile(r"^[\s*#_>\-]*rest(?:\s+day)?\b", re.IGNORECASE)
+
+def is_rest_day(day_plan):
+    return bool(day_plan) and _REST_DAY.match(str(day_plan)) is not None
+
+
+@dataclass
+class Exercise:
+    name: str
+    sets: object = None
+    reps: object = None
+
+    def to_markdown(self):
+        if self.sets and self.reps:
+            return f"- {self.name}: {self.sets} sets x {self.reps} reps"
+        if self.reps:
+            return f"- {self.name}: {self.reps}"
+        return f"- {self.name}"
+
+
+@dataclass
+class WorkoutDay:
+    day: str
+    rest: bool = False
+    focus: str = ""
+    exercises: list = field(default_factory=list)
+    notes: str = ""
+
+    @classmethod
+    def from_dict(cls, data):
+        exercises = []
+        for item in data.get("exercises") or []:
+            if isinstance(item, dict) and item.get("name"):
+                exercises.append(Exercise(str(item["name"]), item.get("sets"), item.get("reps")))
+            elif isinstance(item, str):
+                exercises.append(Exercise(item))
+        return cls(
+            day=normalize_day(data["day"]),
+            rest=bool(data.get("rest")),
+            focus=str(data.get("focus") or ""),
+            exercises=exercises,
+            notes=str(data.get("notes") or ""),
+        )
+
+    # The per-day markdown string main.py's expanders render
+    def to_markdown(self):
+        if self.rest:
+            return f"Rest Day - {self.notes}" if self.notes else "Rest Day"
+        lines = [f"**{self.focus}**"] if self.focus else []
+        lines.extend(exercise.to_markdown() for exercise in self.exercises)
+        if self.notes:
+            lines.append(f"\n_{self.notes}_")
+        return "\n".join(lines)
+
+
+def normalize_day(name):
+    name = str(name).strip().capitalize()
+    if name not in DAYS:
+        raise ValueError(f"Unknown day: {name}")
+    return name
+
+
+class WorkoutStreamParser:
+    # Single-pass parser over streamed workout text. Accepts the structured
+    # JSON-lines format (one object per day) and falls back to markdown day
+    # headings, so either shape fills the week. feed() returns the days that
+    # completed with this chunk as (day, markdown) pairs; close() flushes
+    # the last open day.
+    def __init__(self):
+        self._buffer = ""
+        self._current_day = None
+        self._current_lines = []
+
+    def feed(self, chunk):
+        self._buffer += chunk
+        *lines, self._buffer = self._buffer.split("\n")
+        completed = []
+        for line in lines:
+            self._parse_line(line, completed)
+        return completed
+
+    def close(self):
+        completed = []
+        if self._buffer:
+            self._parse_line(self._buffer, completed)
+            self._buffer = ""
+        self._flush(completed)
+        return completed
+
+    def _flush(self, completed):
+        if self._current_day:
+            completed.append((self._current_day, "\n".join(self._current_lines).strip()))
+        self._current_day = None
+        self._current_lines = []
+
+    def _parse_line(self, line, completed):
+        line = line.strip()
+        if not line or line.startswith("```"):
+            return
+
+        if line.startswith("{"):
+            try:
+                day = WorkoutDay.from_dict(json.loads(line.rstrip(",")))
+            except (ValueError, KeyError, TypeError, AttributeError):
+                pass
+            else:
+                self._flush(completed)
+                completed.append((day.day, day.to_markdown()))
+                return
+
+        match = _DAY_HEADER.match(line)
+        if match:
+            self._flush(completed)
+            self._current_day = match.group(1).capitalize()
+            rest = match.group(2).strip().strip("*").strip()
+            self._current_lines = [rest] if rest else []
+        elif self._current_day:
+            self._current_lines.append(line)
+
+
+# Parse a complete response into {day: markdown}
+def parse_workouts(text):
+    parser = WorkoutStreamParser()
+    return dict(parser.feed(text) + parser.close())